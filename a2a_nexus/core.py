@@ -1,17 +1,49 @@
 import os
 import json
+import time
+import threading
 import requests
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+from typing import Callable, List, Dict, Optional
+
+# OpenAI-mos API manzili (oflayn testlar uchun lokal stub server ko'rsatilishi mumkin)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+# (ulanish, javob) timeoutlari, soniya
+NEXUS_LLM_TIMEOUT = (float(os.getenv("NEXUS_CONNECT_TIMEOUT", 5)), float(os.getenv("NEXUS_READ_TIMEOUT", 30)))
+# Barcha agentlar uchun umumiy keep-alive ulanishlar hovuzi (batch rejimida parallel muzokaralar)
+NEXUS_HTTP_POOL_SIZE = int(os.getenv("NEXUS_HTTP_POOL_SIZE", 32))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Jarayon bo'yicha bitta requests.Session (ulanishlar qayta ishlatiladi)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=NEXUS_HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
 
 class NexusAgent:
-    def __init__(self, name: str, role: str, goal: str, constraints: List[str] = None):
+    def __init__(self, name: str, role: str, goal: str, constraints: List[str] = None, base_url: str = None,
+                 recorder: Optional[Callable[[Dict], None]] = None):
         self.name = name
         self.role = role
         self.goal = goal
         self.constraints = constraints or []
         self.memory: List[Dict] = []
         self.api_key = os.getenv("GROQ_API_KEY")
-        self.url = "https://api.groq.com/openai/v1/chat/completions"
+        self.url = f"{(base_url or GROQ_BASE_URL).rstrip('/')}/chat/completions"
+        # Har bir LLM chaqiruvi haqida yozuv qabul qiluvchi (masalan, ilovaning AI sarfi logi)
+        self.recorder = recorder
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_ms": 0}
 
     def think(self, context: str) -> str:
         """Agent processes the situation and decides its next move (inner monologue)"""
@@ -40,7 +72,49 @@ class NexusAgent:
         self.memory.append({"role": "assistant", "content": message})
         return message
 
-    def _call_llm(self, prompt: str) -> str:
+    def act(self, context: str) -> Dict:
+        """Bitta LLM chaqiruvida fikrlash va xabar: {"thought", "message", "agreed"}"""
+        prompt = f"""
+        Sizning ismingiz: {self.name}
+        Rolingiz: {self.role}
+        Maqsadingiz: {self.goal}
+        Cheklovlar: {', '.join(self.constraints)}
+
+        Vaziyat (Context): {context}
+
+        Avval o'zingiz uchun vaziyatni tahlil qiling (Inner Monologue), so'ng boshqa agentga
+        qisqa, aniq va maqsadga yo'naltirilgan xabar yozing.
+        Agar qarshi tomonning oxirgi taklifini to'liq qabul qilsangiz, "agreed": true bo'lsin.
+
+        Faqat JSON qaytaring:
+        {{"thought": "ichki fikrlaringiz", "message": "boshqa agentga xabar", "agreed": false}}
+        """
+        raw = self._call_llm(prompt, json_mode=True)
+        turn = self._parse_turn(raw)
+        self.memory.append({"role": "assistant", "content": turn["message"]})
+        return turn
+
+    @staticmethod
+    def _parse_turn(raw: str) -> Dict:
+        """Model javobini {"thought", "message", "agreed"} ga keltirish; JSON buzuq bo'lsa matnning o'zi xabar"""
+        data = None
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            start, end = raw.find("{"), raw.rfind("}")
+            if start != -1 and end > start:
+                try:
+                    data = json.loads(raw[start:end + 1])
+                except ValueError:
+                    data = None
+        if not isinstance(data, dict) or not data.get("message"):
+            return {"thought": "", "message": raw, "agreed": False}
+        agreed = data.get("agreed", False)
+        if isinstance(agreed, str):
+            agreed = agreed.strip().lower() in ("true", "yes", "ha", "1")
+        return {"thought": str(data.get("thought", "")), "message": str(data["message"]), "agreed": bool(agreed)}
+
+    def _call_llm(self, prompt: str, json_mode: bool = False) -> str:
         if not self.api_key:
             return "Error: No API Key provided."
         
@@ -53,8 +127,31 @@ class NexusAgent:
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.7
         }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        started = time.perf_counter()
         try:
-            response = requests.post(self.url, headers=headers, json=data)
-            return response.json()['choices'][0]['message']['content']
+            response = get_session().post(self.url, headers=headers, json=data, timeout=NEXUS_LLM_TIMEOUT)
+            result = response.json()
+            self._record(data["model"], result.get("usage") or {}, started, "ok" if response.ok else "error")
+            return result['choices'][0]['message']['content']
         except Exception as e:
+            self._record(data["model"], {}, started, "error")
             return f"Error connecting to AI: {str(e)}"
+
+    def _record(self, model: str, usage: Dict, started: float, status: str):
+        """Token va kechikishni yig'ish, recorder berilgan bo'lsa unga uzatish"""
+        entry = {
+            "model": model,
+            "feature": f"a2a:{self.name}",
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "status": status,
+        }
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += entry["prompt_tokens"]
+        self.usage["completion_tokens"] += entry["completion_tokens"]
+        self.usage["latency_ms"] += entry["latency_ms"]
+        if self.recorder:
+            self.recorder(entry)
@@ -1,52 +1,128 @@
 from core import NexusAgent
+import asyncio
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
+# Kontekstda so'zma-so'z saqlanadigan oxirgi xabarlar soni; eskilari xulosaga yig'iladi
+NEXUS_CONTEXT_WINDOW = int(os.getenv("NEXUS_CONTEXT_WINDOW", 4))
+# Xulosaning maksimal uzunligi (belgi)
+NEXUS_SUMMARY_CHARS = int(os.getenv("NEXUS_SUMMARY_CHARS", 600))
+
+
 class NegotiationHub:
-    def __init__(self, agent_a: NexusAgent, agent_b: NexusAgent):
+    def __init__(self, agent_a: NexusAgent, agent_b: NexusAgent,
+                 context_window: int = NEXUS_CONTEXT_WINDOW, summary_chars: int = NEXUS_SUMMARY_CHARS):
         self.agent_a = agent_a
         self.agent_b = agent_b
         self.history: List[Dict] = []
         self.is_finished = False
+        self.context_window = max(1, context_window)
+        self.summary_chars = summary_chars
+        self.initial_context = ""
+        self.summary = ""
+        self.recent: List[Dict] = []
+
+    def _context(self) -> str:
+        """Boshlang'ich vaziyat + eski xabarlar xulosasi + oxirgi xabarlar"""
+        parts = [self.initial_context]
+        if self.summary:
+            parts.append(f"Oldingi muzokara xulosasi: {self.summary}")
+        parts.extend(f"{m['agent']} dedi: {m['message']}" for m in self.recent)
+        return "\n".join(parts)
+
+    def _remember(self, agent: str, message: str):
+        self.recent.append({"agent": agent, "message": message})
+        # Oyna ikki baravar to'lganda eng eski yarmi bitta LLM chaqiruvi bilan xulosaga qo'shiladi
+        if len(self.recent) >= 2 * self.context_window:
+            old, self.recent = self.recent[:self.context_window], self.recent[self.context_window:]
+            self.summary = self._summarize(old)
+
+    def _summarize(self, messages: List[Dict]) -> str:
+        transcript = "\n".join(f"{m['agent']}: {m['message']}" for m in messages)
+        prompt = f"""
+        Muzokaraning avvalgi xulosasi: {self.summary or "yo'q"}
+        Yangi xabarlar:
+        {transcript}
+
+        Yuqoridagilarni {self.summary_chars} belgidan oshmaydigan bitta qisqa xulosaga birlashtiring:
+        taklif qilingan narxlar, shartlar va hali kelishilmagan masalalar.
+        """
+        summary = self.agent_a._call_llm(prompt)
+        if summary.startswith("Error"):
+            # LLM ishlamasa: eski xulosa + xabarlar, kesib olingan
+            summary = f"{self.summary} {transcript}".strip()
+        return summary.strip()[-self.summary_chars:]
+
+    def run_negotiation(self, initial_context: str, max_rounds: int = 5, verbose: bool = True):
+        self.initial_context = initial_context
+        log = print if verbose else (lambda *args, **kwargs: None)
+        log(f"[*] Muzokara boshlandi: {self.agent_a.name} vs {self.agent_b.name}")
 
-    def run_negotiation(self, initial_context: str, max_rounds: int = 5):
-        current_context = initial_context
-        print(f"[*] Muzokara boshlandi: {self.agent_a.name} vs {self.agent_b.name}")
 
-        
         for round_num in range(1, max_rounds + 1):
             if self.is_finished:
                 break
-                
-            print(f"\n--- Raund {round_num} ---")
-            
-            # Agent A turn
-            thought_a = self.agent_a.think(current_context)
-            message_a = self.agent_a.speak(current_context, thought_a)
-            self.history.append({"agent": self.agent_a.name, "message": message_a, "thought": thought_a})
-            print(f"🤖 {self.agent_a.name}: {message_a}")
-            
-            # Update context for Agent B
-            current_context += f"\n{self.agent_a.name} dedi: {message_a}"
-            
-            # Agent B turn
-            thought_b = self.agent_b.think(current_context)
-            message_b = self.agent_b.speak(current_context, thought_b)
-            self.history.append({"agent": self.agent_b.name, "message": message_b, "thought": thought_b})
-            print(f"🤖 {self.agent_b.name}: {message_b}")
-            
-            # Update context for Agent A for next round
-            current_context += f"\n{self.agent_b.name} dedi: {message_b}"
-            
-            # Simple consensus check (to be improved)
-            if "kelishdik" in message_a.lower() or "kelishdik" in message_b.lower() or \
-               "agree" in message_a.lower() or "agree" in message_b.lower():
-                print("\n[+] Konsensusga erishildi!")
-
-                self.is_finished = True
-                
+
+            log(f"\n--- Raund {round_num} ---")
+
+            # Har bir navbat bitta LLM chaqiruvi; kelishuv navbat sayin tekshiriladi
+            for agent in (self.agent_a, self.agent_b):
+                turn = agent.act(self._context())
+                self.history.append({"agent": agent.name, "message": turn["message"],
+                                     "thought": turn["thought"], "agreed": turn["agreed"]})
+                log(f"🤖 {agent.name}: {turn['message']}")
+                self._remember(agent.name, turn["message"])
+
+                # Birinchi xabarda qabul qilinadigan taklif hali yo'q
+                if turn["agreed"] and len(self.history) > 1:
+                    log(f"\n[+] Konsensusga erishildi! ({agent.name} taklifni qabul qildi)")
+                    self.is_finished = True
+                    break
+
         if not self.is_finished:
-            print("\n[!] Maksimal raundlar tugadi, lekin aniq to'xtamga kelinmadi.")
+            log("\n[!] Maksimal raundlar tugadi, lekin aniq to'xtamga kelinmadi.")
+
 
-            
         return self.history
+
+
+async def run_batch(hubs: List[NegotiationHub], initial_contexts: List[str], max_rounds: int = 5,
+                    concurrency: int = 8) -> Dict:
+    """Bir-biriga bog'liq bo'lmagan muzokaralarni parallel o'tkazish.
+
+    Bitta muzokara ichidagi navbatlar ketma-ket (B agent A ning xabariga javob beradi),
+    parallellik muzokaralar o'rtasida. Har bir muzokara alohida oqimda ishlaydi va umumiy
+    HTTP hovuzdan foydalanadi; bir vaqtda ``concurrency`` tadan ko'p emas.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def run_one(hub: NegotiationHub, context: str):
+            async with semaphore:
+                started = time.perf_counter()
+                history = await loop.run_in_executor(executor, hub.run_negotiation, context, max_rounds, False)
+                return history, time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run_one(hub, ctx) for hub, ctx in zip(hubs, initial_contexts)))
+        elapsed = time.perf_counter() - started
+
+    agents = [agent for hub in hubs for agent in (hub.agent_a, hub.agent_b)]
+    calls = sum(agent.usage["calls"] for agent in agents)
+    durations = sorted(duration for _, duration in results)
+    return {
+        "negotiations": len(results),
+        "agreed": sum(1 for hub in hubs if hub.is_finished),
+        "elapsed_s": elapsed,
+        "negotiations_per_s": len(results) / elapsed if elapsed else 0.0,
+        "llm_calls": calls,
+        "llm_calls_per_s": calls / elapsed if elapsed else 0.0,
+        "prompt_tokens": sum(agent.usage["prompt_tokens"] for agent in agents),
+        "completion_tokens": sum(agent.usage["completion_tokens"] for agent in agents),
+        "p50_negotiation_s": durations[len(durations) // 2] if durations else 0.0,
+        "max_negotiation_s": durations[-1] if durations else 0.0,
+        "histories": [history for history, _ in results],
+    }
@@ -1,11 +1,17 @@
+import argparse
+import asyncio
 import os
 from dotenv import load_dotenv
 from core import NexusAgent
-from engine import NegotiationHub
+from engine import NegotiationHub, run_batch
 
 load_dotenv()
 
-    print("--- Muzokara boshlanmoqda ---")
+INITIAL_CONTEXT = "Sotuvchi iPhone 15 Pro Max uchun $1100 narx so'ramoqda. Haridor muzokarani boshlaydi."
+
+
+def make_hub():
+    # 1. Agentlarni yaratish
     buyer = NexusAgent(
         name="Haridor-Bot",
         role="Xizmat oluvchi",
@@ -21,11 +27,31 @@ load_dotenv()
     )
     
     # 2. Muzokara xonasini yaratish
-    hub = NegotiationHub(buyer, seller)
+    return NegotiationHub(buyer, seller)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A2A Nexus muzokara")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=0, help="parallel o'tkaziladigan muzokaralar soni")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.batch:
+        hubs = [make_hub() for _ in range(args.batch)]
+        report = asyncio.run(run_batch(hubs, [INITIAL_CONTEXT] * args.batch, args.rounds, args.concurrency))
+        print(f"Muzokaralar: {report['negotiations']} (kelishilgan: {report['agreed']}) "
+              f"{report['elapsed_s']:.2f} s ichida")
+        print(f"Throughput: {report['negotiations_per_s']:.2f} muzokara/s, {report['llm_calls_per_s']:.1f} LLM chaqiruv/s")
+        print(f"Tokenlar: prompt {report['prompt_tokens']}, javob {report['completion_tokens']}")
+        print(f"Muzokara davomiyligi: p50 {report['p50_negotiation_s']:.2f} s, maks {report['max_negotiation_s']:.2f} s")
+        return
+
+    print("--- Muzokara boshlanmoqda ---")
+    hub = make_hub()
     
     # 3. Muzokarani boshlash
-    initial_context = "Sotuvchi iPhone 15 Pro Max uchun $1100 narx so'ramoqda. Haridor muzokarani boshlaydi."
-    hub.run_negotiation(initial_context, max_rounds=3)
+    hub.run_negotiation(INITIAL_CONTEXT, max_rounds=args.rounds)
 
 if __name__ == "__main__":
     main()
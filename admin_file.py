@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from functools import wraps
+import os
 from datetime import datetime, timedelta
-from models import db, User, Subject, TestResult, UserProgress, Question, Quiz, Group, Message, GroupMember, Assignment
+from models import db, User, Subject, TestResult, UserProgress, Question, Quiz, Group, Message, GroupMember, Assignment, AICallLog, subject_cache, recalculate_total_scores, bump_quiz_versions
+from question_bank import QuestionValidationError, build_question_rows, bulk_insert_questions, parse_question_bank
+from perf import route_stats, list_profiles, PERF_PROFILE, PERF_PROFILE_THRESHOLD_MS
+from ai_usage import ai_usage
 
 # Admin Blueprint yaratish
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin', 
@@ -27,7 +31,7 @@ def dashboard():
     # Asosiy statistikalar
     stats = {
         'total_users': User.query.count(),
-        'total_subjects': Subject.query.count(),
+        'total_subjects': subject_cache.count(),
         'total_questions': Question.query.count(),
         'total_tests': TestResult.query.count(),
         'today_tests': TestResult.query.filter(
@@ -153,6 +157,9 @@ def delete_user(user_id):
     # Hozircha oddiy yondashuv: o'qituvchining guruhlari va testlarini o'chiramiz
     if user.role == 'teacher':
         quizzes = Quiz.query.filter_by(teacher_id=user_id).all()
+        # Natijalari o'chiriladigan o'quvchilarning umumiy bali qayta hisoblanadi
+        affected_users = [uid for (uid,) in db.session.query(TestResult.user_id).distinct()
+                          .filter(TestResult.quiz_id.in_([q.id for q in quizzes]))]
         for quiz in quizzes:
             # Testga bog'liq savollar va natijalar
             Question.query.filter_by(quiz_id=quiz.id).delete()
@@ -167,6 +174,8 @@ def delete_user(user_id):
             Assignment.query.filter_by(group_id=group.id).delete()
             db.session.delete(group)
 
+        recalculate_total_scores(affected_users)
+
     db.session.delete(user)
     db.session.commit()
     
@@ -179,7 +188,7 @@ def delete_user(user_id):
 @admin_required
 def subjects_management():
     """Fanlarni boshqarish"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     return render_template('admin/subjects.html', subjects=subjects)
 
 @admin_bp.route('/subjects/add', methods=['POST'])
@@ -206,21 +215,10 @@ def add_subject():
         description=description
     )
     
+    # Foydalanuvchilar uchun progress qatorlari kerak emas: yo'q qator 0% hisoblanadi
     db.session.add(subject)
     db.session.commit()
     
-    # Barcha foydalanuvchilar uchun yangi fan progressi yaratish
-    users = User.query.all()
-    for user in users:
-        progress = UserProgress(
-            user_id=user.id,
-            subject_id=subject.id,
-            progress_percentage=0
-        )
-        db.session.add(progress)
-    
-    db.session.commit()
-    
     flash(f'{name} fani muvaffaqiyatli qo\'shildi', 'success')
     return redirect(url_for('admin.subjects_management'))
 
@@ -249,8 +247,13 @@ def delete_subject(subject_id):
     subject = Subject.query.get_or_404(subject_id)
     
     # Fanga tegishli ma'lumotlarni o'chirish
+    affected_users = [uid for (uid,) in db.session.query(TestResult.user_id).distinct()
+                      .filter(TestResult.subject_id == subject_id)]
+    bump_quiz_versions(quiz_id for (quiz_id,) in db.session.query(Question.quiz_id).distinct()
+                       .filter(Question.subject_id == subject_id))
     Question.query.filter_by(subject_id=subject_id).delete()
     TestResult.query.filter_by(subject_id=subject_id).delete()
+    recalculate_total_scores(affected_users)
     UserProgress.query.filter_by(subject_id=subject_id).delete()
     
     db.session.delete(subject)
@@ -282,7 +285,7 @@ def questions_management():
         page=page, per_page=15, error_out=False
     )
     
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     return render_template('admin/questions.html',
                          questions=questions,
                          subjects=subjects,
@@ -294,7 +297,7 @@ def questions_management():
 @admin_required
 def add_question():
     """Yangi savol qo'shish"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     
     if request.method == 'POST':
         try:
@@ -336,13 +339,50 @@ def add_question():
     
     return render_template('admin/add_question.html', subjects=subjects)
 
+@admin_bp.route('/questions/import', methods=['POST'])
+@login_required
+@admin_required
+def import_questions():
+    """Savollar bankini CSV yoki JSON fayldan import qilish"""
+    file = request.files.get('file')
+    subject_id = request.form.get('subject_id', type=int)
+    quiz_title = request.form.get('quiz_title', '').strip()
+    
+    if not file or file.filename == '':
+        flash('Fayl tanlanmadi', 'error')
+        return redirect(url_for('admin_content'))
+    
+    try:
+        questions_data = parse_question_bank(file.filename, file.read())
+        # Avval hammasi tekshiriladi: xato bo'lsa hech narsa yozilmaydi
+        rows = build_question_rows(questions_data, subject_id=subject_id)
+        
+        quiz_id = None
+        if quiz_title:
+            quiz = Quiz(title=quiz_title, teacher_id=current_user.id, subject_id=subject_id)
+            db.session.add(quiz)
+            db.session.flush()
+            quiz_id = quiz.id
+        
+        count = bulk_insert_questions(rows, quiz_id=quiz_id)
+        db.session.commit()
+        flash(f'{count} ta savol import qilindi', 'success')
+    except QuestionValidationError as e:
+        db.session.rollback()
+        flash(f'Import xatosi: {e}', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Xatolik: {str(e)}', 'error')
+    
+    return redirect(url_for('admin_content'))
+
 @admin_bp.route('/questions/<int:question_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_question(question_id):
     """Savolni tahrirlash"""
     question = Question.query.get_or_404(question_id)
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     
     if request.method == 'POST':
         try:
@@ -417,7 +457,7 @@ def test_results():
         page=page, per_page=20, error_out=False
     )
     
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     users = User.query.all()
     
     return render_template('admin/test_results.html',
@@ -462,6 +502,67 @@ def analytics():
                          subject_stats=subject_stats,
                          top_scores=top_scores)
 
+# === ISHLASH TEZLIGI ===
+@admin_bp.route('/perf')
+@login_required
+@admin_required
+def perf():
+    """Endpointlar kechikishi va SQL so'rovlar soni (joriy worker jarayoni)"""
+    return render_template('admin/perf.html',
+                         routes=route_stats.snapshot(),
+                         profiles=list_profiles(),
+                         profiling=PERF_PROFILE,
+                         threshold_ms=PERF_PROFILE_THRESHOLD_MS,
+                         pid=os.getpid())
+
+@admin_bp.route('/perf/reset', methods=['POST'])
+@login_required
+@admin_required
+def perf_reset():
+    """Statistikani tozalash"""
+    route_stats.reset()
+    flash('Statistika tozalandi', 'success')
+    return redirect(url_for('admin.perf'))
+
+# === AI SARFI ===
+@admin_bp.route('/ai-usage')
+@login_required
+@admin_required
+def ai_usage_report():
+    """AI chaqiruvlari: funksiya (route) va kun bo'yicha tokenlar va kechikish"""
+    days = min(max(request.args.get('days', 7, type=int), 1), 365)
+    since = datetime.now() - timedelta(days=days)
+    # Buferdagi yozuvlar ham hisobotga tushsin
+    ai_usage.flush()
+
+    total_tokens = db.func.sum(AICallLog.prompt_tokens + AICallLog.completion_tokens)
+    errors = db.func.sum(db.case((AICallLog.status.in_(['error', 'rate_limited', 'fallback']), 1), else_=0))
+    shared = db.func.sum(db.case((AICallLog.cache_hit == True, 1), else_=0))
+
+    def aggregate(column):
+        return db.session.query(
+            column.label('key'),
+            db.func.count(AICallLog.id).label('calls'),
+            db.func.sum(AICallLog.prompt_tokens).label('prompt_tokens'),
+            db.func.sum(AICallLog.completion_tokens).label('completion_tokens'),
+            total_tokens.label('total_tokens'),
+            db.func.avg(AICallLog.latency_ms).label('avg_latency'),
+            db.func.max(AICallLog.latency_ms).label('max_latency'),
+            errors.label('errors'),
+            shared.label('cache_hits')
+        ).filter(AICallLog.created_at >= since).group_by(column)
+
+    by_feature = aggregate(AICallLog.feature).order_by(db.desc('total_tokens')).all()
+    by_model = aggregate(AICallLog.model).order_by(db.desc('total_tokens')).all()
+    day = db.func.date(AICallLog.created_at)
+    by_day = aggregate(day).order_by(day.desc()).all()
+
+    return render_template('admin/ai_usage.html',
+                         days=days,
+                         by_feature=by_feature,
+                         by_model=by_model,
+                         by_day=by_day)
+
 # === API ENDPOINTS ===
 @admin_bp.route('/api/stats')
 @login_required
@@ -470,7 +571,7 @@ def api_stats():
     """Admin statistikasi API"""
     stats = {
         'total_users': User.query.count(),
-        'total_subjects': Subject.query.count(),
+        'total_subjects': subject_cache.count(),
         'total_questions': Question.query.count(),
         'total_tests': TestResult.query.count(),
         'active_today': TestResult.query.filter(
@@ -0,0 +1,235 @@
+# ai_limits.py
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Provayder limitlari (har bir model uchun alohida): so'rov/daqiqa va token/daqiqa
+GROQ_RPM = int(os.environ.get('GROQ_RPM', 30))
+GROQ_TPM = int(os.environ.get('GROQ_TPM', 6000))
+# Bucket holati shu faylda (flock bilan): bitta serverdagi barcha gunicorn workerlari
+# umumiy limitdan foydalanadi. Bo'sh qiymat - har bir jarayon o'z holatida.
+AI_RATE_STATE_FILE = os.environ.get('AI_RATE_STATE_FILE',
+                                    os.path.join(tempfile.gettempdir(), 'groq_rate_state.json'))
+# Bir API kalitini ishlatadigan serverlar soni: limit ular orasida teng bo'linadi
+GROQ_RATE_SHARE = int(os.environ.get('GROQ_RATE_SHARE', 1))
+# AI_RATE_LIMIT=0 - limiterni o'chirish (benchmark solishtiruvi uchun)
+AI_RATE_LIMIT = os.environ.get('AI_RATE_LIMIT', '1') != '0'
+
+
+class TokenBucket:
+    """Klassik token bucket: ``rate`` token/soniya, maksimal ``capacity``.
+
+    Holat ``state`` ro'yxatida (``[tokens, updated]``, ``time.time()`` bo'yicha):
+    limiter uni jarayonlar orasidagi umumiy fayldan o'qib, joyida o'zgartiradi.
+    """
+
+    def __init__(self, rate, capacity, state=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.state = state if state is not None else [capacity, time.time()]
+
+    @property
+    def tokens(self):
+        return self.state[0]
+
+    @tokens.setter
+    def tokens(self, value):
+        self.state[0] = value
+
+    @property
+    def updated(self):
+        return self.state[1]
+
+    @updated.setter
+    def updated(self, value):
+        self.state[1] = value
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """``amount`` token yetishi uchun kutish vaqti (0 - hozir mumkin)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelRateLimiter:
+    """Har bir model uchun RPM va TPM bucketlari, 429 dan keyingi blokirovka.
+
+    ``reserve`` navbatdagi modellardan hozir sig'adiganini tanlaydi; hech
+    biri sig'masa, eng tez bo'shaydiganini deadline gacha kutadi. Holat
+    ``state_file`` da saqlanadi, shuning uchun limit bitta serverdagi barcha
+    worker jarayonlari uchun umumiy.
+    """
+
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM, share=GROQ_RATE_SHARE, enabled=AI_RATE_LIMIT,
+                 state_file=AI_RATE_STATE_FILE):
+        share = max(1, share)
+        self.rpm = rpm / share
+        self.tpm = tpm / share
+        self.enabled = enabled
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._models = {}
+        self.stats = {'reserved': 0, 'waited': 0, 'expired': 0, 'rate_limited': 0}
+
+    @contextmanager
+    def _shared(self):
+        """Barcha modellar holati: jarayon ichida lock, jarayonlar orasida flock"""
+        with self._lock:
+            if not self.state_file:
+                yield self._models
+                return
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), 'r+') as f:
+                    try:
+                        models = json.load(f)
+                    except ValueError:
+                        models = {}
+                    yield models
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(models, f)
+            finally:
+                os.close(fd)
+
+    def _state(self, models, model):
+        state = models.get(model)
+        if state is None:
+            # Yarim daqiqalik limit birdaniga ruxsat etiladi. Provayderning 60 soniyalik
+            # oynasidan oshib ketish ehtimoli 429 + retry-after orqali qoplanadi (penalize).
+            state = models[model] = {
+                'requests': [max(1.0, self.rpm / 2), time.time()],
+                'tokens': [max(1.0, self.tpm / 2), time.time()],
+                'blocked_until': 0.0,
+            }
+        return {
+            'requests': TokenBucket(self.rpm / 60.0, max(1.0, self.rpm / 2), state['requests']),
+            'tokens': TokenBucket(self.tpm / 60.0, max(1.0, self.tpm / 2), state['tokens']),
+            'raw': state,
+        }
+
+    def reserve(self, models, tokens, deadline):
+        """Bitta so'rov uchun model tanlash. Deadline gacha joy bo'lmasa None."""
+        if not self.enabled:
+            return models[0] if models else None
+        waited = False
+        while True:
+            with self._shared() as shared:
+                now = time.time()
+                best_wait = None
+                for model in models:
+                    state = self._state(shared, model)
+                    wait = max(state['raw']['blocked_until'] - now,
+                               state['requests'].wait_time(1, now),
+                               state['tokens'].wait_time(tokens, now))
+                    if wait <= 0:
+                        state['requests'].take(1)
+                        state['tokens'].take(tokens)
+                        self.stats['reserved'] += 1
+                        self.stats['waited'] += waited
+                        return model
+                    best_wait = wait if best_wait is None else min(best_wait, wait)
+                if best_wait is None or time.monotonic() + best_wait > deadline:
+                    self.stats['expired'] += 1
+                    return None
+            waited = True
+            time.sleep(min(best_wait, 1.0))
+
+    def settle(self, model, reserved, used):
+        """Haqiqiy token sarfi ma'lum bo'lganda farqni bucketga qaytarish"""
+        if not self.enabled or used is None:
+            return
+        with self._shared() as shared:
+            bucket = self._state(shared, model)['tokens']
+            if used < reserved:
+                bucket.give_back(reserved - used)
+            else:
+                bucket.take(used - reserved)
+
+    def penalize(self, model, retry_after):
+        """429 javobidan keyin modelni retry-after muddatiga to'xtatish"""
+        self.stats['rate_limited'] += 1
+        if not self.enabled:
+            return
+        with self._shared() as shared:
+            state = self._state(shared, model)
+            state['raw']['blocked_until'] = max(state['raw']['blocked_until'], time.time() + retry_after)
+            state['requests'].tokens = 0
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Bir xil kalitli parallel so'rovlar bitta upstream chaqiruvni bo'lishadi"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def run(self, key, fn, on_shared=None, deadline=None, on_timeout=None):
+        """``fn`` ni bajarish yoki shu kalit bo'yicha ketayotgan chaqiruv natijasini kutish.
+        ``on_shared`` natija boshqa chaqiruvdan olinganda chaqiriladi. Kutuvchi
+        ``deadline`` (``time.monotonic``) gacha natija olmasa, ``on_timeout()``
+        qaytariladi (berilmagan bo'lsa TimeoutError) - yetakchi osilib qolsa ham."""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.stats['leaders'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call.event.wait(timeout):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                if on_timeout is None:
+                    raise TimeoutError(f"coalesced call did not finish before deadline: {key[:80]}")
+                return on_timeout()
+            if call.error is not None:
+                raise call.error
+            if on_shared:
+                on_shared()
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+
+ai_limiter = ModelRateLimiter()
+ai_coalescer = RequestCoalescer()
@@ -1,15 +1,168 @@
 # ai_model.py
-import requests
 import json
 import random
 import os
+import re
+import math
+import bisect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_json import iter_json_objects
+from ai_limits import ai_limiter, ai_coalescer
+from ai_usage import ai_usage, current_scope, scope as usage_scope
+
+# generate_quiz_from_text modelga yuboradigan matn hajmi (belgilar)
+QUIZ_TEXT_LIMIT = 2000
+# Butun hujjatdan test tuzishda: parallel so'rovlar va bo'laklar soni chegarasi
+QUIZ_CHUNK_CONCURRENCY = int(os.environ.get('QUIZ_CHUNK_CONCURRENCY', 6))
+QUIZ_MAX_CHUNKS = int(os.environ.get('QUIZ_MAX_CHUNKS', 12))
+# Hujjatdan o'qiladigan matnning yuqori chegarasi (juda katta kitoblar uchun)
+QUIZ_DOCUMENT_LIMIT = int(os.environ.get('QUIZ_DOCUMENT_LIMIT', 500000))
+# Takrorlanishlarni olib tashlashdan keyin yetarli savol qolishi uchun zaxira
+QUIZ_OVERSAMPLE = 1.5
+# Qisman javobda yetishmagan savollarni qayta so'rashlar soni
+QUIZ_RETRY_ATTEMPTS = int(os.environ.get('QUIZ_RETRY_ATTEMPTS', 1))
+# Groq API ga ochiq ulanishlar soni (AI hovuzi va parallel bo'laklar uchun yetarli)
+AI_HTTP_POOL_SIZE = int(os.environ.get('AI_HTTP_POOL_SIZE', 32))
+# OpenAI-mos API manzili (oflayn testlar uchun: benchmarks/groq_stub.py)
+GROQ_BASE_URL = os.environ.get('GROQ_BASE_URL', 'https://api.groq.com/openai/v1')
+# Bitta AI javobi uchun umumiy muddat (navbatda kutish + so'rov), soniya
+AI_REQUEST_DEADLINE = float(os.environ.get('AI_REQUEST_DEADLINE', 30))
+AI_MAX_TOKENS = 500
+# Batch baholash: bitta so'rovdagi javoblar uchun prompt byudjeti (token),
+# bitta {"id", "score", "feedback"} javobining taxminiy hajmi va qayta so'rashlar
+GRADE_BATCH_TOKENS = int(os.environ.get('GRADE_BATCH_TOKENS', 2000))
+GRADE_RESULT_TOKENS = 40
+GRADE_RETRY_ATTEMPTS = int(os.environ.get('GRADE_RETRY_ATTEMPTS', 1))
+# _try_model natijasi: model 429 qaytardi, limiter retry-after ni bilib oldi
+RATE_LIMITED = "RATE_LIMITED"
+
+
+def split_into_chunks(text, chunk_chars=QUIZ_TEXT_LIMIT):
+    """Matnni paragraf va gap chegaralari bo'yicha bo'laklarga ajratish.
+
+    Har bir bo'lak (start, end) pozitsiyalari bilan qaytariladi.
+    """
+    chunks = []
+    start = None
+    end = 0
+    for match in re.finditer(r'[^\n]+(?:\n(?!\n)[^\n]+)*', text):
+        para_start, para_end = match.span()
+        # Juda uzun paragraf gaplar bo'yicha bo'linadi
+        pieces = [(para_start, para_end)]
+        if para_end - para_start > chunk_chars:
+            pieces = [(para_start + m.start(), para_start + m.end())
+                      for m in re.finditer(r'.+?(?:[.!?](?=\s)|$)', match.group(0), re.DOTALL)]
+        for piece_start, piece_end in pieces:
+            if start is not None and piece_end - start > chunk_chars:
+                chunks.append((start, end))
+                start = None
+            if start is None:
+                start = piece_start
+            end = min(piece_end, start + chunk_chars)
+    if start is not None:
+        chunks.append((start, end))
+    return chunks
+
+
+def _question_key(question):
+    return re.sub(r'\W+', ' ', str(question.get('question', ''))).strip().lower()
+
+QUESTION_KEY_MAP = {
+    'savol': 'question',
+    'variantlar': 'options',
+    'to\'g\'ri_javob': 'correct_answer',
+    'togri_javob': 'correct_answer',
+    'variants': 'options',
+    'javob': 'correct_answer'
+}
+OPTION_KEYS = ('A', 'B', 'C', 'D')
+
+
+def _map_question_keys(q):
+    """Kalitlarni xarita asosida o'zgartirish (Uzbek -> English)"""
+    return {QUESTION_KEY_MAP.get(str(k).lower(), str(k).lower()): v for k, v in q.items()}
+
+
+def validate_question(q):
+    """Savolni sxema bo'yicha tekshirish: normallashgan savol yoki None.
+
+    Talablar: bo'sh bo'lmagan ``question``, A-D variantlar (lug'at yoki
+    4 ta elementli ro'yxat) va ``correct_answer`` A-D dan biri (yoki
+    variant matnining o'zi).
+    """
+    if not isinstance(q, dict):
+        return None
+    q = _map_question_keys(q)
+
+    text = q.get('question')
+    if not isinstance(text, str) or not text.strip():
+        return None
+
+    options = q.get('options')
+    if isinstance(options, list) and len(options) == len(OPTION_KEYS):
+        options = dict(zip(OPTION_KEYS, options))
+    if not isinstance(options, dict):
+        return None
+    options = {str(k).strip().upper().rstrip(').'): v for k, v in options.items()}
+    if any(not isinstance(options.get(k), (str, int, float)) or str(options[k]).strip() == '' for k in OPTION_KEYS):
+        return None
+    options = {k: str(options[k]).strip() for k in OPTION_KEYS}
+
+    answer = str(q.get('correct_answer', '')).strip()
+    letter = answer.upper().rstrip(').')
+    if letter not in OPTION_KEYS:
+        letter = next((k for k, v in options.items() if v == answer), None)
+        if letter is None:
+            return None
+
+    q['question'] = text.strip()
+    q['options'] = options
+    q['correct_answer'] = letter
+    return q
+
+
+def validate_grade(obj):
+    """Baholash javobini tekshirish: {"score": 0-100, "feedback": str} yoki None"""
+    if not isinstance(obj, dict) or 'score' not in obj:
+        return None
+    try:
+        score = float(obj['score'])
+    except (TypeError, ValueError):
+        return None
+    return {"score": int(max(0, min(100, score))), "feedback": str(obj.get('feedback', ''))}
+
+
+def extract_questions(response):
+    """LLM javobidan sxemaga mos barcha savollarni ajratish (kesilgan javob ham)"""
+    questions = []
+    for obj in iter_json_objects(response):
+        candidates = [obj]
+        # {"questions": [...]} kabi o'ralgan javob
+        if 'question' not in obj and 'savol' not in obj:
+            candidates = [item for value in obj.values() if isinstance(value, list) for item in value]
+        for candidate in candidates:
+            q = validate_question(candidate)
+            if q:
+                questions.append(q)
+    return questions
+
+
+def _exclude_instruction(existing):
+    if not existing:
+        return ""
+    listed = "\n".join(f"        - {q['question']}" for q in existing)
+    return f"4. Quyidagi savollarni TAKRORLAMA:\n{listed}\n"
+
 
 class GroqAIAssistant:
-    def __init__(self):
+    def __init__(self, base_url=None):
         # Env var is required for deployment
         self.api_key = os.environ.get("GROQ_API_KEY", "")
 
-        self.url = "https://api.groq.com/openai/v1/chat/completions"
+        self.url = f"{(base_url or GROQ_BASE_URL).rstrip('/')}/chat/completions"
         self.is_loaded = True
         self.available_models = [
             "llama-3.1-8b-instant",      # Eng yangi va tez
@@ -20,22 +173,78 @@ class GroqAIAssistant:
             "gemma2-9b-it"               # Google modeli
         ]
         self.current_model = self.available_models[0]
+        self._session = None
+        self._session_lock = threading.Lock()
         print("Groq AI Assistant ishga tayyor!")
         print(f"Model: {self.current_model}")
     
-    def generate_response(self, user_message, user_context=""):
-        """Groq API orqali javob olish"""
+    def _get_session(self):
+        """Jarayon bo'yicha umumiy HTTP sessiya: keep-alive ulanishlar qayta ishlatiladi.
+
+        gevent worker'da requests monkey-patch qilingan socketlardan
+        foydalanadi, shuning uchun kutish boshqa greenletlarni to'xtatmaydi.
+        """
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=AI_HTTP_POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def generate_response(self, user_message, user_context="", deadline=None, coalesce=True):
+        """Groq API orqali javob olish.
+
+        Bir xil (xabar, kontekst) bilan parallel kelgan so'rovlar bitta
+        upstream chaqiruvni kutadi. Model limiter orqali tanlanadi: limiti
+        to'lgan modelga so'rov yuborilmaydi, hammasi band bo'lsa deadline
+        gacha navbatda turiladi. Boshqa chaqiruvni kutayotganlar ham shu
+        deadline dan keyin fallback javob oladi.
+
+        ``coalesce=False`` har bir chaqiruvga alohida javob kerak bo'lganda
+        (savollar tuzish): bir xil prompt ham birlashtirilmaydi.
+        """
         print(f"Foydalanuvchi xabari: {user_message}")
-        
-        # Avval barcha modellarni urinib ko'ramiz
-        for model in self.available_models:
+        deadline = deadline or time.monotonic() + AI_REQUEST_DEADLINE
+        if not coalesce:
+            return self._generate_response(user_message, user_context, deadline)
+        key = json.dumps([user_message, user_context], ensure_ascii=False)
+        return ai_coalescer.run(key, lambda: self._generate_response(user_message, user_context, deadline),
+                                on_shared=lambda: ai_usage.record(None, status='ok', cache_hit=True),
+                                deadline=deadline, on_timeout=lambda: self._fallback(user_message))
+
+    def _fallback(self, user_message):
+        ai_usage.record(None, status='fallback')
+        return self._get_fallback_response(user_message)
+
+    def _generate_response(self, user_message, user_context, deadline):
+        estimate = self._estimate_tokens(user_message, user_context)
+        failed = set()
+        while True:
+            candidates = [m for m in self.available_models if m not in failed]
+            model = ai_limiter.reserve(candidates, estimate, deadline) if candidates else None
+            if model is None:
+                break
             response = self._try_model(model, user_message, user_context)
-            if response and response != "FALLBACK":
+            if response == RATE_LIMITED and ai_limiter.enabled:
+                # Limiter modelni retry-after ga to'xtatdi, keyingi tanlov shuni hisobga oladi
+                continue
+            if response and response not in ("FALLBACK", RATE_LIMITED):
                 return response
-        
+            failed.add(model)
+
         # Agar hech biri ishlamasa, fallback
-        return self._get_fallback_response(user_message)
-    
+        return self._fallback(user_message)
+
+    def _estimate_tokens(self, user_message, user_context):
+        """So'rov uchun taxminiy token sarfi (~4 belgi = 1 token) + javob chegarasi"""
+        prompt = self._create_prompt(user_message, user_context)
+        return (len(prompt) + len(user_message)) // 4 + AI_MAX_TOKENS
+
     def _try_model(self, model, user_message, user_context):
         """Ma'lum model bilan urinib ko'rish"""
         try:
@@ -59,27 +268,42 @@ class GroqAIAssistant:
                 ],
                 "model": model,
                 "temperature": 0.7,
-                "max_tokens": 500,
+                "max_tokens": AI_MAX_TOKENS,
                 "top_p": 0.8
             }
             
             print(f"{model} ga so'rov yuborilmoqda...")
-            response = requests.post(self.url, headers=headers, json=data, timeout=20)
+            started = time.perf_counter()
+            response = self._get_session().post(self.url, headers=headers, json=data, timeout=20)
+            latency_ms = (time.perf_counter() - started) * 1000
+            if response.status_code == 429:
+                retry_after = response.headers.get('retry-after')
+                try:
+                    retry_after = float(retry_after)
+                except (TypeError, ValueError):
+                    retry_after = 2.0
+                print(f"{model}: limitga yetildi, {retry_after} s kutiladi")
+                ai_limiter.penalize(model, retry_after)
+                ai_usage.record(model, latency_ms=latency_ms, status='rate_limited')
+                return RATE_LIMITED
             result = response.json()
+            usage = result.get('usage') or {}
+            ai_limiter.settle(model, self._estimate_tokens(user_message, user_context), usage.get('total_tokens'))
             
             if 'choices' in result and len(result['choices']) > 0:
                 ai_response = result['choices'][0]['message']['content'].strip()
                 print(f"{model} javobi: {ai_response}")
                 self.current_model = model  # Ishlayotgan modelni saqlaymiz
+                ai_usage.record(model, usage.get('prompt_tokens'), usage.get('completion_tokens'), latency_ms)
                 return ai_response
             elif 'error' in result:
                 print(f"{model} xatosi: {result['error']['message']}")
-                return "FALLBACK"
-            else:
-                return "FALLBACK"
+            ai_usage.record(model, latency_ms=latency_ms, status='error')
+            return "FALLBACK"
                 
         except Exception as e:
             print(f"{model} xatosi: {e}")
+            ai_usage.record(model, status='error')
             return "FALLBACK"
     
     def _create_prompt(self, user_message, user_context):
@@ -140,23 +364,10 @@ Muhim: Faqat O'ZBEKCHA javob bering!"""
             return []
             
         normalized = []
-        mapping = {
-            'savol': 'question',
-            'variantlar': 'options',
-            'to\'g\'ri_javob': 'correct_answer',
-            'togri_javob': 'correct_answer',
-            'variants': 'options',
-            'javob': 'correct_answer'
-        }
-        
         for q in questions:
             if not isinstance(q, dict): continue
             
-            new_q = {}
-            # Kalitlarni xarita asosida o'zgartirish
-            for k, v in q.items():
-                norm_k = mapping.get(k.lower(), k.lower())
-                new_q[norm_k] = v
+            new_q = _map_question_keys(q)
             
             # Majburiy maydonlar mavjudligini tekshirish
             if 'question' not in new_q: new_q['question'] = "Savol topilmadi"
@@ -166,76 +377,172 @@ Muhim: Faqat O'ZBEKCHA javob bering!"""
             normalized.append(new_q)
         return normalized
 
-    def generate_quiz_from_text(self, text):
+    def _collect_questions(self, build_prompt, count, user_context):
+        """Savollarni so'rash va javobdan barcha yaroqli savollarni ajratish.
+
+        Javob kesilgan yoki qisman buzilgan bo'lsa, butun so'rov takrorlanmaydi:
+        faqat yetishmayotgan savollar soni qayta so'raladi. So'rovlar
+        birlashtirilmaydi: bir mavzudagi unique testni bir vaqtda ochgan
+        o'quvchilar bir xil savollar olmasligi kerak.
+        """
+        questions = []
+        seen = set()
+        for attempt in range(1 + QUIZ_RETRY_ATTEMPTS):
+            missing = count - len(questions)
+            if missing <= 0:
+                break
+            # Hech narsa ajratib bo'lmasa, qayta so'rash foyda bermaydi (API ishlamayapti)
+            if attempt > 0 and not questions:
+                break
+
+            response = self.generate_response(build_prompt(missing, questions), user_context, coalesce=False)
+            for q in extract_questions(response):
+                key = _question_key(q)
+                if key not in seen:
+                    seen.add(key)
+                    questions.append(q)
+
+            if attempt == 0 and 0 < len(questions) < count:
+                print(f"Qisman javob: {len(questions)}/{count} savol, {count - len(questions)} tasi qayta so'ralmoqda")
+        return questions[:count]
+
+    def generate_quiz_from_text(self, text, count=5):
         """Matndan testlar tuzish"""
-        prompt = """
-        Quyidagi matndan 5 ta test savolini tuzib ber.
+        try:
+            questions = self._questions_from_text(text, count)
+            if questions:
+                return questions
+        except Exception as e:
+            print(f"Quiz Generation Error: {e}")
+
+        return [
+            {
+                "question": "AI test tuza olmadi (API Xatosi). Bu namuna savol.",
+                "options": {"A": "To'g'ri", "B": "Xato", "C": "Bilmayman", "D": "Balki"},
+                "correct_answer": "A"
+            }
+        ]
+
+    def _questions_from_text(self, text, count):
+        """Matn bo'yicha savollar (namuna savolsiz: muvaffaqiyatsizlikda bo'sh ro'yxat)"""
+        def build_prompt(missing, existing):
+            return f"""
+        Quyidagi matndan {missing} ta test savolini tuzib ber.
         
         MUHIM QOIDA: 
         1. Javobni FAQAT va FAQAT JSON formatida qaytar.
         2. Kalitlar (keys) FAQAT ingliz tilida bo'lishi shart: "question", "options", "correct_answer".
         3. Savol va variantlar matni o'zbek tilida bo'lsin.
-        
+        {_exclude_instruction(existing)}
         Format aniq shunday bo'lsin:
         [
-            {
+            {{
                 "question": "Savol matni",
-                "options": {
+                "options": {{
                     "A": "Variant A",
                     "B": "Variant B",
                     "C": "Variant C",
                     "D": "Variant D"
-                },
+                }},
                 "correct_answer": "A"
-            }
+            }}
         ]
         
         Matn:
-        """ + text[:2000]
+        """ + text[:QUIZ_TEXT_LIMIT]
 
-        try:
-            import re
-            response = self.generate_response(prompt, "O'qituvchi test tuzmoqchi")
-            
-            if "```" in response:
-                if "```json" in response:
-                    response = response.split("```json")[1].split("```")[0]
-                else:
-                    response = response.split("```")[1].split("```")[0]
-            
-            response = response.strip()
-            
-            # Try to extract array with Regex
-            match = re.search(r'\[.*\]', response, re.DOTALL)
-            if match:
-                response = match.group(0)
-            
-            questions = json.loads(response)
-            return self._normalize_questions(questions)
-                
-        except Exception as e:
-            print(f"Quiz Generation Error: {e}")
-            return [
-                {
-                    "question": "AI test tuza olmadi (API Xatosi). Bu namuna savol.",
-                    "options": {"A": "To'g'ri", "B": "Xato", "C": "Bilmayman", "D": "Balki"},
-                    "correct_answer": "A"
-                }
-            ]
+        return self._collect_questions(build_prompt, count, "O'qituvchi test tuzmoqchi")
+
+    def generate_quiz_from_document(self, text, count=5, page_offsets=None):
+        """Butun hujjatdan test tuzish (map-reduce).
+
+        Matn bo'laklarga ajratiladi, hujjat bo'ylab teng taqsimlangan
+        QUIZ_MAX_CHUNKS tagacha bo'lak tanlanadi va har biri uchun savollar
+        parallel so'raladi. So'ng takrorlar olib tashlanib, bo'laklar
+        bo'yicha navbatma-navbat ``count`` ta savol tanlanadi.
+
+        ``(questions, coverage)`` qaytaradi.
+        """
+        chunks = split_into_chunks(text)
+        if not chunks:
+            return [], []
+
+        # Savollar sonidan ko'p bo'lak kerak emas; tanlov hujjat bo'ylab teng yoyiladi
+        limit = max(1, min(QUIZ_MAX_CHUNKS, count))
+        if len(chunks) > limit:
+            step = len(chunks) / limit
+            chunks = [chunks[int(i * step)] for i in range(limit)]
+
+        per_chunk = max(1, math.ceil(count * QUIZ_OVERSAMPLE / len(chunks)))
+
+        # Fon oqimlarida request konteksti yo'q: log manbasini shu yerda olamiz
+        origin = current_scope()
+
+        def generate(chunk):
+            start, end = chunk
+            try:
+                with usage_scope(**origin):
+                    return self._questions_from_text(text[start:end], per_chunk)
+            except Exception as e:
+                print(f"Chunk Quiz Generation Error: {e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=min(QUIZ_CHUNK_CONCURRENCY, len(chunks))) as executor:
+            results = list(executor.map(generate, chunks))
+
+        # Reduce: takrorlarni olib tashlash
+        seen = set()
+        per_chunk_questions = []
+        for questions in results:
+            unique = []
+            for q in questions:
+                key = _question_key(q)
+                if key and key not in seen:
+                    seen.add(key)
+                    unique.append(q)
+            per_chunk_questions.append(unique)
+
+        # Har bir bo'lakdan navbatma-navbat olish: qamrov hujjat bo'ylab saqlanadi
+        selected = []
+        kept = [0] * len(chunks)
+        depth = 0
+        while len(selected) < count and any(len(qs) > depth for qs in per_chunk_questions):
+            for i, qs in enumerate(per_chunk_questions):
+                if len(qs) > depth and len(selected) < count:
+                    selected.append(qs[depth])
+                    kept[i] += 1
+            depth += 1
+
+        coverage = []
+        for i, (start, end) in enumerate(chunks):
+            item = {
+                'chunk': i + 1,
+                'start': start,
+                'end': end,
+                'chars': end - start,
+                'generated': len(results[i]),
+                'kept': kept[i]
+            }
+            if page_offsets:
+                item['first_page'] = _page_at(page_offsets, start)
+                item['last_page'] = _page_at(page_offsets, max(start, end - 1))
+            coverage.append(item)
+        return selected, coverage
 
     def generate_unique_questions(self, topic, grade, count):
         """Mavzu va sinf bo'yicha alohida savollar tuzish"""
-        prompt = f"""
+        def build_prompt(missing, existing):
+            return f"""
         Siz professional o'qituvchisiz. TEST savollari tuzing.
         
         MAVZU: {topic}
         O'QUVCHI DARAJASI: {grade}-sinf o'quvchilari.
-        SAVOLLAR SONI: {count} ta.
+        SAVOLLAR SONI: {missing} ta.
         
         MUHIM QOIDA:
         1. Kalitlar (keys) FAQAT ingliz tilida: "question", "options", "correct_answer".
         2. Javobni FAQAT va FAQAT JSON formatida qaytar. Hech qanday kirish so'zlari ishlatma.
-        
+        {_exclude_instruction(existing)}
         Format:
         [
             {{
@@ -251,25 +558,22 @@ Muhim: Faqat O'ZBEKCHA javob bering!"""
         ]
         """
 
+        questions = []
         try:
-            response = self.generate_response(prompt, "Unique test generation")
-            import re
-            match = re.search(r'\[.*\]', response, re.DOTALL)
-            if match:
-                response = match.group(0)
-            
-            response = response.strip()
-            questions = json.loads(response)
-            return self._normalize_questions(questions)
+            questions = self._collect_questions(build_prompt, count, "Unique test generation")
         except Exception as e:
             print(f"Unique Quiz Generation Error: {e}")
-            return self._normalize_questions([
+
+        # Yetishmagan savollar namuna bilan to'ldiriladi, test hajmi o'zgarmaydi
+        if len(questions) < count:
+            questions += self._normalize_questions([
                 {
                     "question": f"{topic} mavzusi bo'yicha {grade}-sinf uchun savol (AI Xatosi)",
                     "options": {"A": "Namuna A", "B": "Namuna B", "C": "Namuna C", "D": "Namuna D"},
                     "correct_answer": "A"
                 }
-            ] * count)
+            ] * (count - len(questions)))
+        return questions
 
     def grade_answer(self, question, user_answer, correct_answer=None):
         """Ochiq savol yoki kodni baholash"""
@@ -292,14 +596,144 @@ Muhim: Faqat O'ZBEKCHA javob bering!"""
         
         try:
             response = self.generate_response(prompt, "Baholash")
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-            return {"score": 0, "feedback": "AI xatosi"}
+            for obj in iter_json_objects(response):
+                grade = validate_grade(obj)
+                if grade:
+                    return grade
+            return {"score": 0, "feedback": "AI xatosi", "pending": True}
         except Exception as e:
             print(f"Grading error: {e}")
-            return {"score": 0, "feedback": "Tizim xatosi"}
+            return {"score": 0, "feedback": "Tizim xatosi", "pending": True}
+
+    def grade_answers_batch(self, items):
+        """Bir nechta ochiq javobni umumiy prompt bilan baholash.
+
+        ``items`` - [(savol, talaba javobi, to'g'ri javob namunasi), ...];
+        natija shu tartibda [{"score", "feedback"}, ...]; AI baholay olmaganlarda
+        (limit, deadline) ``"pending": True``. Javoblar token
+        byudjeti bo'yicha bo'laklarga ajratilib parallel yuboriladi; javobda
+        topilmagan yoki yaroqsiz bahoga ega itemlar qayta so'raladi.
+        """
+        results = [None] * len(items)
+        pending = []
+        for i, (question, user_answer, correct_answer) in enumerate(items):
+            if not user_answer or len(user_answer.strip()) < 1:
+                results[i] = {"score": 0, "feedback": "Javob berilmadi"}
+            else:
+                pending.append(i)
+
+        # Fon oqimlarida request konteksti yo'q: log manbasini shu yerda olamiz
+        origin = current_scope()
+
+        def grade(chunk):
+            try:
+                with usage_scope(**origin):
+                    return self._grade_chunk([items[i] for i in chunk])
+            except Exception as e:
+                print(f"Grading error: {e}")
+                return {}
+
+        for attempt in range(1 + GRADE_RETRY_ATTEMPTS):
+            if not pending:
+                break
+            chunks = _grade_chunks(pending, items)
+            if len(chunks) == 1:
+                graded = [grade(chunks[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=min(QUIZ_CHUNK_CONCURRENCY, len(chunks))) as executor:
+                    graded = list(executor.map(grade, chunks))
+
+            failed = []
+            for chunk, grades in zip(chunks, graded):
+                for n, i in enumerate(chunk, 1):
+                    if n in grades:
+                        results[i] = grades[n]
+                    else:
+                        failed.append(i)
+            # Hech narsa baholanmagan bo'lsa, qayta so'rash foyda bermaydi (API ishlamayapti)
+            if len(failed) == len(pending):
+                break
+            if failed and attempt < GRADE_RETRY_ATTEMPTS:
+                print(f"Qisman baholash: {len(pending) - len(failed)}/{len(pending)}, "
+                      f"{len(failed)} tasi qayta so'ralmoqda")
+            pending = failed
+
+        # Baholanmaganlar "pending": qayta baholashda yana so'raladi
+        for i in pending:
+            results[i] = {"score": 0, "feedback": "AI xatosi", "pending": True}
+        return results
+
+    def _grade_chunk(self, chunk):
+        """Bitta so'rov: {tartib raqami (1 dan): baho} - faqat yaroqli javoblar"""
+        blocks = "\n".join(_grade_block(n, item) for n, item in enumerate(chunk, 1))
+        prompt = f"""
+        Sen o'qituvchisan. Talabaning {len(chunk)} ta javobini alohida-alohida bahola.
+        {blocks}
+
+        Vazifa: har bir javobni 0-100 oralig'ida bahola, izoh bitta qisqa gap bo'lsin.
+        Javob FAQAT JSON massiv formatida bo'lsin, har bir javob uchun bitta obyekt:
+        [
+            {{"id": 1, "score": 85, "feedback": "Izoh"}}
+        ]
+        """
+        response = self.generate_response(prompt, "Baholash")
+        grades = {}
+        for obj in iter_json_objects(response):
+            grade = validate_grade(obj)
+            try:
+                n = int(obj.get('id'))
+            except (TypeError, ValueError):
+                continue
+            if grade and 1 <= n <= len(chunk):
+                grades.setdefault(n, grade)
+        return grades
+
+
+def _grade_block(n, item):
+    question, user_answer, correct_answer = item
+    return f"""
+        [{n}] Savol: {question}
+            To'g'ri javob namunasi: {correct_answer}
+            Talaba javobi: {user_answer}"""
+
+
+def _grade_chunks(indices, items):
+    """Itemlarni bo'laklarga ajratish: prompt GRADE_BATCH_TOKENS dan, javoblar
+    AI_MAX_TOKENS dan oshmasin (~4 belgi = 1 token). Juda uzun javob alohida bo'lak."""
+    per_chunk = max(1, AI_MAX_TOKENS // GRADE_RESULT_TOKENS)
+    chunks, chunk, used = [], [], 0
+    for i in indices:
+        tokens = len(_grade_block(len(chunk) + 1, items[i])) // 4
+        if chunk and (used + tokens > GRADE_BATCH_TOKENS or len(chunk) >= per_chunk):
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(i)
+        used += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _page_at(page_offsets, position):
+    """Matndagi pozitsiya qaysi sahifaga tegishli (1 dan boshlab)"""
+    return max(1, bisect.bisect_right(page_offsets, position))
+
+class _LazyAssistant:
+    """GroqAIAssistant import vaqtida emas, birinchi murojaatda yaratiladi"""
+
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = GroqAIAssistant()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
 
 # Global instance
-ai_assistant = GroqAIAssistant()
+ai_assistant = _LazyAssistant()
@@ -0,0 +1,67 @@
+# ai_pool.py
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import jsonify, request, flash, redirect, url_for
+
+# Bir worker jarayonida bir vaqtda LLM kutayotgan so'rovlar soni.
+# Qolgan oqimlar/greenletlar oddiy sahifalar uchun bo'sh qoladi.
+AI_POOL_SIZE = int(os.environ.get('AI_POOL_SIZE', 4))
+# Navbatda kutish muddati (soniya): undan keyin darhol 503 qaytariladi
+AI_POOL_WAIT = float(os.environ.get('AI_POOL_WAIT', 5))
+
+
+class AIPoolBusy(Exception):
+    pass
+
+
+class AIPool:
+    """LLM ga bog'liq endpointlar uchun alohida slotlar hovuzi"""
+
+    def __init__(self, size=AI_POOL_SIZE, wait=AI_POOL_WAIT):
+        self.size = size
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    @contextmanager
+    def slot(self):
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            raise AIPoolBusy()
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self):
+        return {'size': self.size, 'active': self.active, 'rejected': self.rejected}
+
+
+ai_pool = AIPool()
+
+AI_BUSY_MESSAGE = "AI hozir band, birozdan so'ng qayta urinib ko'ring"
+
+
+def ai_endpoint(f):
+    """Route ni AI hovuzi ichida bajarish; hovuz to'la bo'lsa 503"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            with ai_pool.slot():
+                return f(*args, **kwargs)
+        except AIPoolBusy:
+            if request.path.startswith('/api/'):
+                return jsonify({'success': False, 'error': AI_BUSY_MESSAGE}), 503
+            flash(AI_BUSY_MESSAGE, 'warning')
+            return redirect(request.referrer or url_for('dashboard'))
+    return decorated_function
@@ -0,0 +1,124 @@
+# ai_usage.py
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Bufer shu hajmga yetganda yoki AI_USAGE_FLUSH_INTERVAL soniyada bir marta bazaga yoziladi
+AI_USAGE_FLUSH_SIZE = int(os.environ.get('AI_USAGE_FLUSH_SIZE', 50))
+AI_USAGE_FLUSH_INTERVAL = float(os.environ.get('AI_USAGE_FLUSH_INTERVAL', 10))
+# Baza ishlamay qolsa xotira cheksiz o'smasligi uchun
+AI_USAGE_MAX_BUFFER = 5000
+
+_scope = threading.local()
+
+
+def current_scope():
+    """Joriy AI chaqiruvi manbai: ``feature`` (route) va ``user_id``"""
+    scope = getattr(_scope, 'value', None)
+    if scope:
+        return dict(scope)
+    feature, user_id = None, None
+    try:
+        from flask import has_request_context, request
+        from flask_login import current_user
+        if has_request_context():
+            feature = request.endpoint
+            if current_user.is_authenticated:
+                user_id = current_user.id
+    except Exception:
+        pass
+    return {'feature': feature or 'unknown', 'user_id': user_id}
+
+
+@contextmanager
+def scope(feature, user_id=None):
+    """Request kontekstidan tashqarida (fon oqimlari, CLI) manbani belgilash"""
+    previous = getattr(_scope, 'value', None)
+    _scope.value = {'feature': feature, 'user_id': user_id}
+    try:
+        yield
+    finally:
+        _scope.value = previous
+
+
+class AIUsageRecorder:
+    """AI chaqiruvlari logini buferlab, AICallLog jadvaliga bitta INSERT bilan yozish"""
+
+    def __init__(self, flush_size=AI_USAGE_FLUSH_SIZE, flush_interval=AI_USAGE_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = []
+        self._app = None
+        self._thread = None
+        self._wake = threading.Event()
+        self.dropped = 0
+
+    def init_app(self, app):
+        self._app = app
+        atexit.register(self.flush)
+
+    def record(self, model, prompt_tokens=0, completion_tokens=0, latency_ms=0.0,
+               status='ok', cache_hit=False, feature=None, user_id=None):
+        if feature is None:
+            origin = current_scope()
+            feature = origin['feature']
+            if user_id is None:
+                user_id = origin['user_id']
+        row = {
+            'created_at': datetime.now(),
+            'model': model,
+            'feature': feature,
+            'user_id': user_id,
+            'prompt_tokens': prompt_tokens or 0,
+            'completion_tokens': completion_tokens or 0,
+            'latency_ms': int(latency_ms),
+            'status': status,
+            'cache_hit': cache_hit,
+        }
+        with self._lock:
+            if len(self._buffer) >= AI_USAGE_MAX_BUFFER:
+                self.dropped += 1
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_size
+            if self._thread is None and self._app is not None:
+                self._thread = threading.Thread(target=self._run, name='ai-usage-flush', daemon=True)
+                self._thread.start()
+        if full:
+            # So'rov oqimida yozilmaydi: SQLite da so'rov tranzaksiyasi bilan to'qnashmasligi uchun
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Buferni bazaga yozish (so'rov sessiyasidan alohida ulanishda)"""
+        if self._app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            from models import db, AICallLog
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(AICallLog.__table__.insert(), rows)
+            except Exception as e:
+                print(f"AI usage flush error: {e}")
+                with self._lock:
+                    # Keyingi urinishda yoziladi (bufer chegarasigacha)
+                    self._buffer[:0] = rows[:max(0, AI_USAGE_MAX_BUFFER - len(self._buffer))]
+                return 0
+            return len(rows)
+
+
+ai_usage = AIUsageRecorder()
@@ -0,0 +1,220 @@
+# answer_grader.py
+"""Matematik va qisqa matnli javoblarni AI siz oldindan baholash.
+
+``pre_grade`` aniq to'g'ri yoki aniq noto'g'ri holatlarda natija qaytaradi,
+shubhali javoblar uchun None (ular AI ga bitta batch bilan yuboriladi).
+
+* sonlar o'qituvchi javobining aniqligida solishtiriladi (``3.14`` ~ ``3.1416``);
+  o'quvchi kamroq xona bilan yaxlitlagan bo'lsa (``0.33`` va ``1/3``) AI hal qiladi;
+* oddiy algebraik ifodalar tasodifiy nuqtalarda hisoblanib solishtiriladi
+  (``2(x+1)`` ~ ``2x+2``), ``ast`` orqali faqat ruxsat etilgan amallar;
+* matn normallashtirilgach faqat aynan mos kelsa to'g'ri deb topiladi; so'zlar
+  tartibi yoki bitta so'z farq qilsa ham javob AI ga yuboriladi (taxminiy moslik yo'q).
+"""
+import ast
+import math
+import operator
+import random
+import re
+import unicodedata
+
+# Butun son javoblar uchun nisbiy xatolik chegarasi
+NUMERIC_REL_TOLERANCE = 1e-9
+# Ifodalar ekvivalentligini tekshirish nuqtalari
+EXPRESSION_SAMPLES = 8
+MAX_EXPRESSION_LENGTH = 200
+MAX_EXPONENT = 64
+
+_FUNCTIONS = {
+    'sqrt': math.sqrt, 'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'tg': math.tan,
+    'log': math.log, 'ln': math.log, 'lg': math.log10, 'exp': math.exp, 'abs': abs,
+}
+_CONSTANTS = {'pi': math.pi, 'e': math.e}
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+           ast.Div: operator.truediv, ast.Pow: operator.pow}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+_TOKEN = re.compile(r'\d+(?:\.\d+)?|[a-z]+|\*\*|[-+*/()]')
+_NUMBER = re.compile(r'[-+]?\d+(?:\.(\d+))?')
+_APOSTROPHES = str.maketrans({c: "'" for c in "ʻʼ‘’`´"})
+
+
+class _NotExpression(ValueError):
+    """Javob oddiy algebraik ifoda emas"""
+
+
+def _math_source(text):
+    """Yozuv variantlarini Python ifodasiga keltirish: ``2x^2`` -> ``2*x**2``"""
+    text = text.strip().lower()
+    # "x = 5" / "y=2x+1" ko'rinishidagi javobdan o'ng tomon olinadi
+    match = re.fullmatch(r'[a-z]\s*=\s*([^=]+)', text)
+    if match:
+        text = match.group(1)
+    if '=' in text or len(text) > MAX_EXPRESSION_LENGTH:
+        raise _NotExpression(text)
+    text = re.sub(r'(?<=\d),(?=\d)', '.', text)
+    for old, new in (('^', '**'), ('×', '*'), ('·', '*'), ('÷', '/'), (':', '/'), ('−', '-'),
+                     ('π', 'pi'), ('√', 'sqrt'), ('²', '**2'), ('³', '**3'), (' ', '')):
+        text = text.replace(old, new)
+
+    tokens = []
+    position = 0
+    for token in _TOKEN.finditer(text):
+        if token.start() != position:
+            raise _NotExpression(text)
+        position = token.end()
+        value = token.group()
+        # Noma'lum harflar ketma-ketligi bir harfli o'zgaruvchilar ko'paytmasi: "ab" -> a*b.
+        # "sinx", "12sm" kabi yozuvlarni taxmin qilmaymiz - ular AI ga qoladi.
+        if value.isalpha() and value not in _FUNCTIONS and value not in _CONSTANTS:
+            if len(value) > 1 and any(len(name) > 1 and name in value for name in (*_FUNCTIONS, *_CONSTANTS)):
+                raise _NotExpression(text)
+            tokens.extend(value)
+        else:
+            tokens.append(value)
+    if position != len(text) or not tokens or tokens[-1] in _FUNCTIONS:
+        raise _NotExpression(text)
+
+    # Yashirin ko'paytirish: "2x", "2(x+1)", "(a)(b)", "x sin(x)"
+    source = []
+    for prev, token in zip([None] + tokens, tokens):
+        if prev in _FUNCTIONS and token != '(':
+            raise _NotExpression(text)
+        operand_end = prev is not None and (prev == ')' or prev[0].isdigit()
+                                            or (prev.isalpha() and prev not in _FUNCTIONS))
+        operand_start = token == '(' or token[0].isdigit() or token.isalpha()
+        if operand_end and operand_start:
+            source.append('*')
+        source.append(token)
+    return ''.join(source)
+
+
+def _parse_expression(text):
+    try:
+        tree = ast.parse(_math_source(text), mode='eval')
+    except SyntaxError:
+        raise _NotExpression(text)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or len(node.args) != 1:
+                raise _NotExpression(text)
+        elif not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Load)
+                            + tuple(_BINARY) + tuple(_UNARY)):
+            raise _NotExpression(text)
+    variables = {name for name in names if name not in _CONSTANTS and name not in _FUNCTIONS}
+    return tree.body, variables
+
+
+def _evaluate(node, values):
+    if isinstance(node, ast.Constant):
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        return values[node.id] if node.id in values else _CONSTANTS[node.id]
+    if isinstance(node, ast.UnaryOp):
+        return _UNARY[type(node.op)](_evaluate(node.operand, values))
+    if isinstance(node, ast.Call):
+        return float(_FUNCTIONS[node.func.id](_evaluate(node.args[0], values)))
+    left, right = _evaluate(node.left, values), _evaluate(node.right, values)
+    if isinstance(node.op, ast.Pow) and abs(right) > MAX_EXPONENT:
+        raise OverflowError("daraja juda katta")
+    result = _BINARY[type(node.op)](left, right)
+    if isinstance(result, complex):
+        raise ValueError("kompleks natija")
+    return result
+
+
+def _close(a, b, tolerance=0.0):
+    return abs(a - b) <= max(tolerance, NUMERIC_REL_TOLERANCE * max(abs(a), abs(b)), 1e-12)
+
+
+def _number_tolerance(text, integer=0.0):
+    """Son nechta kasr xonagacha yozilgan bo'lsa, shuning yarmi; butun son uchun ``integer``,
+    son bo'lmasa None"""
+    match = _NUMBER.fullmatch(text.strip().replace(',', '.'))
+    if not match:
+        return None
+    return 0.5 * 10 ** -len(match.group(1)) if match.group(1) else integer
+
+
+def compare_math(user_answer, correct_answer):
+    """True/False - ekvivalent/ekvivalent emas, None - solishtirib bo'lmadi"""
+    try:
+        correct, correct_vars = _parse_expression(correct_answer)
+        answer, answer_vars = _parse_expression(user_answer)
+    except _NotExpression:
+        return None
+    # O'zgaruvchilar to'plami farq qilsa (birliklar, boshqa belgilash) - AI hal qiladi
+    if correct_vars != answer_vars:
+        return None
+
+    variables = sorted(correct_vars)
+    tolerance = 0.0 if variables else (_number_tolerance(_math_source(correct_answer)) or 0.0)
+    # O'quvchi yaxlitlagan son: o'z aniqligida to'g'ri bo'lsa rad etilmaydi (0.33 ~ 1/3)
+    rounded = None if variables else _number_tolerance(_math_source(user_answer), integer=0.5)
+    # Nuqtalar nolga yaqin emas, ishorasi aralash; aniqlanish sohasidan tashqaridagi
+    # nuqtalar (log, sqrt manfiydan) tashlab ketiladi
+    rng = random.Random(20240501)
+    points = [{name: rng.choice((-1, 1)) * rng.uniform(0.5, 3.5) for name in variables}
+              for _ in range(EXPRESSION_SAMPLES if variables else 1)]
+    compared = 0
+    for values in points:
+        try:
+            expected, actual = _evaluate(correct, values), _evaluate(answer, values)
+        except (ArithmeticError, ValueError):
+            continue
+        if math.isnan(expected) or math.isnan(actual):
+            continue
+        if not _close(expected, actual, tolerance):
+            if rounded is not None and rounded > tolerance and _close(expected, actual, rounded):
+                return None
+            return False
+        compared += 1
+    return True if compared else None
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', str(text)).translate(_APOSTROPHES).lower()
+    text = re.sub(r"[^\w\s'.,-]", ' ', text)
+    text = re.sub(r"(?<!\d)[.,]|[.,](?!\d)", ' ', text)
+    return ' '.join(text.split())
+
+
+def compare_text(user_answer, correct_answer):
+    """True - aniq to'g'ri, False - son noto'g'ri, None - AI hal qilsin"""
+    answer, correct = normalize_text(user_answer), normalize_text(correct_answer)
+    if not correct:
+        return None
+    # Faqat normallashtirilgan matn aynan mos kelsa. So'zlar tartibi boshqa
+    # bo'lsa ma'no ham o'zgarishi mumkin ("2 3 1" va "1 2 3"), buni AI hal qiladi
+    if answer == correct:
+        return True
+    # Ikkalasi ham son bo'lsa, sonli solishtirish
+    if _NUMBER.fullmatch(answer.replace(',', '.')) and _NUMBER.fullmatch(correct.replace(',', '.')):
+        return compare_math(answer, correct)
+    return None
+
+
+def pre_grade(question_type, user_answer, correct_answer):
+    """{'score', 'feedback'} - lokal baho, None - javob AI ga yuboriladi"""
+    if not user_answer or not user_answer.strip():
+        return {"score": 0, "feedback": "Javob berilmadi"}
+    if not correct_answer or not str(correct_answer).strip():
+        return None
+    correct_answer = str(correct_answer)
+
+    verdict = None
+    if question_type == 'math':
+        verdict = compare_math(user_answer, correct_answer)
+        if verdict is None:
+            verdict = True if normalize_text(user_answer) == normalize_text(correct_answer) else None
+    elif question_type == 'text':
+        verdict = compare_text(user_answer, correct_answer)
+
+    if verdict is True:
+        return {"score": 100, "feedback": "To'g'ri javob"}
+    if verdict is False:
+        return {"score": 0, "feedback": f"Noto'g'ri. To'g'ri javob: {correct_answer.strip()}"}
+    return None
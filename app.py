@@ -1,17 +1,22 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user, UserMixin
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import json
 import random
-from ai_model import ai_assistant
+from ai_model import ai_assistant, QUIZ_DOCUMENT_LIMIT
 import time
 import os
+import threading
 
-import io
-from PyPDF2 import PdfReader
-from docx import Document
+from document_extraction import is_supported, read_upload
+from extraction_cache import extraction_cache
+from question_bank import build_question_rows, bulk_insert_questions
+from ai_pool import ai_pool, ai_endpoint, AIPoolBusy, AI_BUSY_MESSAGE
+from perf import init_perf
+from ai_usage import ai_usage
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'eduai-pro-super-secret-key-2024'
@@ -28,8 +33,12 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-from models import db, User, Purchase, Message, Subject, Quiz, Announcement, UserProgress, TestResult, Question, Group, GroupMember, StudentRequest, Assignment, Literature
-from models import calculate_user_rank, create_user_progress, get_ai_recommendation, get_last_lesson, get_next_recommendation, get_user_context
+from models import db, User, Purchase, Message, Subject, Quiz, Announcement, UserProgress, TestResult, Question, Group, GroupMember, StudentRequest, Assignment, Literature, RegradeJob
+from models import PASSWORD_HASH_METHOD, subject_cache, calculate_user_rank, get_subject_progress, get_student_quiz_page, get_ai_recommendation, get_last_lesson, get_next_recommendation, get_user_context
+from result_ingest import record_result
+from quiz_cache import quiz_cache
+from quiz_grading import OPEN_TYPES, collect_answers, grade_submissions, score_percent, dump_answers
+from regrade import start_regrade_job
 
 # Initialize Login manager
 login_manager = LoginManager()
@@ -40,34 +49,42 @@ login_manager.login_message = 'Iltimos, tizimga kiring'
 
 
 # OAuth Setup
-from authlib.integrations.flask_client import OAuth
-
 app.config['GOOGLE_CLIENT_ID'] = os.environ.get('GOOGLE_CLIENT_ID', 'your-google-client-id')
 app.config['GOOGLE_CLIENT_SECRET'] = os.environ.get('GOOGLE_CLIENT_SECRET', 'your-google-client-secret')
 
-oauth = OAuth(app)
-google = oauth.register(
-    name='google',
-    client_id=app.config['GOOGLE_CLIENT_ID'],
-    client_secret=app.config['GOOGLE_CLIENT_SECRET'],
-    access_token_url='https://accounts.google.com/o/oauth2/token',
-    access_token_params=None,
-    authorize_url='https://accounts.google.com/o/oauth2/auth',
-    authorize_params=None,
-    api_base_url='https://www.googleapis.com/oauth2/v1/',
-    userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',  # This is only needed if using openid to fetch user info
-    client_kwargs={'scope': 'openid email profile'},
-)
+# Authlib og'ir kutubxona: faqat Google orqali kirishda yuklanadi
+oauth = None
+_oauth_lock = threading.Lock()
+
+def get_google_client():
+    global oauth
+    with _oauth_lock:
+        if oauth is None:
+            from authlib.integrations.flask_client import OAuth
+            oauth = OAuth(app)
+            oauth.register(
+                name='google',
+                client_id=app.config['GOOGLE_CLIENT_ID'],
+                client_secret=app.config['GOOGLE_CLIENT_SECRET'],
+                access_token_url='https://accounts.google.com/o/oauth2/token',
+                access_token_params=None,
+                authorize_url='https://accounts.google.com/o/oauth2/auth',
+                authorize_params=None,
+                api_base_url='https://www.googleapis.com/oauth2/v1/',
+                userinfo_endpoint='https://openidconnect.googleapis.com/v1/userinfo',  # This is only needed if using openid to fetch user info
+                client_kwargs={'scope': 'openid email profile'},
+            )
+    return oauth.create_client('google')
 
 @app.route('/login/google')
 def login_google():
-    google_client = oauth.create_client('google')  # Create client
+    google_client = get_google_client()  # Create client
     redirect_uri = url_for('google_auth', _external=True)
     return google_client.authorize_redirect(redirect_uri)
 
 @app.route('/login/google/callback')
 def google_auth():
-    google_client = oauth.create_client('google')  # Create client
+    google_client = get_google_client()  # Create client
     token = google_client.authorize_access_token()
     resp = google_client.get('userinfo')
     user_info = resp.json()
@@ -83,14 +100,14 @@ def google_auth():
         # Ensure unique username
         username = cleaned_username
         counter = 1
-        while User.query.filter_by(username=username).first():
+        while User.find_by_username(username):
             username = f"{cleaned_username}{counter}"
             counter += 1
             
         user = User(
             username=username,
             email=user_info['email'],
-            password=generate_password_hash(os.urandom(16).hex()), # Random password
+            password_hash=generate_password_hash(os.urandom(16).hex(), method=PASSWORD_HASH_METHOD), # Random password
             role='student', # Default role
             rank='Yangi a\'zo'
         )
@@ -128,8 +145,22 @@ app.register_blueprint(admin_bp)
 
 # Models and logic moved to models.py
 
-db.init_app(app)
-login_manager.init_app(app)
+def create_app(config=None):
+    """Ilova fabrikasi: konfiguratsiya va kengaytmalarni ulash.
+
+    Import vaqtida hech qanday DB ulanishi yoki jadval yaratish bo'lmaydi.
+    Sxema alohida release bosqichida yaratiladi (``flask --app app init-db``
+    yoki ``python init_db.py``). Qayta chaqirilsa, mavjud ilovani qaytaradi.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+    if config:
+        app.config.update(config)
+    db.init_app(app)
+    login_manager.init_app(app)
+    init_perf(app)
+    ai_usage.init_app(app)
+    return app
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -142,6 +173,10 @@ def index():
         return redirect(url_for('dashboard'))
     return render_template('index.html')
 
+def duplicate_user_message(error):
+    """Parallel so'rov tekshiruvdan o'tib, unikal indeksga urilganda (username - registrsiz)"""
+    return 'Bu email band!' if 'email' in str(error.orig).lower() else 'Bu username band!'
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
@@ -153,7 +188,7 @@ def register():
         password = request.form.get('password')
         
         # Case insensitive check
-        if User.query.filter(db.func.lower(User.username) == db.func.lower(username)).first():
+        if User.find_by_username(username):
             flash('Bu username band!', 'error')
             return render_template('register.html')
             
@@ -164,11 +199,14 @@ def register():
         user = User(username=username, email=email)
         user.set_password(password)
         
+        # Progress qatorlari birinchi natijada yaratiladi (yo'q qator - 0%)
         db.session.add(user)
-        db.session.commit()
-        
-        # Yangi foydalanuvchi uchun progress yaratish
-        create_user_progress(user.id)
+        try:
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            flash(duplicate_user_message(e), 'error')
+            return render_template('register.html')
         
         login_user(user)
         flash('Muvaffaqiyatli ro\'yxatdan o\'tdingiz!', 'success')
@@ -185,13 +223,17 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        user = User.query.filter_by(username=username).first()
+        user = User.find_by_username(username)
         
         if user and user.check_password(password):
             if not user.is_active:
                 flash('Sizning hisobingiz vaqtincha muzlatilgan!', 'error')
                 return render_template('login.html')
 
+            if user.password_needs_rehash():
+                # Siyosat o'zgargan: parol ochiq holda faqat shu yerda bor
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             flash(f'Xush kelibsiz, {username}!', 'success')
             
@@ -251,7 +293,7 @@ def dashboard():
 @login_required
 def learning_center():
     """O'quv markazi sahifasi - darslar va progress fokusida"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     user_progress = UserProgress.query.filter_by(user_id=current_user.id).all()
     
     # Map progress to subject IDs
@@ -275,11 +317,13 @@ def learning_center():
 @login_required
 def test_center():
     """Bilim markazi sahifasi - testlar fokusida"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     user_progress = UserProgress.query.filter_by(user_id=current_user.id).all()
     subject_progress_dict = {p.subject_id: p.progress_percentage for p in user_progress}
     
-    recent_results = TestResult.query.filter_by(user_id=current_user.id)\
+    # Fan nomi shablonda kerak: fanlar endi keshdan, shuning uchun bitta JOIN bilan
+    recent_results = TestResult.query.options(db.joinedload(TestResult.subject))\
+        .filter_by(user_id=current_user.id)\
         .order_by(TestResult.completed_at.desc())\
         .limit(5).all()
         
@@ -294,10 +338,10 @@ def test_center():
 @login_required
 def start_learning(subject_code):
     """Start learning wrapper"""
-    sub = Subject.query.filter_by(code=subject_code).first()
+    sub = subject_cache.by_code(subject_code)
     if not sub:
         # Fallback to name search
-        sub = Subject.query.filter_by(name=subject_code).first()
+        sub = subject_cache.by_name(subject_code)
         
     if sub:
         return redirect(url_for('subject_detail', subject=sub.name))
@@ -375,7 +419,7 @@ def achievements():
 @login_required
 def progress_analytics():
     """Progress tahlili sahifasi"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     
     # Calculate trend data (simple mock for now based on recent results)
     import datetime
@@ -412,10 +456,12 @@ def progress_analytics():
     ]
 
     # Fetch recent test results for the template
-    test_results = TestResult.query.filter_by(user_id=current_user.id).order_by(TestResult.completed_at.desc()).limit(10).all()
+    test_results = TestResult.query.options(db.joinedload(TestResult.subject))\
+        .filter_by(user_id=current_user.id).order_by(TestResult.completed_at.desc()).limit(10).all()
 
     return render_template('progress_analytics.html', 
                          subjects=subjects,
+                         progress_rows=get_subject_progress(current_user.id),
                          trend_labels=dates,
                          trend_data=scores,
                          ai_insights=ai_insights,
@@ -517,6 +563,7 @@ def api_handle_enrollment():
 
 @app.route('/api/ai/chat', methods=['POST'])
 @login_required
+@ai_endpoint
 def ai_chat():
     """AI suhbat API"""
     try:
@@ -556,6 +603,7 @@ def ai_chat():
 
 @app.route('/api/ai/analyze_progress', methods=['POST'])
 @login_required
+@ai_endpoint
 def analyze_progress():
     """Progress tahlili API"""
     try:
@@ -587,6 +635,7 @@ def analyze_progress():
 
 @app.route('/api/ai/subject_help', methods=['POST'])
 @login_required
+@ai_endpoint
 def subject_help():
     """Fan bo'yicha yordam API"""
     try:
@@ -617,6 +666,7 @@ def subject_help():
 
 @app.route('/api/ai/test_advice', methods=['POST'])
 @login_required
+@ai_endpoint
 def test_advice():
     """Testga tayyorgarlik bo'yicha maslahat"""
     try:
@@ -735,7 +785,7 @@ def leaderboard():
 @login_required
 def profile():
     """Profil sahifasi"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     
     # So'nggi test natijalari
     recent_results = TestResult.query.filter_by(user_id=current_user.id)\
@@ -746,6 +796,7 @@ def profile():
     return render_template('profile.html', 
                          user=current_user,
                          subjects=subjects,
+                         progress_rows=get_subject_progress(current_user.id),
                          recent_results=recent_results)
 
 @app.route('/api/update_avatar', methods=['POST'])
@@ -783,8 +834,8 @@ def api_update_profile():
     try:
         # Username tekshirish
         if username != current_user.username:
-            existing_user = User.query.filter_by(username=username).first()
-            if existing_user:
+            existing_user = User.find_by_username(username)
+            if existing_user and existing_user.id != current_user.id:
                 return jsonify({'success': False, 'error': 'Bu username band!'})
         
         # Email tekshirish
@@ -801,6 +852,9 @@ def api_update_profile():
         db.session.commit()
         return jsonify({'success': True})
         
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': duplicate_user_message(e)})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)})
@@ -831,7 +885,9 @@ def update_profile():
 def api_start_test(subject_id):
     """Test boshlash API"""
     try:
-        subject = Subject.query.get_or_404(subject_id)
+        subject = subject_cache.get(subject_id)
+        if not subject:
+            abort(404)
         
         # Misol savollar - keyinchalik Question modelidan olish mumkin
         questions = generate_sample_questions(subject.name)
@@ -925,37 +981,12 @@ def api_submit_test():
         total_questions = data.get('total_questions', 0)
         
         # Subjectni topish
-        subject = Subject.query.get(subject_id)
+        subject = subject_cache.get(subject_id)
         if not subject:
             return jsonify({'error': 'Fan topilmadi'}), 404
         
-        # Test natijasini saqlash
-        test_result = TestResult(
-            user_id=current_user.id,
-            subject_id=subject.id,
-            score=score,
-            total_questions=total_questions,
-            correct_answers=correct_answers
-        )
-        db.session.add(test_result)
-        
-        # Progress yangilash
-        user_progress = UserProgress.query.filter_by(
-            user_id=current_user.id, 
-            subject_id=subject.id
-        ).first()
-        if user_progress:
-            user_progress.progress_percentage = max(user_progress.progress_percentage, score)
-            user_progress.last_activity = datetime.now()
-        else:
-            user_progress = UserProgress(
-                user_id=current_user.id,
-                subject_id=subject.id,
-                progress_percentage=score
-            )
-            db.session.add(user_progress)
-        
-        db.session.commit()
+        # Natija, progress va daraja - bitta tranzaksiya
+        record_result(current_user.id, score, total_questions, correct_answers, subject_id=subject.id)
         
         return jsonify({
             'success': True, 
@@ -987,14 +1018,11 @@ def api_voice_query():
 @login_required
 def api_progress_data():
     # DB dan progress ma'lumotlarini olish
-    user_progress = UserProgress.query.filter_by(user_id=current_user.id).all()
-    
     labels = []
     data = []
     
-    for progress in user_progress:
-        subject = Subject.query.get(progress.subject_id)
-        labels.append(subject.name)
+    for progress in get_subject_progress(current_user.id):
+        labels.append(progress.name)
         data.append(progress.progress_percentage)
     
     
@@ -1041,7 +1069,7 @@ def create_teacher():
     email = request.form.get('email')
     password = request.form.get('password')
     
-    if User.query.filter_by(username=username).first():
+    if User.find_by_username(username):
         flash('Bu username band!', 'error')
         return redirect(url_for('admin_users'))
         
@@ -1053,7 +1081,12 @@ def create_teacher():
     user.set_password(password)
     
     db.session.add(user)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        flash(duplicate_user_message(e), 'error')
+        return redirect(url_for('admin_users'))
     
     flash('O\'qituvchi muvaffaqiyatli yaratildi!', 'success')
     return redirect(url_for('admin_users'))
@@ -1175,10 +1208,11 @@ def view_student_profile(id):
         flash('Faqat o\'quvchilar profilini ko\'rish mumkin', 'error')
         return redirect(url_for('teacher_dashboard'))
         
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     recent_results = TestResult.query.filter_by(user_id=student.id).order_by(TestResult.completed_at.desc()).limit(5).all()
     
-    return render_template('profile.html', user=student, subjects=subjects, recent_results=recent_results)
+    return render_template('profile.html', user=student, subjects=subjects, recent_results=recent_results,
+                           progress_rows=get_subject_progress(student.id))
 
 @app.route('/teacher/student/<int:id>/rank', methods=['POST'])
 @teacher_required
@@ -1204,7 +1238,7 @@ def api_user_stats():
         'overall_progress': current_user.get_overall_progress(),
         'tests_taken': current_user.get_tests_taken(),
         'avg_score': current_user.get_avg_test_score(),
-        'total_subjects': UserProgress.query.filter_by(user_id=current_user.id).count(),
+        'total_subjects': subject_cache.count(),
         'completed_subjects': UserProgress.query.filter_by(user_id=current_user.id).filter(UserProgress.progress_percentage >= 70).count()
     }
     
@@ -1289,7 +1323,7 @@ def edit_user(id):
     email = request.form.get('email')
     password = request.form.get('password')
     
-    existing_user = User.query.filter(User.username == username).first()
+    existing_user = User.find_by_username(username)
     if existing_user and existing_user.id != user.id:
         flash('Bu username band', 'error')
         return redirect(url_for('admin_users'))
@@ -1300,7 +1334,12 @@ def edit_user(id):
     if password:
         user.set_password(password)
         
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        flash(duplicate_user_message(e), 'error')
+        return redirect(url_for('admin_users'))
     flash('Ma\'lumotlar yangilandi', 'success')
     return redirect(url_for('admin_users'))
 
@@ -1359,7 +1398,7 @@ def subject_detail(subject):
     """Fan detail sahifasi"""
     
     # DB dan fan ma'lumotlarini olish
-    subject_obj = Subject.query.filter_by(name=subject).first()
+    subject_obj = subject_cache.by_name(subject)
     if not subject_obj:
         flash('Fan topilmadi!', 'error')
         return redirect(url_for('learning_center'))
@@ -1459,7 +1498,7 @@ def delete_announcement(id):
 @admin_required
 def admin_content():
     """Kontent boshqaruvi (Fanlar va Kitoblar)"""
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     books = Literature.query.all()
     return render_template('admin/content_manager.html', subjects=subjects, books=books)
 
@@ -1467,14 +1506,15 @@ def admin_content():
 @admin_required
 def delete_subject(id):
     subject = Subject.query.get_or_404(id)
-    # Check for related data
-    if UserProgress.query.filter_by(subject_id=id).first():
-        flash('Bu fanga bog\'liq ma\'lumotlar (progress) mavjud, o\'chirib bo\'lmaydi!', 'error')
+    # Check for related data: subject.id ga tashqi kalitli har bir jadval
+    if any(model.query.filter_by(subject_id=id).first()
+           for model in (UserProgress, TestResult, Quiz, Question, Assignment)):
+        flash('Bu fanga bog\'liq ma\'lumotlar (progress, testlar, savollar) mavjud, o\'chirib bo\'lmaydi!', 'error')
     else:
-        return redirect(url_for('subject_detail', id=sub.id))
-    
-    flash('Fan topilmadi', 'error')
-    return redirect(url_for('learning_center'))
+        db.session.delete(subject)
+        db.session.commit()
+        flash(f'{subject.name} fani o\'chirildi', 'success')
+    return redirect(url_for('admin_content'))
 
 @app.route('/ai-tutor')
 @login_required
@@ -1549,8 +1589,13 @@ def upload_book():
             # Save file (prepend timestamp to avoid overwrite)
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             final_filename = f"{timestamp}_{filename}"
+            file_bytes = read_upload(file)
             file.save(os.path.join(upload_folder, final_filename))
             
+            # Matnni fon oqimida keshlash: shu kitobdan test tuzilganda qayta tahlil qilinmaydi
+            if is_supported(filename):
+                threading.Thread(target=extraction_cache.warm, args=(file_bytes, filename), daemon=True).start()
+            
             # Create DB entry
             book = Literature(
                 title=title,
@@ -1619,7 +1664,13 @@ def download_book(id):
     return redirect(url_for('static', filename=book.file_path))
 
 # Database initialization - MA'LUMOTLAR YANGILANMAYDI
+@app.cli.command('init-db')
+def init_db_command():
+    """Jadvallarni yaratish va boshlang'ich ma'lumotlar (release bosqichi)"""
+    init_db()
+
 def init_db():
+    create_app()
     with app.app_context():
         # Faqat jadvallar mavjud bo'lmaganda yaratish
         db.create_all()
@@ -1662,10 +1713,6 @@ def init_db():
             
             db.session.commit()
             
-            # User progress yaratish
-            create_user_progress(admin.id)
-            create_user_progress(demo.id)
-            
             print("[+] Database initialized successfully!")
         else:
             print(f"[*] Database allaqachon mavjud: {existing_subjects} ta fan")
@@ -1681,6 +1728,7 @@ def create_quiz():
         file = request.files['file']
         title = request.form.get('title')
         subject_id = request.form.get('subject_id')
+        count = max(1, min(request.form.get('count', 5, type=int) or 5, 50))
         
         if file.filename == '':
             flash('Fayl tanlanmadi', 'error')
@@ -1688,13 +1736,21 @@ def create_quiz():
             
         if file:
             try:
-                text = extract_text_from_file(file)
+                # Butun hujjat o'qiladi (avval yuklangan bo'lsa keshdan)
+                document = extraction_cache.extract(file, max_chars=QUIZ_DOCUMENT_LIMIT)
+                text = document['text']
                 if len(text) < 50:
                     flash('Fayl ichida yetarli matn topilmadi', 'error')
                     return redirect(request.url)
                 
-                # AI orqali test tuzish
-                questions_data = ai_assistant.generate_quiz_from_text(text)
+                # AI orqali test tuzish: bo'laklar bo'yicha parallel (AI hovuzi ichida)
+                try:
+                    with ai_pool.slot():
+                        questions_data, coverage = ai_assistant.generate_quiz_from_document(
+                            text, count, document['page_offsets'])
+                except AIPoolBusy:
+                    flash(AI_BUSY_MESSAGE, 'warning')
+                    return redirect(request.url)
                 
                 if not questions_data:
                     flash('AI test tuza olmadi. Iltimos qaytadan urining.', 'error')
@@ -1703,18 +1759,20 @@ def create_quiz():
                 return render_template('teacher/quiz_preview.html', 
                                      questions=questions_data, 
                                      title=title, 
-                                     subject_id=subject_id)
+                                     subject_id=subject_id,
+                                     coverage=coverage,
+                                     total_chars=len(text))
             except Exception as e:
                 flash(f'Xatolik: {str(e)}', 'error')
                 return redirect(request.url)
     
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     return render_template('teacher/create_quiz.html', subjects=subjects)
 
 @app.route('/teacher/quiz/create/manual', methods=['GET'])
 @teacher_required
 def create_quiz_manual():
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     return render_template('teacher/create_quiz_manual.html', subjects=subjects)
 
 @app.route('/teacher/quiz/create/unique', methods=['GET', 'POST'])
@@ -1748,7 +1806,7 @@ def create_quiz_unique():
         flash('Individual AI testi muvaffaqiyatli yaratildi!', 'success')
         return redirect(url_for('teacher_quizzes'))
         
-    subjects = Subject.query.all()
+    subjects = subject_cache.all()
     return render_template('teacher/create_quiz_unique.html', subjects=subjects)
 
 @app.route('/teacher/quiz/save', methods=['POST'])
@@ -1765,6 +1823,9 @@ def save_quiz():
             
         questions_data = json.loads(questions_json)
         
+        # Barcha savollar bazaga yozishdan oldin tekshiriladi
+        rows = build_question_rows(questions_data, subject_id=int(subject_id) if subject_id else 1)
+        
         # Create Quiz
         quiz = Quiz(
             title=title,
@@ -1772,40 +1833,10 @@ def save_quiz():
             subject_id=int(subject_id) if subject_id else None
         )
         db.session.add(quiz)
-        db.session.commit()
+        db.session.flush()
         
-        # Create Questions
-        for q in questions_data:
-            # Handle different types
-            q_type = q.get('type', 'multi')
-            
-            question = Question(
-                question_text=q['question'],
-                question_type=q_type,
-                subject_id=int(subject_id) if subject_id else 1,
-                quiz_id=quiz.id,
-                correct_text=q.get('correct_text'),
-                code_language=q.get('code_language')
-            )
-            
-            # Options logic
-            if q_type == 'multi':
-                question.option_a = q['options']['A']
-                question.option_b = q['options']['B']
-                question.option_c = q['options']['C']
-                question.option_d = q['options']['D']
-                question.correct_option = q['correct_answer']
-            
-            elif q_type == 'match':
-                # For match, we stored pairs in correct_text as JSON
-                # And displayed options in options A-D for right side
-                question.option_a = q['options']['A']
-                question.option_b = q['options']['B']
-                question.option_c = q['options']['C']
-                question.option_d = q['options']['D']
-                # correct_text holds the JSON map
-            
-            db.session.add(question)
+        # Create Questions (bitta INSERT, bitta tranzaksiya)
+        bulk_insert_questions(rows, quiz_id=quiz.id)
         
         db.session.commit()
         flash('Test muvaffaqiyatli saqlandi!', 'success')
@@ -1914,7 +1945,38 @@ def view_quiz(id):
         flash('Bu testni ko\'rish huquqingiz yo\'q!', 'error')
         return redirect(url_for('teacher_quizzes'))
     
-    return render_template('teacher/view_quiz.html', quiz=quiz)
+    regrade_job = RegradeJob.query.filter_by(quiz_id=quiz.id).order_by(RegradeJob.id.desc()).first()
+    return render_template('teacher/view_quiz.html', quiz=quiz, regrade_job=regrade_job)
+
+@app.route('/teacher/quiz/<int:id>/regrade', methods=['POST'])
+@teacher_required
+def regrade_quiz_results(id):
+    """Test natijalarini saqlangan javoblardan qayta hisoblash (fon ishi)"""
+    quiz = Quiz.query.get_or_404(id)
+    if quiz.teacher_id != current_user.id:
+        flash('Ruxsat yo\'q!', 'error')
+        return redirect(url_for('teacher_quizzes'))
+    if quiz.is_unique:
+        flash('Unikal test natijalari qayta baholanmaydi.', 'warning')
+        return redirect(url_for('view_quiz', id=id))
+
+    job, started = start_regrade_job(app, quiz.id, current_user.id,
+                                     regrade_open=request.form.get('regrade_open') == '1')
+    if started:
+        flash('Natijalarni qayta baholash boshlandi.', 'info')
+    else:
+        flash('Bu test uchun qayta baholash allaqachon ketmoqda.', 'warning')
+    return redirect(url_for('view_quiz', id=id))
+
+@app.route('/teacher/regrade/<int:job_id>')
+@teacher_required
+def regrade_status(job_id):
+    """Qayta baholash progressi (view_quiz sahifasi so'rab turadi)"""
+    job = RegradeJob.query.get_or_404(job_id)
+    quiz = Quiz.query.get(job.quiz_id)
+    if not quiz or quiz.teacher_id != current_user.id:
+        return jsonify({'error': 'Ruxsat berilmagan'}), 403
+    return jsonify(job.to_dict())
 
 @app.route('/teacher/quiz/<int:id>/delete', methods=['POST'])
 @teacher_required
@@ -2015,27 +2077,22 @@ def group_analytics(id):
     
     return render_template('teacher/group_analytics.html', group=group, analytics=analytics_data)
 
-def extract_text_from_file(file):
-    text = ""
-    filename = file.filename
-    
-    if filename.endswith('.pdf'):
-        pdf = PdfReader(file)
-        for page in pdf.pages:
-            text += page.extract_text() + "\n"
-            
-    elif filename.endswith('.docx'):
-        doc = Document(file)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-            
-    return text
-
 @app.route('/student/quizzes')
 @login_required
 def student_quizzes():
-    quizzes = Quiz.query.order_by(Quiz.created_at.desc()).all()
-    return render_template('student/quizzes.html', quizzes=quizzes)
+    """O'quvchi guruhlariga biriktirilgan testlar (keyset pagination)"""
+    cursor = None
+    after = request.args.get('after', '')
+    if after:
+        try:
+            created_at, quiz_id = after.rsplit('_', 1)
+            cursor = (datetime.fromisoformat(created_at), int(quiz_id))
+        except ValueError:
+            return redirect(url_for('student_quizzes'))
+
+    rows, next_cursor = get_student_quiz_page(current_user.id, cursor)
+    next_after = f"{next_cursor[0].isoformat()}_{next_cursor[1]}" if next_cursor else None
+    return render_template('student/quizzes.html', quizzes=rows, next_after=next_after, is_first_page=not cursor)
 
 @app.route('/student/quiz/<int:id>')
 @login_required
@@ -2048,8 +2105,13 @@ def take_quiz(id):
         grade = params.get('grade', '5')
         count = params.get('count', 10)
         
-        # O'quvchi uchun maxsus savollar tuzish
-        questions = ai_assistant.generate_unique_questions(topic, grade, count)
+        # O'quvchi uchun maxsus savollar tuzish (AI hovuzi ichida)
+        try:
+            with ai_pool.slot():
+                questions = ai_assistant.generate_unique_questions(topic, grade, count)
+        except AIPoolBusy:
+            flash(AI_BUSY_MESSAGE, 'warning')
+            return redirect(url_for('student_quizzes'))
         
         # Savollarni sessiyada saqlash (grading uchun)
         session['unique_quiz_id'] = id
@@ -2057,7 +2119,7 @@ def take_quiz(id):
         
         return render_template('student/take_quiz_unique.html', quiz=quiz, questions=questions)
         
-    return render_template('student/take_quiz.html', quiz=quiz)
+    return render_template('student/take_quiz.html', quiz=quiz, compiled=quiz_cache.get(quiz))
 
 @app.template_filter('from_json')
 def from_json_filter(s):
@@ -2076,6 +2138,7 @@ def submit_quiz(id):
     total_q_count = 0
     correct_val = 0 # Can be points or count
     snapshot = None
+    answers_json = None
     
     if quiz.is_unique:
         questions = session.get('unique_quiz_questions', [])
@@ -2112,85 +2175,28 @@ def submit_quiz(id):
         session.pop('unique_quiz_id', None)
         
     else:
-        # 2. Standard Quiz Handling
-        total_q_count = len(quiz.questions)
-        total_max_points = sum([q.points for q in quiz.questions]) or (total_q_count * 10)
-        student_score_points = 0
-        
-        for question in quiz.questions:
-            q_id = str(question.id)
-            if question.question_type == 'multi' or question.question_type == None:
-                user_answer = request.form.get(f'question_{q_id}')
-                if user_answer == question.correct_option:
-                    student_score_points += question.points
-                    
-            # 2. Matching
-            elif question.question_type == 'match':
-                correct_pairs = json.loads(question.correct_text) if question.correct_text else {}
-                pairs_count = len(correct_pairs)
-                correct_matches = 0
-                
-                keys = list(correct_pairs.keys())
-                for i, left_key in enumerate(keys):
-                    idx = i + 1
-                    user_val = request.form.get(f'question_{q_id}_{idx}')
-                    correct_val_pair = correct_pairs[left_key]
-                    if user_val == correct_val_pair:
-                        correct_matches += 1
-                
-                if pairs_count > 0:
-                    ratio = correct_matches / pairs_count
-                    student_score_points += int(question.points * ratio)
-
-            # 3. Text / Code / Math (AI Grading)
-            elif question.question_type in ['text', 'code', 'math']:
-                user_answer = request.form.get(f'question_{q_id}')
-                correct_model = question.correct_text
-                
-                if question.question_type == 'code':
-                    code_language = question.code_language or 'python'
-                    if code_language.lower() == 'python' and user_answer:
-                        try:
-                            compile(user_answer, '<string>', 'exec')
-                        except SyntaxError as e:
-                            # give partial credit for attempt
-                            earned_points = int(question.points * 0.2)
-                            student_score_points += earned_points
-                            continue
-                    
-                grade_result = ai_assistant.grade_answer(question.question_text, user_answer, correct_model)
-                ai_percentage = grade_result.get('score', 0)
-                earned_points = int(question.points * (ai_percentage / 100))
-                student_score_points += earned_points
-
-        if total_max_points > 0:
-            final_score = int((student_score_points / total_max_points) * 100)
-        correct_val = int(student_score_points)
-
-    # 3. Save Unified Result
-    result = TestResult(
-        user_id=current_user.id,
-        subject_id=quiz.subject_id,
-        quiz_id=quiz.id,
-        score=final_score,
-        total_questions=total_q_count,
-        correct_answers=correct_val,
-        unique_questions_snapshot=snapshot
-    )
-    
-    db.session.add(result)
-    
-    # Update Progress
-    if quiz.subject_id:
-        progress = UserProgress.query.filter_by(user_id=current_user.id, subject_id=quiz.subject_id).first()
-        if progress:
-            progress.progress_percentage = max(progress.progress_percentage, final_score)
-            progress.last_activity = datetime.now()
-            
-    db.session.commit()
-    
-    # Update Rank Automatically
-    calculate_user_rank(current_user.id)
+        # 2. Standard Quiz Handling (kompilyatsiya qilingan nusxadan: ORM va JSON parse siz)
+        compiled = quiz_cache.get(quiz)
+        total_q_count = len(compiled.questions)
+        # Xom javoblar natija bilan saqlanadi: savol tuzatilsa qayta baholanadi.
+        # Ochiq savollar AI ga borishi mumkin - baholash AI hovuzi ichida
+        answers = collect_answers(compiled, request.form)
+        if any(q.question_type in OPEN_TYPES for q in compiled.questions):
+            try:
+                with ai_pool.slot():
+                    points, graded = grade_submissions(compiled, [answers])[0]
+            except AIPoolBusy:
+                flash(AI_BUSY_MESSAGE, 'warning')
+                return redirect(url_for('take_quiz', id=id))
+        else:
+            points, graded = grade_submissions(compiled, [answers])[0]
+        final_score = score_percent(compiled, points)
+        correct_val = int(points)
+        answers_json = dump_answers(graded)
+
+    # 3. Save Unified Result (natija, progress va daraja bitta commit bilan)
+    record_result(current_user.id, final_score, total_q_count, correct_val,
+                  subject_id=quiz.subject_id, quiz_id=quiz.id, snapshot=snapshot, answers=answers_json)
     
     msg = f'Sizning natijangiz: {final_score}%.'
     if final_score >= 80:
@@ -2245,11 +2251,10 @@ def teacher_result_detail(id):
                          snapshot=snapshot,
                          student=User.query.get(result.user_id))
 
-# Initialize DB on startup (required for production like Gunicorn)
-init_db()
-
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     print(f"[*] EDUAI Pro ishga tushmoqda... Port: {port}")
+    create_app()
+    init_db()
     app.run(debug=False, host='0.0.0.0', port=port)
 
@@ -0,0 +1,105 @@
+"""Sinf bo'yicha baholash "portlashi": rate limiter va coalescing bilan/siz.
+
+``--students`` ta o'quvchi bir vaqtda ochiq savolga javob yuboradi
+(javoblar ``--distinct`` ta variantdan tanlanadi, ya'ni ko'pchiligi bir
+xil). Har bir javob ``grade_answer`` orqali ``groq_stub`` ga boradi, stub
+esa provayder limitini (``--rpm``, har bir model uchun) taqlid qiladi.
+
+Ikki rejim solishtiriladi:
+
+* ``off`` - eski xatti-harakat: limiter yo'q, 429 da keyingi modelga o'tiladi,
+* ``on``  - ModelRateLimiter + RequestCoalescer + deadline.
+
+    python benchmarks/ai_burst.py --students 120 --distinct 40 --rpm 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from groq_stub import start_in_thread
+
+
+class _NoCoalescing:
+    def run(self, key, fn, **kwargs):
+        return fn()
+
+
+def run_mode(mode, args):
+    import ai_model
+    from ai_limits import ModelRateLimiter, RequestCoalescer
+
+    server, base_url = start_in_thread(port=0, latency=f"fixed:{args.latency}", rpm=args.rpm)
+    enabled = mode == 'on'
+    # Har bir rejim o'z holat faylida (oldingi ishga tushirishdan qolgan bucketlarsiz)
+    state_file = os.path.join(tempfile.mkdtemp(), 'rate.json')
+    ai_model.ai_limiter = ModelRateLimiter(rpm=args.rpm, tpm=args.tpm, share=1, enabled=enabled,
+                                           state_file=state_file)
+    ai_model.ai_coalescer = RequestCoalescer() if enabled else _NoCoalescing()
+    os.environ['GROQ_API_KEY'] = 'stub'
+    assistant = ai_model.GroqAIAssistant(base_url=base_url)
+
+    barrier = threading.Barrier(args.students)
+    latencies = []
+    graded = []
+    lock = threading.Lock()
+
+    def student(i):
+        answer = f"Javob varianti {i % args.distinct}"
+        barrier.wait()
+        started = time.perf_counter()
+        result = assistant.grade_answer("Fotosintez nima?", answer, "Yorug'lik energiyasidan foydalanish")
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            graded.append(result.get('feedback') == 'Stub baho')
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=student, args=(i,)) for i in range(args.students)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    wall = time.perf_counter() - started
+
+    stats = dict(server.state.stats)
+    server.shutdown()
+    return {
+        'mode': mode,
+        'upstream': stats['requests'],
+        'http_429': stats['rate_limited'],
+        'graded': sum(graded),
+        'fallback': len(graded) - sum(graded),
+        'p50': statistics.median(latencies),
+        'p99': sorted(latencies)[int(0.99 * (len(latencies) - 1))],
+        'wall': wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=120)
+    parser.add_argument('--distinct', type=int, default=40, help="turli javoblar soni")
+    parser.add_argument('--rpm', type=int, default=20, help="stub va limiter uchun model RPM limiti")
+    parser.add_argument('--tpm', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f"students={args.students} distinct={args.distinct} rpm={args.rpm}/model latency={args.latency}s\n")
+    print(f"{'mode':<5} {'upstream':>9} {'429':>5} {'graded':>7} {'fallback':>9} {'p50 s':>7} {'p99 s':>7} {'wall s':>7}")
+    for mode in ('off', 'on'):
+        r = run_mode(mode, args)
+        print(f"{r['mode']:<5} {r['upstream']:>9} {r['http_429']:>5} {r['graded']:>7} {r['fallback']:>9} "
+              f"{r['p50']:>7.2f} {r['p99']:>7.2f} {r['wall']:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Lokal kod grader benchmarki: bitta yechimni baholash vaqti va o'tkazuvchanlik.
+
+Har bir yechim ``--cases`` ta test-case bilan tekshiriladi; yechimlarning
+bir qismi noto'g'ri, bir qismi cheksiz sikl (vaqt limiti).
+
+    python benchmarks/code_grader_bench.py
+    python benchmarks/code_grader_bench.py --submissions 40 --workers 4 --loop-share 0
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOLUTIONS = {
+    'correct': "a, b = map(int, input().split())\nprint(a + b)\n",
+    'wrong': "a, b = map(int, input().split())\nprint(a * b)\n",
+    'loop': "while True:\n    pass\n",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--submissions', type=int, default=20)
+    parser.add_argument('--cases', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--loop-share', type=float, default=0.1, help="cheksiz sikl yechimlari ulushi")
+    args = parser.parse_args()
+
+    from code_grader import CodeGrader
+    grader = CodeGrader(workers=args.workers, timeout=args.timeout)
+    cases = [{'input': f"{i} {i + 2}", 'output': str(2 * i + 2)} for i in range(args.cases)]
+
+    loops = int(args.submissions * args.loop_share)
+    kinds = ['loop'] * loops + ['correct', 'wrong'] * ((args.submissions - loops + 1) // 2)
+    kinds = kinds[:args.submissions]
+
+    single = []
+    for kind in kinds:
+        started = time.perf_counter()
+        grader.grade(SOLUTIONS[kind], cases)
+        single.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    results = grader.grade_many([(SOLUTIONS[kind], cases, 'python') for kind in kinds])
+    batch = time.perf_counter() - started
+
+    print(f"{args.submissions} submissions x {args.cases} cases, workers={args.workers}, "
+          f"timeout={args.timeout}s, loops={loops}")
+    print(f"one by one : p50 {statistics.median(single):7.1f} ms/submission, total {sum(single) / 1000:6.2f} s")
+    print(f"grade_many : total {batch:6.2f} s, {args.submissions / batch:6.1f} submissions/s")
+    print(f"scores     : {sorted(r['score'] for r in results)}")
+    print(f"stats      : {grader.stats}")
+
+
+if __name__ == '__main__':
+    main()
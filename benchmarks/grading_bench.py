@@ -0,0 +1,102 @@
+"""Ochiq savolli testni topshirish: AI chaqiruvlari soni va kechikish.
+
+Stub Groq serveri (``groq_stub.py``) oldida ``POST /student/quiz/<id>/submit``
+o'lchanadi. Testda ``--questions`` ta text/math savol bor; javoblarning
+``--clear-share`` qismi aniq (son, ifoda, aynan ibora), qolgani erkin matn.
+
+    python benchmarks/grading_bench.py
+    python benchmarks/grading_bench.py --questions 20 --clear-share 0.5 --latency 0.3
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# (tur, savol, to'g'ri javob, aniq javob, erkin javob)
+QUESTIONS = [
+    ('math', "2(x+1) ni soddalashtiring", "2x+2", "2(x+1)", "ikkita x va yana ikki"),
+    ('math', "1/3 ni o'nli kasrda yozing (2 xona)", "0.33", "1/3", "taxminan uchdan bir"),
+    ('text', "O'zbekiston poytaxti", "Toshkent", "toshkent", "Poytaxt shahar Toshkent hisoblanadi"),
+    ('text', "Suvning kimyoviy formulasi", "H2O", "h2o", "ikki vodorod va bitta kislorod"),
+    ('math', "x^2 - 1 ni ko'paytuvchilarga ajrating", "(x-1)(x+1)", "(x+1)(x-1)", "x minus bir va x plyus bir"),
+]
+
+
+def build(args, base_url):
+    os.environ['GROQ_API_KEY'] = 'stub'
+    os.environ['GROQ_BASE_URL'] = base_url
+    import app as app_module
+    app = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'grading.db')}",
+        'TESTING': True,
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        app_module.init_db()
+
+    from models import db, User, Quiz, Question
+    with app.app_context():
+        teacher = User(username='BenchTeacher', email='t@bench.uz', password_hash='x', role='teacher')
+        student = User(username='BenchStudent', email='s@bench.uz', password_hash='x', role='student')
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        quiz = Quiz(title='Grading bench', teacher_id=teacher.id)
+        db.session.add(quiz)
+        db.session.flush()
+        form = {}
+        clear = int(args.questions * args.clear_share)
+        for i in range(args.questions):
+            q_type, text, correct, clear_answer, free_answer = QUESTIONS[i % len(QUESTIONS)]
+            question = Question(quiz_id=quiz.id, question_type=q_type, question_text=f"{i + 1}. {text}",
+                                correct_text=correct, points=10)
+            db.session.add(question)
+            db.session.flush()
+            form[f'question_{question.id}'] = clear_answer if i < clear else free_answer
+        db.session.commit()
+        return app, quiz.id, student.id, form
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--questions', type=int, default=10)
+    parser.add_argument('--clear-share', type=float, default=0.5)
+    parser.add_argument('--submissions', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.2, help="stub javob kechikishi, soniya")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="stub batch javobidan tushiradigan itemlar ulushi")
+    args = parser.parse_args()
+
+    from groq_stub import start_in_thread
+    server, base_url = start_in_thread(port=0, latency=f"fixed:{args.latency}",
+                                        drop_rate=args.drop_rate)
+    app, quiz_id, student_id, form = build(args, base_url)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(student_id)
+
+    wall, statuses = [], {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.submissions):
+            started = time.perf_counter()
+            response = client.post(f'/student/quiz/{quiz_id}/submit', data=form)
+            wall.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    requests_made = server.state.stats['requests']
+    print(f"{args.questions} open questions, {int(args.questions * args.clear_share)} clear answers, "
+          f"stub latency {args.latency}s")
+    print(f"submit p50 {statistics.median(wall):7.1f} ms, max {max(wall):7.1f} ms, status {statuses}")
+    print(f"LLM requests: {requests_made} total, {requests_made / args.submissions:.1f} per submission, "
+          f"{server.state.stats['prompt_tokens'] / args.submissions:.0f} prompt tokens per submission")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Groq (OpenAI-compatible) API ning oflayn o'rinbosari.
+
+``POST /openai/v1/chat/completions`` ga javob beradi. Kechikish
+taqsimoti, xatolar ulushi va streaming (SSE) sozlanadi. Prompt
+mazmuniga qarab tayyor javob qaytariladi:
+
+* test tuzish prompti (``"correct_answer"`` kaliti bor) - so'ralgan
+  sondagi savollar JSON massivi,
+* baholash prompti (``"score"`` kaliti bor) - ``{"score", "feedback"}``,
+  batch baholash (``"id"`` ham bor) - har bir ``[n]`` uchun bittadan obyekt massivi
+  (``--drop-rate`` ulushi javobdan tushirib qoldiriladi),
+* a2a_nexus agent navbati (``"agreed"`` kaliti bor) - ``{"thought", "message", "agreed"}``,
+* qolgan hammasi - oddiy matnli javob.
+
+``--rpm`` berilsa, provayder limiti ham taqlid qilinadi: har bir model
+uchun oxirgi 60 soniyadagi so'rovlar ``--rpm`` dan oshsa, darhol 429 va
+``retry-after`` qaytariladi.
+
+Ilovani stubga yo'naltirish:
+
+    python benchmarks/groq_stub.py --port 8799 --latency lognormal:0.8,0.4 --error-rate 0.05
+    GROQ_BASE_URL=http://127.0.0.1:8799/openai/v1 GROQ_API_KEY=stub python app.py
+
+Kechikish formatlari: ``fixed:S``, ``uniform:MIN,MAX``, ``normal:MEAN,SD``,
+``lognormal:MEDIAN,SIGMA`` (soniyalarda). ``GET /stats`` so'rovlar
+statistikasini qaytaradi.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_PATH = '/openai/v1/chat/completions'
+MODELS_PATH = '/openai/v1/models'
+
+
+def parse_latency(spec):
+    """'lognormal:0.8,0.4' -> random.Random ni qabul qiladigan funksiya"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v] if params else []
+    if kind == 'fixed':
+        return lambda rng: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Noma'lum kechikish taqsimoti: {spec}")
+
+
+def _tokens(text):
+    # Taxminiy: ~4 belgi = 1 token
+    return max(1, len(text) // 4)
+
+
+def canned_quiz(count, rng):
+    questions = []
+    for i in range(count):
+        a, b = rng.randint(1, 50), rng.randint(1, 50)
+        answer = rng.choice('ABCD')
+        options = {k: str(a + b + offset) for k, offset in zip('ABCD', (-2, -1, 1, 2))}
+        options[answer] = str(a + b)
+        questions.append({'question': f"{i + 1}. {a} + {b} nechaga teng?",
+                          'options': options, 'correct_answer': answer})
+    return json.dumps(questions, ensure_ascii=False)
+
+
+def canned_reply(prompt, rng, drop_rate=0.0):
+    if '"correct_answer"' in prompt:
+        match = re.search(r'(\d+)\s*ta', prompt)
+        return canned_quiz(int(match.group(1)) if match else 5, rng)
+    if '"score"' in prompt and '"id"' in prompt:
+        count = len(re.findall(r'^\s*\[\d+\] ', prompt, re.M))
+        return json.dumps([{'id': n, 'score': rng.randint(40, 100), 'feedback': "Stub baho"}
+                           for n in range(1, count + 1) if rng.random() >= drop_rate], ensure_ascii=False)
+    if '"score"' in prompt:
+        return json.dumps({'score': rng.randint(40, 100), 'feedback': "Stub baho"}, ensure_ascii=False)
+    if '"agreed"' in prompt:
+        return json.dumps({'thought': "Stub fikr", 'message': f"Taklif: ${rng.randint(900, 1100)}",
+                           'agreed': rng.random() < 0.2}, ensure_ascii=False)
+    return "Bu stub serverdan javob. Savolingiz bo'yicha mavzuni qayta ko'rib chiqing."
+
+
+class StubState:
+    def __init__(self, latency, error_rate, error_codes, chunk_delay, seed, rpm=0, drop_rate=0.0):
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.rpm = rpm
+        self._windows = {}
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.chunk_delay = chunk_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'streams': 0,
+                      'in_flight': 0, 'max_in_flight': 0, 'prompt_tokens': 0}
+
+    def admit(self, model):
+        """Provayder RPM limiti: None yoki retry-after (soniya)"""
+        if not self.rpm:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.setdefault(model, deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if len(window) >= self.rpm:
+                self.stats['rate_limited'] += 1
+                return max(1, math.ceil(window[0] + 60 - now))
+            window.append(now)
+        return None
+
+    def draw(self):
+        """(kechikish, xato kodi yoki None, rng) - bitta lock ostida, natija deterministik"""
+        with self._lock:
+            delay = self.latency(self._rng)
+            error = self._rng.choice(self.error_codes) if self._rng.random() < self.error_rate else None
+            rng = random.Random(self._rng.random())
+        return delay, error, rng
+
+    def count(self, key, delta=1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'GroqStub/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path == '/stats':
+            return self._send_json(200, state.stats)
+        if self.path == MODELS_PATH:
+            return self._send_json(200, {'object': 'list', 'data': [
+                {'id': 'llama-3.1-8b-instant', 'object': 'model'},
+                {'id': 'llama-3.3-70b-versatile', 'object': 'model'},
+            ]})
+        self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        if self.path != CHAT_PATH:
+            return self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON', 'type': 'invalid_request_error'}})
+
+        state = self.server.state
+        state.count('requests')
+        model = body.get('model', 'llama-3.1-8b-instant')
+        retry_after = state.admit(model)
+        if retry_after is not None:
+            return self._send_json(429, {'error': {
+                'message': f"Rate limit reached for model {model}", 'type': 'rate_limit_exceeded',
+            }}, {'retry-after': str(retry_after)})
+        state.count('in_flight')
+        try:
+            delay, error, rng = state.draw()
+            time.sleep(delay)
+            if error:
+                state.count('errors')
+                headers = {'retry-after': '1'} if error == 429 else None
+                return self._send_json(error, {'error': {
+                    'message': f"Stub error {error}",
+                    'type': 'rate_limit_exceeded' if error == 429 else 'server_error',
+                }}, headers)
+
+            messages = body.get('messages') or []
+            prompt = '\n'.join(str(m.get('content', '')) for m in messages if m.get('role') == 'user')
+            reply = canned_reply(prompt, rng, state.drop_rate)
+            if body.get('stream'):
+                state.count('streams')
+                return self._stream(model, reply, state.chunk_delay)
+
+            prompt_tokens = sum(_tokens(str(m.get('content', ''))) for m in messages)
+            completion_tokens = _tokens(reply)
+            state.count('prompt_tokens', prompt_tokens)
+            self._send_json(200, {
+                'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+        finally:
+            state.count('in_flight', -1)
+
+    def _stream(self, model, reply, chunk_delay):
+        """OpenAI SSE formatida bo'laklab yuborish"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+        def event(delta, finish_reason=None):
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                       'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        event({'role': 'assistant', 'content': ''})
+        for piece in re.findall(r'\S+\s*', reply):
+            time.sleep(chunk_delay)
+            event({'content': piece})
+        event({}, 'stop')
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(host='127.0.0.1', port=8799, latency='fixed:0.5', error_rate=0.0,
+                error_codes=(429, 500, 503), chunk_delay=0.02, seed=0, rpm=0, drop_rate=0.0):
+    """Ishga tushirilmagan server (benchmarklarda thread ichida ishlatish uchun)"""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(parse_latency(latency), error_rate, list(error_codes), chunk_delay, seed, rpm,
+                              drop_rate)
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Serverni fon oqimida ishga tushirish; (server, base_url) qaytaradi"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name='groq-stub', daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/openai/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency', default='fixed:0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-codes', default='429,500,503')
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help="streaming bo'laklari orasidagi pauza")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rpm', type=int, default=0, help="har bir model uchun so'rov/daqiqa limiti (0 - cheksiz)")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="batch baholash javobidan tushadigan itemlar ulushi")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate,
+                         [int(code) for code in args.error_codes.split(',') if code], args.chunk_delay, args.seed,
+                         args.rpm, args.drop_rate)
+    print(f"[*] Groq stub: http://{args.host}:{args.port}/openai/v1  (latency={args.latency}, "
+          f"error_rate={args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Login yo'li benchmarki: parol xeshlash narxi, qayta xeshlash va username qidiruvi.
+
+1. Har bir xeshlash usuli uchun bitta parol tekshiruvining CPU vaqti va
+   bitta worker yadrosi soniyasiga ko'tara oladigan loginlar soni.
+2. Flask test client orqali haqiqiy ``POST /login``: foydalanuvchilar
+   ``--from-method`` bilan xeshlangan, ``PASSWORD_HASH_METHOD`` esa
+   ``--to-method``. Birinchi kirish parolni qayta xeshlaydi (ikki xesh
+   narxi), keyingilari yangi usul narxida.
+3. ``lower(username)`` qidiruvining SQLite query plani (indeks ishlatiladimi).
+
+    python benchmarks/login_bench.py
+    python benchmarks/login_bench.py --from-method scrypt:32768:8:1 --to-method scrypt:16384:8:1
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_METHODS = 'scrypt:32768:8:1,scrypt:16384:8:1,pbkdf2:sha256:1000000,pbkdf2:sha256:600000'
+PASSWORD = 'pass123'
+
+
+def hash_costs(methods, rounds):
+    from werkzeug.security import generate_password_hash, check_password_hash
+
+    rows = []
+    for method in methods:
+        stored = generate_password_hash(PASSWORD, method=method)
+        cpu = []
+        for _ in range(rounds):
+            started = time.process_time()
+            check_password_hash(stored, PASSWORD)
+            cpu.append((time.process_time() - started) * 1000)
+        ms = statistics.median(cpu)
+        rows.append((method, ms, 1000 / ms if ms else float('inf')))
+    return rows
+
+
+def build_app(users, from_method):
+    from werkzeug.security import generate_password_hash
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'login_bench.db')
+    import app as app_module
+    app = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}",
+        'TESTING': True,
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        app_module.init_db()
+
+    from models import db, User
+    stored = generate_password_hash(PASSWORD, method=from_method)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(), [
+            {'username': f"Student{i:05d}", 'email': f"s{i}@bench.uz", 'password_hash': stored,
+             'role': 'student', 'rank': "Yangi a'zo", 'is_active': True}
+            for i in range(users)])
+        db.session.commit()
+    return app
+
+
+def run_logins(app, usernames):
+    wall, cpu, statuses = [], [], {}
+    for username in usernames:
+        client = app.test_client()
+        started, started_cpu = time.perf_counter(), time.process_time()
+        response = client.post('/login', data={'username': username, 'password': PASSWORD})
+        wall.append((time.perf_counter() - started) * 1000)
+        cpu.append((time.process_time() - started_cpu) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statistics.median(wall), statistics.median(cpu), statuses
+
+
+def query_plan(app):
+    from models import db, User
+    with app.app_context():
+        query = User.query.filter(db.func.lower(User.username) == db.func.lower('student00001'))
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        return [row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', default=DEFAULT_METHODS, help="vergul bilan ajratilgan xeshlash usullari")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--from-method', default='scrypt:32768:8:1')
+    parser.add_argument('--to-method', default='scrypt:16384:8:1')
+    args = parser.parse_args()
+
+    print(f"{'method':<26} {'CPU ms/login':>13} {'logins/s/core':>14}")
+    for method, ms, per_core in hash_costs(args.methods.split(','), args.rounds):
+        print(f"{method:<26} {ms:>13.1f} {per_core:>14.1f}")
+
+    import models
+    models.PASSWORD_HASH_METHOD = args.to_method
+    app = build_app(args.users, args.from_method)
+    # Username katta-kichik harfda farq qilsa ham topiladi
+    usernames = [f"student{i:05d}" for i in range(min(args.logins, args.users))]
+
+    print(f"\n/login, {args.users} users, {args.from_method} -> {args.to_method}")
+    for label in ('first login (rehash)', 'next login'):
+        wall, cpu, statuses = run_logins(app, usernames)
+        print(f"{label:<22} p50 {wall:7.1f} ms wall, {cpu:7.1f} ms CPU  status {statuses}")
+
+    from models import User
+    with app.app_context():
+        rehashed = sum(1 for u in User.query.filter(User.username.in_([n.capitalize() for n in usernames]))
+                       if not u.password_needs_rehash())
+    print(f"rehashed: {rehashed}/{len(usernames)}")
+
+    print("\nlower(username) lookup plan:")
+    for line in query_plan(app):
+        print(f"  {line}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Mixed load benchmark: AI endpoints vs ordinary page traffic.
+
+Har bir gunicorn worker turi (sync, gthread, gevent) uchun ilova alohida
+ishga tushiriladi. Ilova ``GROQ_BASE_URL`` orqali ``groq_stub`` serveriga
+yo'naltiriladi: HTTP chaqiruvlar haqiqiy, javob ``--ai-latency`` soniyada
+keladi (tarmoq va kvota kerak emas). Bir vaqtning o'zida:
+
+* ``--ai-clients`` ta mijoz uzluksiz ``/api/ai/chat`` ga so'rov yuboradi,
+* ``--page-clients`` ta mijoz oddiy sahifani (``/login``) ochadi.
+
+Natijada sahifa kechikishi (p50/p99), sahifa throughput'i va AI so'rovlari
+holati chiqariladi:
+
+    python benchmarks/mixed_load.py --duration 15 --classes sync gthread gevent
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from groq_stub import start_in_thread
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_class(worker_class, args, db_url, ai_base_url):
+    import requests
+
+    port = _free_port()
+    env = dict(os.environ,
+               PORT=str(port),
+               DATABASE_URL=db_url,
+               GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads),
+               GROQ_BASE_URL=ai_base_url,
+               GROQ_API_KEY='stub')
+    # PIPE to'lib qolsa server qotadi, shuning uchun log vaqtinchalik faylga
+    log = tempfile.TemporaryFile()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--log-level', 'warning', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+    try:
+        if not _wait_ready(port):
+            log.seek(0)
+            sys.stderr.write(log.read().decode(errors='replace'))
+            raise RuntimeError(f"{worker_class}: server ishga tushmadi")
+        base = f"http://127.0.0.1:{port}"
+
+        stop = threading.Event()
+        page_latencies = []
+        ai_results = []
+        lock = threading.Lock()
+
+        def ai_client():
+            session = requests.Session()
+            session.post(f"{base}/login", data={'username': 'demo', 'password': 'demo123'}, timeout=60)
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    status = session.post(f"{base}/api/ai/chat", json={'message': 'Salom'}, timeout=60).status_code
+                except requests.RequestException:
+                    status = 0
+                with lock:
+                    ai_results.append((status, time.perf_counter() - started))
+
+        def page_client():
+            session = requests.Session()
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    session.get(f"{base}/login", timeout=60)
+                except requests.RequestException:
+                    continue
+                with lock:
+                    page_latencies.append(time.perf_counter() - started)
+
+        clients = [threading.Thread(target=ai_client) for _ in range(args.ai_clients)]
+        # AI mijozlari worker'larni band qilib olishi uchun biroz oldin boshlanadi
+        for t in clients:
+            t.start()
+        time.sleep(0.5)
+        pages = [threading.Thread(target=page_client) for _ in range(args.page_clients)]
+        for t in pages:
+            t.start()
+
+        time.sleep(args.duration)
+        stop.set()
+        for t in clients + pages:
+            t.join(timeout=args.ai_latency * 3 + 60)
+
+        ai_ok = [d for status, d in ai_results if status == 200]
+        return {
+            'class': worker_class,
+            'page_p50': _percentile(page_latencies, 50) * 1000,
+            'page_p99': _percentile(page_latencies, 99) * 1000,
+            'page_rps': len(page_latencies) / args.duration,
+            'ai_ok': len(ai_ok),
+            'ai_busy': sum(1 for status, _ in ai_results if status == 503),
+            'ai_p50': (statistics.median(ai_ok) if ai_ok else 0) * 1000,
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--classes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ai-clients', type=int, default=8)
+    parser.add_argument('--page-clients', type=int, default=4)
+    parser.add_argument('--ai-latency', type=float, default=2.0)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'mixed_load.db')
+    db_url = f"sqlite:///{db_path}"
+    os.environ['DATABASE_URL'] = db_url
+    sys.path.insert(0, ROOT)
+    import app as app_module
+    app_module.init_db()
+    ai_server, ai_base_url = start_in_thread(port=0, latency=f"fixed:{args.ai_latency}")
+
+    print(f"workers={args.workers} threads={args.threads} ai_clients={args.ai_clients} "
+          f"page_clients={args.page_clients} ai_latency={args.ai_latency}s duration={args.duration}s\n")
+    print(f"{'class':<8} {'page p50':>10} {'page p99':>10} {'page rps':>9} {'ai ok':>6} {'ai 503':>7} {'ai p50':>9}")
+    for worker_class in args.classes:
+        r = run_class(worker_class, args, db_url, ai_base_url)
+        print(f"{r['class']:<8} {r['page_p50']:>8.1f}ms {r['page_p99']:>8.1f}ms {r['page_rps']:>9.1f} "
+              f"{r['ai_ok']:>6} {r['ai_busy']:>7} {r['ai_p50']:>7.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
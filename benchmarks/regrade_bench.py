@@ -0,0 +1,114 @@
+"""Testni qayta baholash: natijalar soni bo'yicha vaqt va SQL so'rovlar.
+
+Vaqtinchalik SQLite bazasida ``--students`` ta o'quvchi testni ``--attempts``
+martadan topshirgan (javoblar saqlangan). Bitta savolning to'g'ri javobi
+o'zgartiriladi va ``regrade.regrade_quiz`` o'lchanadi. AI chaqirilmaydi
+(ochiq savollar avvalgi baho bilan).
+
+    python benchmarks/regrade_bench.py
+    python benchmarks/regrade_bench.py --students 5000 --attempts 2 --batch-size 1000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUESTIONS = 10
+
+
+def build(args):
+    import app as app_module
+    app = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'regrade.db')}",
+        'TESTING': True,
+    })
+    with contextlib.redirect_stdout(io.StringIO()):
+        app_module.init_db()
+
+    from models import db, User, Quiz, Question, Subject, TestResult
+    from quiz_cache import compile_quiz
+    from quiz_grading import grade_submissions, score_percent, dump_answers
+    rng = random.Random(1)
+    with app.app_context():
+        teacher = User(username='BenchTeacher', email='t@bench.uz', password_hash='x', role='teacher')
+        subject = Subject(name='Bench', code='bench')
+        db.session.add_all([teacher, subject])
+        db.session.flush()
+        quiz = Quiz(title='Regrade bench', teacher_id=teacher.id, subject_id=subject.id)
+        db.session.add(quiz)
+        db.session.flush()
+        for i in range(QUESTIONS):
+            if i % 2:
+                question = Question(quiz_id=quiz.id, question_type='math', question_text=f"{i}x",
+                                    correct_text=f"{i}x", points=10)
+            else:
+                question = Question(quiz_id=quiz.id, question_type='multi', question_text=str(i),
+                                    option_a='a', option_b='b', correct_option='a', points=10)
+            db.session.add(question)
+        db.session.flush()
+        compiled = compile_quiz(quiz)
+
+        students = [{'username': f'S{i}', 'email': f's{i}@bench.uz', 'password_hash': 'x', 'role': 'student'}
+                    for i in range(args.students)]
+        db.session.execute(db.insert(User), students)
+        student_ids = [row.id for row in db.session.query(User.id).filter(User.role == 'student')]
+
+        submissions = [{str(q.id): rng.choice('ab') if q.question_type == 'multi' else q.correct_text
+                        for q in compiled.questions}
+                       for _ in range(len(student_ids) * args.attempts)]
+        graded = grade_submissions(compiled, submissions)
+        rows = []
+        for n, (points, entries) in enumerate(graded):
+            rows.append({'user_id': student_ids[n % len(student_ids)], 'quiz_id': quiz.id,
+                         'subject_id': subject.id, 'score': score_percent(compiled, points),
+                         'total_questions': QUESTIONS, 'correct_answers': int(points),
+                         'answers_json': dump_answers(entries)})
+        db.session.execute(db.insert(TestResult), rows)
+
+        # O'qituvchi birinchi savol javobini tuzatadi
+        first = db.session.get(Question, compiled.questions[0].id)
+        first.correct_option = 'b'
+        db.session.commit()
+        return app, quiz.id, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--attempts', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    app, quiz_id, results = build(args)
+
+    from sqlalchemy import event
+    from models import db
+    from regrade import regrade_quiz
+    with app.app_context():
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(1))
+        started = time.perf_counter()
+        stats = regrade_quiz(quiz_id, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        first_run = len(statements)
+        again = time.perf_counter()
+        rerun = regrade_quiz(quiz_id, batch_size=args.batch_size)
+        rerun_elapsed = time.perf_counter() - again
+
+    print(f"{results} results, {QUESTIONS} questions, batch {args.batch_size}")
+    print(f"regrade: {elapsed:.2f} s ({results / elapsed:,.0f} results/s), "
+          f"{stats['changed']} changed, {stats['users']} users updated")
+    print(f"SQL statements: {first_run}")
+    print(f"rerun: {rerun_elapsed:.2f} s, {rerun['changed']} changed, "
+          f"{len(statements) - first_run} SQL statements")
+
+
+if __name__ == '__main__':
+    main()
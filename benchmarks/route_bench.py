@@ -0,0 +1,200 @@
+"""Asosiy sahifalar benchmarki (Flask test client, sintetik ma'lumotlar, AI stub).
+
+Vaqtinchalik SQLite bazasida ``generate_data.generate_dataset`` bilan maktab
+ma'lumotlarini yaratadi, so'ng har bir route ni ``--requests`` marta
+chaqiradi va ``perf.route_stats`` dan p50/p99 kechikish hamda SQL so'rovlar
+sonini chiqaradi. LLM chaqiruvlari tarmoqsiz stub bilan almashtiriladi.
+
+Regressiyalarni ushlash uchun natijani saqlab, keyingi ishga tushirishda
+solishtirish mumkin (p99 ``--tolerance`` martadan oshsa yoki SQL soni
+ko'paysa, 1 kod bilan chiqadi):
+
+    python benchmarks/route_bench.py --save baseline.json
+    python benchmarks/route_bench.py --baseline baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Kichik absolyut farqlar (shovqin) regressiya hisoblanmaydi
+LATENCY_SLACK_MS = 5.0
+
+
+def stub_ai():
+    from ai_model import GroqAIAssistant
+    from ai_limits import ai_limiter
+
+    # Upstream yo'q, shuning uchun provayder limitlari ham qo'llanmaydi
+    ai_limiter.enabled = False
+
+    def _try_model(self, model, user_message, user_context):
+        return '{"score": 80, "feedback": "Stub baho"}'
+
+    GroqAIAssistant._try_model = _try_model
+
+
+def build_app(args):
+    db_path = os.path.join(tempfile.mkdtemp(), 'route_bench.db')
+    import app as app_module
+    app = app_module.create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}",
+        'TESTING': True,
+    })
+    app_module.init_db()
+
+    from generate_data import generate_dataset
+    with app.app_context():
+        counts = generate_dataset(teachers=args.teachers, students=args.students,
+                                  results_per_student=args.results_per_student, seed=args.seed)
+    return app, counts
+
+
+def pick_fixtures(app):
+    """Benchmark uchun foydalanuvchilar va obyektlar"""
+    from models import User, Group, GroupMember, Quiz, Question, TestResult
+    from app import db
+    with app.app_context():
+        admin = User.query.filter_by(role='admin').first()
+        # Testlari bo'lgan guruh va uning o'qituvchisi
+        group_id, teacher_id, quiz_id = db.session.query(Group.id, Group.teacher_id, Quiz.id)\
+            .join(Quiz, Quiz.teacher_id == Group.teacher_id)\
+            .join(GroupMember, GroupMember.group_id == Group.id)\
+            .join(TestResult, TestResult.quiz_id == Quiz.id)\
+            .order_by(Group.id).first()
+        student_id = db.session.query(GroupMember.student_id)\
+            .filter(GroupMember.group_id == group_id).order_by(GroupMember.id).first()[0]
+        answers = {}
+        for q in Question.query.filter_by(quiz_id=quiz_id).all():
+            answers[f"question_{q.id}"] = q.correct_option if q.question_type == 'multi' else "Namuna javob"
+        return {
+            'admin': admin.id, 'teacher': teacher_id, 'student': student_id,
+            'group_id': group_id, 'quiz_id': quiz_id, 'answers': answers,
+        }
+
+
+def scenarios(fx):
+    """(nom, rol, metod, url, ma'lumot)"""
+    return [
+        ('dashboard', 'student', 'GET', '/dashboard', None),
+        ('leaderboard', 'student', 'GET', '/leaderboard', None),
+        ('learning_center', 'student', 'GET', '/learning_center', None),
+        ('test_center', 'student', 'GET', '/test_center', None),
+        ('progress_data', 'student', 'GET', '/api/progress_data', None),
+        ('student_quizzes', 'student', 'GET', '/student/quizzes', None),
+        ('library_search', 'student', 'GET', '/library?q=algebra', None),
+        ('take_quiz', 'student', 'GET', f"/student/quiz/{fx['quiz_id']}", None),
+        ('submit_quiz', 'student', 'POST', f"/student/quiz/{fx['quiz_id']}/submit", fx['answers']),
+        ('ai_chat', 'student', 'POST', '/api/ai/chat', {'json': {'message': 'Salom'}}),
+        ('group_quiz_results', 'teacher', 'GET', f"/teacher/group/{fx['group_id']}/quiz_results/{fx['quiz_id']}", None),
+        ('admin_dashboard', 'admin', 'GET', '/admin/dashboard', None),
+        ('admin_panel', 'admin', 'GET', '/admin/', None),
+        ('admin_content', 'admin', 'GET', '/admin/content', None),
+    ]
+
+
+def run(app, fx, requests_per_route, warmup):
+    from perf import route_stats
+
+    clients = {}
+    for role in ('student', 'teacher', 'admin'):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(fx[role])
+            sess['_fresh'] = True
+        clients[role] = client
+
+    results = {}
+    for name, role, method, url, data in scenarios(fx):
+        client = clients[role]
+        statuses = {}
+        for i in range(warmup + requests_per_route):
+            if i == warmup:
+                route_stats.reset()
+            if method == 'GET':
+                response = client.get(url)
+            elif data and 'json' in data:
+                response = client.post(url, json=data['json'])
+            else:
+                response = client.post(url, data=data)
+            if i >= warmup:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        snapshot = route_stats.snapshot()
+        if not snapshot:
+            continue
+        row = snapshot[0]
+        results[name] = {
+            'endpoint': row['endpoint'],
+            'p50': round(row['p50'], 2),
+            'p99': round(row['p99'], 2),
+            'sql_avg': round(row['sql_avg'], 1),
+            'sql_max': row['sql_max'],
+            'statuses': statuses,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    problems = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current['p99'] > base['p99'] * tolerance + LATENCY_SLACK_MS:
+            problems.append(f"{name}: p99 {current['p99']:.1f} ms > {base['p99']:.1f} ms x {tolerance}")
+        if current['sql_max'] > base['sql_max']:
+            problems.append(f"{name}: SQL so'rovlar {current['sql_max']} > {base['sql_max']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help="har bir route uchun so'rovlar soni")
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--teachers', type=int, default=10)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--results-per-student', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help="natijani JSON faylga yozish")
+    parser.add_argument('--baseline', help="oldingi natija bilan solishtirish")
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args()
+
+    stub_ai()
+    # Route lardagi print loglari jadvalni ko'mib yubormasligi uchun
+    with contextlib.redirect_stdout(io.StringIO()):
+        app, counts = build_app(args)
+        fx = pick_fixtures(app)
+        results = run(app, fx, args.requests, args.warmup)
+
+    print(f"Dataset: {', '.join(f'{k}={v}' for k, v in counts.items())}\n")
+
+    print(f"{'route':<20} {'p50 ms':>8} {'p99 ms':>8} {'SQL avg':>8} {'SQL max':>8}  status")
+    for name, r in results.items():
+        statuses = ' '.join(f"{code}x{n}" for code, n in sorted(r['statuses'].items()))
+        print(f"{name:<20} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['sql_avg']:>8.1f} {r['sql_max']:>8}  {statuses}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nNatija saqlandi: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("\n[!] Regressiya:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\n[+] Baseline bilan solishtirildi: regressiya yo'q")
+
+
+if __name__ == '__main__':
+    main()
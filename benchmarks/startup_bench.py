@@ -0,0 +1,87 @@
+"""Worker cold-start benchmark (``python -X importtime``).
+
+Ilovani toza jarayonda import qiladi (``import app; app.create_app()``),
+importtime hisobotidan eng qimmat modullarni chiqaradi va:
+
+* umumiy import vaqti ``--budget-ms`` dan oshsa,
+* yoki startup paytida kechiktirilishi kerak bo'lgan og'ir kutubxonalar
+  (PyPDF2, docx, authlib, requests) yuklangan bo'lsa,
+
+1 kod bilan chiqadi. CI yoki deploydan oldin ishlatish uchun:
+
+    python benchmarks/startup_bench.py --budget-ms 800
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Birinchi so'rovda yuklanishi kerak, worker ishga tushishida emas
+LAZY_MODULES = ('PyPDF2', 'docx', 'authlib', 'requests', 'groq')
+
+STARTUP_CODE = "import app; app.create_app()"
+
+
+def run_once():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"Startup xatosi (kod {proc.returncode})")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = line.replace('import time:', '|').split('|')
+        # Boshidagi probellar import chuqurligini bildiradi
+        modules.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 1000)))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    totals = []
+    modules = []
+    for _ in range(args.runs):
+        modules = run_once()
+        app_entry = next((m for m in modules if m[0] == 'app'), None)
+        totals.append((app_entry[2] if app_entry else sum(m[1] for m in modules)) / 1000)
+
+    median_ms = statistics.median(totals)
+    print(f"'import app' (median of {args.runs}): {median_ms:.1f} ms  [budget {args.budget_ms:.0f} ms]")
+    print(f"\nTop {args.top} modules by cumulative time (last run):")
+    # Faqat yuqori ikki daraja: app va u bevosita import qiladigan modullar
+    shallow = [m for m in modules if len(m[0]) - len(m[0].lstrip()) <= 2]
+    for name, self_us, cumulative_us in sorted(shallow, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms)  {name.strip()}")
+
+    loaded = {m[0].strip().split('.')[0] for m in modules}
+    eager = [name for name in LAZY_MODULES if name in loaded]
+
+    failed = False
+    if eager:
+        print(f"\n[!] Startupda yuklanmasligi kerak bo'lgan modullar: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"\n[!] Startup budjetdan oshdi: {median_ms:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("\n[+] Startup budjet doirasida")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
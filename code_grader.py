@@ -0,0 +1,381 @@
+# code_grader.py
+"""Kod savollarini o'qituvchi test-case lari bo'yicha lokal baholash.
+
+Har bir test-case alohida ``python -I -S`` jarayonida bajariladi. Standart
+holatda jarayon ``unshare`` bilan alohida network/mount/pid namespace da
+ishga tushadi: ildiz faqat interpretator va tizim kutubxonalaridan iborat
+(faqat o'qish uchun, ilova katalogi va /etc, /home, /tmp ko'rinmaydi),
+uid ``nobody`` ga tushiriladi (root bo'lsa), capability lar olib tashlanadi,
+seccomp tarmoq, exec, fork va mount syscall larini rad etadi. CPU, xotira va
+chiqish hajmi rlimit bilan cheklanadi. Audit hook faqat qo'shimcha qatlam.
+
+``CODE_GRADER_WRAPPER`` (masalan nsjail buyrug'i) berilsa, namespace va ildizni
+o'sha tayyorlaydi, seccomp va rlimit baribir qo'llanadi. Izolyatsiya ishlamasa
+lokal baholash o'chadi va kod javoblari AI ga qoladi; ``CODE_GRADER_ISOLATION=none``
+faqat ishlab chiqish uchun.
+"""
+import builtins
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Bir vaqtda ishlaydigan grader jarayonlari soni
+CODE_GRADER_WORKERS = int(os.environ.get('CODE_GRADER_WORKERS', os.cpu_count() or 2))
+# Bitta test-case uchun vaqt (soniya) va xotira limiti (MB)
+CODE_GRADER_TIMEOUT = float(os.environ.get('CODE_GRADER_TIMEOUT', 2))
+CODE_GRADER_MEMORY_MB = int(os.environ.get('CODE_GRADER_MEMORY_MB', 256))
+# stdout/stderr uchun maksimal hajm (bayt)
+CODE_GRADER_OUTPUT_LIMIT = int(os.environ.get('CODE_GRADER_OUTPUT_LIMIT', 64 * 1024))
+# Test-case lar to'liq o'tmasa, qisman ball uchun AI baholashi chaqiriladimi
+CODE_GRADER_AI_FALLBACK = os.environ.get('CODE_GRADER_AI_FALLBACK', '1') != '0'
+CODE_GRADER_WRAPPER = shlex.split(os.environ.get('CODE_GRADER_WRAPPER', ''))
+# unshare (standart) yoki none - OS izolyatsiyasisiz, faqat ishlab chiqish uchun
+CODE_GRADER_ISOLATION = os.environ.get('CODE_GRADER_ISOLATION', 'unshare')
+# Bitta savoldagi test-case lar soni cheklovi
+MAX_TEST_CASES = 50
+# Sandbox jarayoni shu uid/gid ga tushiriladi (grader root bo'lib ishlasa)
+SANDBOX_UID = 65534
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Sandbox ichidagi ishga tushiruvchi: izolyatsiya, limitlar, audit hook, keyin talaba kodi.
+# argv: solution cpu memory output mode layout_json; mode - ns-root, ns-user yoki plain
+_RUNNER = r"""
+import ctypes, json, os, resource, struct, sys
+solution, mode, layout = sys.argv[1], sys.argv[5], json.loads(sys.argv[6])
+cpu, memory, output = (int(v) for v in sys.argv[2:5])
+with open(solution, encoding='utf-8') as f:
+    code = compile(f.read(), 'solution.py', 'exec')
+libc = ctypes.CDLL(None, use_errno=True)
+
+def check(result, what):
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"sandbox: {what}: {os.strerror(errno)}")
+
+def mount(source, target, fstype, flags, data=None):
+    check(libc.mount(source and source.encode(), target.encode(), fstype and fstype.encode(),
+                     ctypes.c_ulong(flags), data and data.encode()), f"mount {target}")
+
+if mode.startswith('ns-'):
+    # Yangi ildiz: faqat interpretator va tizim kutubxonalari, hammasi faqat o'qish uchun
+    MS_RDONLY, MS_NOSUID, MS_NODEV, MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = 1, 2, 4, 32, 4096, 16384, 1 << 18
+    ST_TO_MS = {8: 8, 1024: 1024, 2048: 2048, 4096: 1 << 21}
+    mount(None, '/', None, MS_REC | MS_PRIVATE)
+    root = os.path.join(os.path.dirname(solution), 'root')
+    mount('tmpfs', root, 'tmpfs', MS_NOSUID | MS_NODEV, 'size=64k,mode=0755')
+    for path, target in layout['links']:
+        os.makedirs(os.path.dirname(root + path), exist_ok=True)
+        os.symlink(target, root + path)
+    for path in layout['binds']:
+        if os.path.isdir(path):
+            os.makedirs(root + path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(root + path), exist_ok=True)
+            open(root + path, 'a').close()
+        mount(path, root + path, None, MS_BIND | MS_REC)
+        # Bloklangan (noexec, atime) bayroqlar saqlanishi kerak, aks holda EPERM
+        flags = sum(ms for st, ms in ST_TO_MS.items() if os.statvfs(path).f_flag & st)
+        mount(None, root + path, None, MS_REMOUNT | MS_BIND | MS_RDONLY | MS_NOSUID | flags)
+    for path in layout['hide']:
+        if os.path.isdir(root + path):
+            mount('tmpfs', root + path, 'tmpfs', MS_RDONLY | MS_NOSUID | MS_NODEV, 'size=4k,mode=0555')
+    mount(None, root, None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV, 'size=64k,mode=0755')
+    os.chroot(root)
+    os.chdir('/')
+    if mode == 'ns-root':
+        os.setgroups([])
+        os.setgid(layout['uid'])
+        os.setuid(layout['uid'])
+    # capability lar nolga (user namespace ichidagi root uchun ham)
+    header = struct.pack('Ii', 0x20080522, 0)
+    check(libc.capset(header, bytes(24)), 'capset')
+
+for limit, value in ((resource.RLIMIT_CPU, cpu), (resource.RLIMIT_AS, memory),
+                     (resource.RLIMIT_FSIZE, output), (resource.RLIMIT_CORE, 0)):
+    resource.setrlimit(limit, (value, value))
+
+# seccomp: tarmoq, exec, fork (oqimlardan tashqari), mount, ptrace, namespace syscall lari rad etiladi
+SYSCALLS = {
+    'x86_64': (0xC000003E, 56, 435, (41, 42, 43, 44, 46, 49, 50, 53, 57, 58, 59, 101, 155, 161, 165, 166, 248,
+                                     249, 250, 272, 298, 308, 310, 311, 321, 322, 323, 425, 426, 427, 428,
+                                     429, 430, 431, 432, 433, 442)),
+    'aarch64': (0xC00000B7, 220, 435, (39, 40, 41, 51, 97, 117, 198, 199, 200, 201, 202, 203, 206, 211, 217,
+                                       218, 219, 221, 241, 268, 270, 271, 280, 281, 282, 425, 426, 427, 428,
+                                       429, 430, 431, 432, 433, 442)),
+}
+arch, clone, clone3, denied = SYSCALLS[os.uname().machine]
+ALLOW, KILL, EPERM, ENOSYS = 0x7FFF0000, 0x80000000, 0x50000 | 1, 0x50000 | 38
+LOAD, JEQ, JGE, JSET, RET = 0x20, 0x15, 0x35, 0x45, 0x06
+program = [(LOAD, 0, 0, 4), (JEQ, 1, 0, arch), (RET, 0, 0, KILL), (LOAD, 0, 0, 0),
+           (JGE, 0, 1, 0x40000000), (RET, 0, 0, KILL),
+           # clone faqat CLONE_THREAD bilan; clone3 -> ENOSYS (glibc clone ga qaytadi)
+           (JEQ, 0, 4, clone), (LOAD, 0, 0, 16), (JSET, 1, 0, 0x10000), (RET, 0, 0, EPERM), (RET, 0, 0, ALLOW),
+           (JEQ, 0, 1, clone3), (RET, 0, 0, ENOSYS)]
+for number in denied:
+    program += [(JEQ, 0, 1, number), (RET, 0, 0, EPERM)]
+program.append((RET, 0, 0, ALLOW))
+filters = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *op) for op in program))
+fprog = struct.pack('HP', len(program), ctypes.addressof(filters))
+check(libc.prctl(38, ctypes.c_ulong(1), ctypes.c_ulong(0), ctypes.c_ulong(0), ctypes.c_ulong(0)), 'no_new_privs')
+check(libc.prctl(22, ctypes.c_ulong(2), ctypes.c_char_p(fprog), ctypes.c_ulong(0), ctypes.c_ulong(0)), 'seccomp')
+
+def install_hook(allowed):
+    # Siyosat faqat closure ichida: talaba kodi uni qayta bog'lay olmaydi
+    blocked = ('socket.', 'subprocess.', 'os.system', 'os.exec', 'os.posix_spawn', 'os.spawn',
+               'os.fork', 'os.forkpty', 'os.kill', 'os.killpg', 'os.remove', 'os.rename', 'os.rmdir',
+               'os.mkdir', 'os.chmod', 'os.chown', 'os.link', 'os.symlink', 'os.truncate', 'os.chdir',
+               'os.putenv', 'os.unsetenv', 'ctypes.', 'resource.', 'gc.get_', 'sys.addaudithook',
+               'shutil.', 'pty.', 'signal.', 'mmap.', 'urllib.', 'http.', 'ftplib.', 'smtplib.',
+               'webbrowser.', 'sys._current_frames')
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+    realpath, fsdecode, sep = os.path.realpath, os.fsdecode, os.sep
+
+    def readable(path):
+        return (realpath(fsdecode(path)) + sep).startswith(allowed)
+
+    def audit(event, args):
+        if event.startswith(blocked):
+            raise PermissionError(f"sandbox: {event} taqiqlangan")
+        # import tizimi paket kataloglarini ro'yxatlaydi; boshqa kataloglar yopiq
+        if event in ('os.listdir', 'os.scandir') and not readable(args[0] if args[0] is not None else '.'):
+            raise PermissionError("sandbox: katalogni o'qish taqiqlangan")
+        if event == 'open':
+            path, mode, flags = args
+            if isinstance(path, int):
+                return
+            if (mode and any(c in mode for c in 'wax+')) or (flags or 0) & write_flags:
+                raise PermissionError("sandbox: faylga yozish taqiqlangan")
+            if not readable(path):
+                raise PermissionError("sandbox: faylni o'qish taqiqlangan")
+
+    sys.addaudithook(audit)
+
+install_hook(tuple(os.path.realpath(p) + os.sep for p in sys.path if p))
+namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+del install_hook, check, mount, libc, layout, solution
+exec(code, namespace)
+"""
+
+
+def _sandbox_layout():
+    """Sandbox ildizi: interpretator, stdlib va tizim kutubxonalari; ilova katalogi yashiriladi"""
+    paths = {os.path.realpath(sys.base_prefix), os.path.realpath(sysconfig.get_paths()['stdlib']),
+             os.path.realpath(sysconfig.get_paths()['platstdlib']), '/dev/null', '/dev/zero', '/dev/urandom'}
+    links = []
+    for path in ('/usr', '/lib', '/lib32', '/lib64', '/bin'):
+        if os.path.islink(path):
+            links.append((path, os.readlink(path)))
+        elif os.path.isdir(path):
+            paths.add(path)
+    # Ichma-ich yo'llar bir marta bog'lanadi
+    binds = [p for p in sorted(paths) if os.path.exists(p)
+             and not any(p != other and p.startswith(other.rstrip('/') + '/') for other in paths)]
+    return {'binds': binds, 'links': links, 'hide': [APP_ROOT], 'uid': SANDBOX_UID}
+
+
+def parse_test_cases(raw):
+    """Question.test_cases (JSON matn yoki ro'yxat) -> [{'input', 'output'}, ...]
+
+    Noto'g'ri format ValueError beradi; bo'sh qiymat bo'sh ro'yxat.
+    """
+    if raw is None or raw == '':
+        return []
+    cases = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(cases, list):
+        raise ValueError("test-case lar ro'yxat bo'lishi kerak")
+    if len(cases) > MAX_TEST_CASES:
+        raise ValueError(f"test-case lar {MAX_TEST_CASES} tadan oshmasin")
+    parsed = []
+    for case in cases:
+        if not isinstance(case, dict) or 'output' not in case:
+            raise ValueError("har bir test-case {\"input\", \"output\"} ko'rinishida bo'lishi kerak")
+        parsed.append({'input': str(case.get('input') or ''), 'output': str(case['output'])})
+    return parsed
+
+
+def _normalize(text):
+    """Qator oxiridagi bo'shliqlar va oxirgi bo'sh qatorlar hisobga olinmaydi"""
+    return '\n'.join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _exception_name(error_line):
+    """stderr oxirgi qatoridan faqat standart istisno nomi ("ValueError: ..." -> "ValueError");
+    boshqa matn (talaba chiqargan bo'lishi mumkin) qaytarilmaydi"""
+    name = error_line.strip().split(':', 1)[0]
+    exception = getattr(builtins, name, None)
+    return name if isinstance(exception, type) and issubclass(exception, BaseException) else ''
+
+
+class CodeGrader:
+    """Test-case larni cheklangan jarayonlar hovuzida parallel bajarish"""
+
+    def __init__(self, workers=CODE_GRADER_WORKERS, timeout=CODE_GRADER_TIMEOUT,
+                 memory_mb=CODE_GRADER_MEMORY_MB, output_limit=CODE_GRADER_OUTPUT_LIMIT,
+                 wrapper=CODE_GRADER_WRAPPER, isolation=CODE_GRADER_ISOLATION):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory = memory_mb * 1024 * 1024
+        self.output_limit = output_limit
+        self.wrapper = list(wrapper)
+        self.isolation = isolation
+        self._layout = json.dumps(_sandbox_layout())
+        self._available = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {'cases': 0, 'passed': 0, 'timeouts': 0, 'errors': 0}
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='code-grader')
+        return self._executor
+
+    def _command(self, workdir):
+        cpu = max(1, int(self.timeout + 0.999))
+        prefix, mode = self.wrapper, 'plain'
+        if not self.wrapper and self.isolation != 'none':
+            # Root bo'lsa uid nobody ga tushiriladi, aks holda user namespace ichida
+            mode = 'ns-root' if os.geteuid() == 0 else 'ns-user'
+            prefix = ['unshare', '--net', '--mount', '--pid', '--ipc', '--uts', '--kill-child']
+            if mode == 'ns-user':
+                prefix.append('--map-root-user')
+        return prefix + [sys.executable, '-I', '-S', '-c', _RUNNER, os.path.join(workdir, 'solution.py'),
+                         str(cpu), str(self.memory), str(self.output_limit), mode, self._layout]
+
+    def available(self):
+        """Sandbox shu muhitda ishlaydimi (bir marta tekshiriladi). Ishlamasa lokal
+        baholash o'chadi - izolyatsiyasiz talaba kodi bajarilmaydi."""
+        if self._available is None:
+            workdir = self._workdir('print(input())')
+            try:
+                result = self.run_case(workdir, 0, {'input': 'ok', 'output': 'ok'})
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            self._available = result['status'] == 'passed'
+            if self._available and self.isolation == 'none' and not self.wrapper:
+                print("[code_grader] OGOHLANTIRISH: OS izolyatsiyasi o'chirilgan (CODE_GRADER_ISOLATION=none)")
+            if not self._available:
+                print(f"[code_grader] sandbox ishlamadi ({result['error'] or result['status']}), "
+                      f"kod javoblari AI ga yuboriladi")
+        return self._available
+
+    @staticmethod
+    def _workdir(code):
+        workdir = tempfile.mkdtemp(prefix='grader-')
+        os.mkdir(os.path.join(workdir, 'root'))
+        with open(os.path.join(workdir, 'solution.py'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        return workdir
+
+    def run_case(self, workdir, index, case):
+        """Bitta test-case: {'status': passed|wrong|timeout|error, 'output', 'error'}"""
+        out_path = os.path.join(workdir, f'out{index}')
+        err_path = os.path.join(workdir, f'err{index}')
+        status = None
+        with open(out_path, 'wb') as out, open(err_path, 'wb') as err:
+            try:
+                proc = subprocess.run(self._command(workdir), input=case['input'].encode('utf-8'),
+                                      stdout=out, stderr=err, cwd=workdir, timeout=self.timeout,
+                                      env={'PYTHONIOENCODING': 'utf-8', 'PYTHONHASHSEED': '0',
+                                           'PYTHONDONTWRITEBYTECODE': '1'})
+                returncode = proc.returncode
+            except subprocess.TimeoutExpired:
+                status, returncode = 'timeout', None
+
+        with open(out_path, 'rb') as f:
+            output = f.read(self.output_limit).decode('utf-8', 'replace')
+        with open(err_path, 'rb') as f:
+            error_lines = f.read(self.output_limit).decode('utf-8', 'replace').strip().splitlines()
+        error = error_lines[-1] if error_lines else ''
+
+        if status is None:
+            # RLIMIT_CPU oshsa jarayon SIGXCPU/SIGKILL bilan tugaydi
+            if returncode is not None and returncode < 0:
+                status = 'timeout'
+            elif returncode != 0:
+                status = 'error'
+            else:
+                status = 'passed' if _normalize(output) == _normalize(case['output']) else 'wrong'
+
+        self.stats['cases'] += 1
+        self.stats['passed'] += status == 'passed'
+        self.stats['timeouts'] += status == 'timeout'
+        self.stats['errors'] += status == 'error'
+        return {'status': status, 'output': output, 'error': error}
+
+    def _start(self, code, test_cases):
+        """Bitta yechimning barcha test-case larini hovuzga yuborish"""
+        try:
+            compile(code, 'solution.py', 'exec')
+        except SyntaxError as e:
+            return None, {'score': 0, 'passed': 0, 'total': len(test_cases), 'status': 'syntax_error',
+                          'feedback': f"Sintaksis xatosi: {e.msg} ({e.lineno}-qator)"}
+        workdir = self._workdir(code)
+        pool = self._pool()
+        futures = [pool.submit(self.run_case, workdir, i, case) for i, case in enumerate(test_cases)]
+        return (workdir, futures), None
+
+    @staticmethod
+    def _summarize(results):
+        total = len(results)
+        passed = sum(1 for r in results if r['status'] == 'passed')
+        feedback = f"{passed}/{total} test o'tdi"
+        for i, result in enumerate(results, 1):
+            if result['status'] == 'passed':
+                continue
+            if result['status'] == 'timeout':
+                feedback += f"; {i}-test: vaqt yoki xotira limiti oshdi"
+            elif result['status'] == 'error':
+                # Dastur chiqishi talabaga qaytarilmaydi (sandbox dan ma'lumot chiqarish yo'li),
+                # faqat istisno nomi
+                feedback += f"; {i}-test: {_exception_name(result['error']) or 'xato'} bilan tugadi"
+            else:
+                feedback += f"; {i}-test: natija kutilganidan farq qiladi"
+            break
+        return {'score': int(passed * 100 / total) if total else 0, 'passed': passed, 'total': total,
+                'status': 'passed' if passed == total else 'partial', 'feedback': feedback}
+
+    def grade_many(self, submissions):
+        """[(code, test_cases, language), ...] -> har biri uchun natija yoki None.
+
+        None - lokal baholab bo'lmaydi (Python emas, test-case yo'q yoki javob bo'sh),
+        bunday javoblar AI ga qoladi. Barcha yechimlarning test-case lari bir vaqtda
+        hovuzga yuboriladi.
+        """
+        if not self.available():
+            return [None] * len(submissions)
+        pending = []
+        for code, test_cases, language in submissions:
+            if not test_cases or not code or not code.strip() or (language or 'python').lower() != 'python':
+                pending.append((None, None))
+                continue
+            pending.append(self._start(code, test_cases))
+
+        results = []
+        for started, done in pending:
+            if started is None:
+                results.append(done)
+                continue
+            workdir, futures = started
+            try:
+                results.append(self._summarize([f.result() for f in futures]))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+        return results
+
+    def grade(self, code, test_cases, language='python'):
+        return self.grade_many([(code, test_cases, language)])[0]
+
+
+# Global instance
+code_grader = CodeGrader()
@@ -0,0 +1,293 @@
+# document_extraction.py
+import io
+import multiprocessing
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+
+# Katta PDF fayllar sahifa oraliqlari bo'yicha jarayonlar hovuziga taqsimlanadi
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 40))
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 20))
+PDF_MAX_WORKERS = int(os.environ.get('PDF_MAX_WORKERS', os.cpu_count() or 2))
+# Ko'p oqimli gunicorn ishchisidan fork qilish qulflar bilan osilib qolishi
+# mumkin, shuning uchun jarayonlar 'spawn' (yoki 'forkserver') bilan yaratiladi
+PDF_START_METHOD = os.environ.get('PDF_START_METHOD', 'spawn')
+
+# Sahifasi yo'q formatlar (txt, docx) shu o'lchamdagi bloklarga bo'linadi
+PSEUDO_PAGE_CHARS = 3000
+
+EXTRACTORS = {}
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def register_extractor(*extensions):
+    """Fayl kengaytmasi uchun matn ajratuvchini ro'yxatdan o'tkazish.
+
+    Ajratuvchi ``(data, max_chars)`` qabul qiladi va sahifa matnlarini
+    generator sifatida qaytaradi.
+    """
+    def decorator(func):
+        for ext in extensions:
+            EXTRACTORS[ext.lower().lstrip('.')] = func
+        return func
+    return decorator
+
+
+def get_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+def is_supported(filename):
+    return get_extension(filename) in EXTRACTORS
+
+
+def read_upload(file):
+    """FileStorage yoki fayl obyektidan baytlarni o'qish"""
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    stream = getattr(file, 'stream', file)
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    data = stream.read()
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    return data
+
+
+def iter_document_pages(file, filename=None, max_chars=None):
+    """Hujjat sahifalari matnini birma-bir qaytarish.
+
+    ``max_chars`` berilsa, shuncha belgi yig'ilgach o'qish to'xtatiladi va
+    qolgan sahifalar umuman tahlil qilinmaydi.
+    """
+    filename = filename or getattr(file, 'filename', '') or ''
+    extractor = EXTRACTORS.get(get_extension(filename))
+    if extractor is None:
+        return
+
+    data = read_upload(file)
+    total = 0
+    pages = extractor(data, max_chars)
+    try:
+        for page_text in pages:
+            page_text = page_text or ''
+            if max_chars is not None and total + len(page_text) >= max_chars:
+                yield page_text[:max_chars - total]
+                return
+            total += len(page_text)
+            yield page_text
+    finally:
+        pages.close()
+
+
+def extract_text(file, filename=None, max_chars=None):
+    """Hujjatning butun matnini (yoki ``max_chars`` gacha qismini) olish"""
+    return "\n".join(iter_document_pages(file, filename, max_chars))
+
+
+def normalize_text(text):
+    """Bo'shliqlarni siqish: qator ichidagi ketma-ket probellar va ortiqcha bo'sh qatorlar"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'[ \t\f\v\u00a0]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def extract_document(file, filename=None, max_chars=None):
+    """Normallashtirilgan matn va har bir sahifaning boshlanish pozitsiyasi.
+
+    Natija lug'at: ``text``, ``page_offsets`` va ``complete`` (hujjat
+    oxirigacha o'qilganmi yoki ``max_chars`` da to'xtatilganmi).
+    """
+    parts = []
+    page_offsets = []
+    offset = 0
+    raw_chars = 0
+    for page_text in iter_document_pages(file, filename, max_chars):
+        raw_chars += len(page_text)
+        page_text = normalize_text(page_text)
+        page_offsets.append(offset)
+        parts.append(page_text)
+        offset += len(page_text) + 1
+    return {
+        'text': "\n".join(parts),
+        'page_offsets': page_offsets,
+        'complete': max_chars is None or raw_chars < max_chars
+    }
+
+
+# === PDF ===
+def _pdf_page_range(data, start, stop):
+    """Jarayonlar hovuzida bajariladi: [start, stop) sahifalar matni"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _get_pdf_pool():
+    """Jarayon uchun yagona PDF hovuzi: birinchi kerak bo'lganda yaratiladi.
+
+    Bir vaqtdagi barcha yuklashlar shu hovuzni bo'lishadi, shuning uchun
+    ishchi jarayonlar soni ``PDF_MAX_WORKERS`` dan oshmaydi.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=PDF_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(PDF_START_METHOD)
+            )
+        return _pdf_pool
+
+
+def _drop_pdf_pool(executor):
+    """Buzilgan hovuzni tashlash: keyingi chaqiruv yangisini yaratadi"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is executor:
+            _pdf_pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+@register_extractor('pdf')
+def extract_pdf_pages(data, max_chars=None):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+
+    # Cheklangan o'qishda birinchi sahifalarning o'zi yetadi, hovuz shart emas
+    if max_chars is not None or page_count < PDF_PARALLEL_MIN_PAGES or PDF_MAX_WORKERS < 2:
+        for page in reader.pages:
+            yield page.extract_text() or ''
+        return
+
+    ranges = deque((start, min(start + PDF_PAGES_PER_TASK, page_count))
+                   for start in range(0, page_count, PDF_PAGES_PER_TASK))
+    workers = min(PDF_MAX_WORKERS, len(ranges))
+    executor = _get_pdf_pool()
+    pending = deque()
+    try:
+        # Bir vaqtda faqat `workers` ta oraliq ishlanadi, tartib saqlanadi
+        while ranges or pending:
+            while ranges and len(pending) < workers:
+                start, stop = ranges.popleft()
+                pending.append(executor.submit(_pdf_page_range, data, start, stop))
+            for page_text in pending.popleft().result():
+                yield page_text
+    except BrokenProcessPool:
+        _drop_pdf_pool(executor)
+        raise
+    finally:
+        # Hovuz umumiy: faqat shu hujjatning boshlanmagan vazifalari bekor qilinadi
+        for future in pending:
+            future.cancel()
+
+
+# === DOCX ===
+@register_extractor('docx')
+def extract_docx_pages(data, max_chars=None):
+    from docx import Document
+    doc = Document(io.BytesIO(data))
+    return _group_blocks(para.text for para in doc.paragraphs)
+
+
+# === TXT ===
+def _decode_text(data):
+    for encoding in ('utf-8-sig', 'cp1251'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('latin-1')
+
+
+@register_extractor('txt')
+def extract_txt_pages(data, max_chars=None):
+    return _group_blocks(_decode_text(data).splitlines())
+
+
+def _group_blocks(lines):
+    """Qatorlarni taxminan PSEUDO_PAGE_CHARS o'lchamdagi sahifalarga yig'ish"""
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line) + 1
+        if size >= PSEUDO_PAGE_CHARS:
+            yield "\n".join(block)
+            block = []
+            size = 0
+    if block:
+        yield "\n".join(block)
+
+
+# === EPUB ===
+class _HTMLTextParser(HTMLParser):
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section', 'blockquote'}
+    SKIP_TAGS = {'script', 'style', 'head'}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (line.strip() for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def _epub_spine(archive):
+    """OPF faylidagi spine tartibida kontent hujjatlari yo'llari"""
+    names = set(archive.namelist())
+    try:
+        container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+        rootfile = next(el for el in container.iter() if el.tag.endswith('rootfile'))
+        opf_path = rootfile.get('full-path')
+        opf = ElementTree.fromstring(archive.read(opf_path))
+    except (KeyError, StopIteration, ElementTree.ParseError):
+        return sorted(n for n in names if n.endswith(('.xhtml', '.html', '.htm')))
+
+    base = posixpath.dirname(opf_path)
+    manifest = {}
+    for el in opf.iter():
+        if el.tag.endswith('item') and el.get('id'):
+            manifest[el.get('id')] = posixpath.normpath(posixpath.join(base, el.get('href', '')))
+    spine = [manifest.get(el.get('idref')) for el in opf.iter() if el.tag.endswith('itemref')]
+    return [path for path in spine if path in names]
+
+
+@register_extractor('epub')
+def extract_epub_pages(data, max_chars=None):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in _epub_spine(archive):
+            parser = _HTMLTextParser()
+            parser.feed(_decode_text(archive.read(name)))
+            text = parser.text()
+            if text:
+                yield text
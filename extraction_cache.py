@@ -0,0 +1,118 @@
+# extraction_cache.py
+import hashlib
+import json
+import os
+import threading
+
+from document_extraction import extract_document, read_upload
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'extraction_cache')
+
+
+class ExtractionCache:
+    """Hujjat matnlari uchun diskdagi LRU kesh (kalit: yuklangan baytlarning SHA-256 i).
+
+    Yozuvlar alohida JSON fayllarda saqlanadi, shuning uchun bir nechta
+    gunicorn worker bitta keshdan foydalanadi. Fayl mtime oxirgi
+    foydalanish vaqti sifatida ishlatiladi.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.environ.get('EXTRACTION_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes or int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, digest, max_chars=None):
+        """Keshdagi hujjat yoki None (yozuv so'ralgan hajmni qoplamasa ham None)"""
+        path = self._path(digest)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # To'liq bo'lmagan yozuv faqat kamroq yoki teng hajmdagi so'rovni qoplaydi
+        if not entry.get('complete') and (max_chars is None or (entry.get('max_chars') or 0) < max_chars):
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        if max_chars is not None and len(entry['text']) > max_chars:
+            entry['text'] = entry['text'][:max_chars]
+            entry['page_offsets'] = [o for o in entry['page_offsets'] if o < max_chars]
+        return entry
+
+    def put(self, digest, document):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """Umumiy hajm max_bytes dan oshsa, eng eski ishlatilgan yozuvlarni o'chirish"""
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.name.endswith('.json'):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime, stat.st_size, entry.path))
+                            total += stat.st_size
+            except OSError:
+                return
+
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def extract(self, file, filename=None, max_chars=None):
+        """Keshdan olish, bo'lmasa hujjatni tahlil qilib keshga yozish"""
+        filename = filename or getattr(file, 'filename', '') or ''
+        data = read_upload(file)
+        digest = self.digest(data)
+
+        cached = self.get(digest, max_chars)
+        if cached is not None:
+            return cached
+
+        document = extract_document(data, filename, max_chars)
+        document['max_chars'] = max_chars
+        if document['text']:
+            try:
+                self.put(digest, document)
+            except OSError as e:
+                print(f"Extraction cache write error: {e}")
+        return document
+
+    def warm(self, data, filename):
+        """Kutubxonaga yuklangan kitobni oldindan to'liq keshlash"""
+        try:
+            self.extract(data, filename)
+        except Exception as e:
+            print(f"Extraction cache warm error ({filename}): {e}")
+
+
+# Global instance
+extraction_cache = ExtractionCache()
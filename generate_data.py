@@ -1,46 +1,263 @@
-from app import app, db, User, Subject, TestResult, create_user_progress
-from datetime import datetime, timedelta
+"""Sintetik maktab ma'lumotlari generatori (yuklama testlari va benchmarklar uchun).
+
+O'qituvchilar, guruhlar, o'quvchilar, savollari bilan testlar, bir necha
+yillik natijalar, xabarlar va kutubxona kitoblarini yaratadi. Barcha
+qatorlar bulk INSERT (executemany) bilan, BATCH_SIZE lik bo'laklarda
+yoziladi. Jadvallar va fanlar avval ``python init_db.py`` bilan
+yaratilgan bo'lishi kerak.
+
+    python generate_data.py --students 2000 --teachers 40 --years 3
+"""
+import argparse
 import random
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from models import (User, Subject, Quiz, Question, TestResult, UserProgress, Group, GroupMember,
+                    Assignment, Message, Literature, Purchase, recalculate_total_scores,
+                    PASSWORD_HASH_METHOD)
+from question_bank import build_question_row
+
+BATCH_SIZE = 5000
+DEFAULT_PASSWORD = 'pass123'
+
+FIRST_NAMES = ['Aziz', 'Dilnoza', 'Jasur', 'Malika', 'Sardor', 'Nilufar', 'Bekzod', 'Madina',
+               'Otabek', 'Shahzoda', 'Javohir', 'Gulnoza', 'Rustam', 'Kamola', 'Sherzod', 'Zarina']
+LAST_NAMES = ['Karimov', 'Rashidova', 'Toshmatov', 'Yusupova', 'Aliyev', 'Nazarova',
+              'Ergashev', 'Mirzayeva', 'Qodirov', 'Saidova']
+BOOK_WORDS = ['Asoslar', 'Algebra', 'Mexanika', 'Grammatika', 'Dasturlash', 'Genetika', 'Organik',
+              'Tarix', 'Sheriyat', 'Iqlim', 'Mantiq', 'Tahlil', 'Amaliyot', 'Masalalar', 'Qo\'llanma']
+HASHTAGS = ['#matematika', '#fizika', '#ingliz', '#python', '#biologiya', '#kimyo', '#tarix',
+            '#adabiyot', '#dtm', '#olimpiada']
+
+
+def _bulk(model, rows):
+    """Qatorlarni BATCH_SIZE lik bo'laklarda bitta INSERT bilan yozish"""
+    table = model.__table__
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    return len(rows)
+
+
+def _full_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _random_date(rng, now, days):
+    return now - timedelta(days=rng.uniform(0, days))
+
+
+def generate_dataset(teachers=20, groups_per_teacher=3, students=1000, quizzes_per_teacher=5,
+                     questions_per_quiz=10, years=2, results_per_student=40, messages=5000,
+                     books=300, seed=42):
+    """Ilova konteksti ichida chaqiriladi. Yaratilgan qatorlar sonini qaytaradi."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    history_days = 365 * years
+    counts = {}
 
-def create_test_data():
+    subject_ids = [s.id for s in Subject.query.all()]
+    if not subject_ids:
+        raise RuntimeError("Fanlar topilmadi: avval 'python init_db.py' ni ishga tushiring")
+
+    # Har bir ishga tushirish uchun alohida prefiks: username/email unikal bo'lib qoladi
+    tag = f"g{seed}_{int(time.time()) % 100000}"
+    password_hash = generate_password_hash(DEFAULT_PASSWORD, method=PASSWORD_HASH_METHOD)
+
+    # 1. Foydalanuvchilar
+    user_rows = []
+    for role, amount in (('teacher', teachers), ('student', students)):
+        for i in range(amount):
+            username = f"{tag}_{role[0]}{i}"
+            user_rows.append({
+                'username': username,
+                'email': f"{username}@example.uz",
+                'password_hash': password_hash,
+                'full_name': _full_name(rng),
+                'role': role,
+                'created_at': _random_date(rng, now, history_days),
+                'is_active': True,
+                'rank': "Yangi a'zo",
+            })
+    counts['users'] = _bulk(User, user_rows)
+    created = db.session.query(User.id, User.role).filter(User.username.like(f"{tag}\\_%", escape='\\')).all()
+    teacher_ids = [uid for uid, role in created if role == 'teacher']
+    student_ids = [uid for uid, role in created if role == 'student']
+
+    # 2. Guruhlar va a'zolar
+    codes = set()
+    group_rows = []
+    for teacher_id in teacher_ids:
+        for i in range(groups_per_teacher):
+            code = '%08X' % rng.getrandbits(32)
+            while code in codes:
+                code = '%08X' % rng.getrandbits(32)
+            codes.add(code)
+            group_rows.append({
+                'name': f"{rng.randint(5, 11)}-{'ABCDE'[i % 5]} sinf",
+                'teacher_id': teacher_id,
+                'description': "Generatsiya qilingan guruh",
+                'code': code,
+                'created_at': _random_date(rng, now, history_days),
+            })
+    counts['groups'] = _bulk(Group, group_rows)
+    groups = db.session.query(Group.id, Group.teacher_id).filter(Group.code.in_(codes)).all() if codes else []
+
+    member_rows = []
+    student_groups = {}
+    if groups:
+        for student_id in student_ids:
+            chosen = rng.sample(groups, k=min(len(groups), rng.choice((1, 1, 2))))
+            student_groups[student_id] = chosen
+            for group_id, _ in chosen:
+                member_rows.append({'group_id': group_id, 'student_id': student_id,
+                                    'joined_at': _random_date(rng, now, history_days)})
+    counts['group_members'] = _bulk(GroupMember, member_rows)
+
+    # 3. Testlar va savollar
+    quiz_rows = []
+    for teacher_id in teacher_ids:
+        for i in range(quizzes_per_teacher):
+            quiz_rows.append({
+                'title': f"{tag} test {teacher_id}-{i}",
+                'teacher_id': teacher_id,
+                'subject_id': rng.choice(subject_ids),
+                'created_at': _random_date(rng, now, history_days),
+                'is_unique': False,
+            })
+    counts['quizzes'] = _bulk(Quiz, quiz_rows)
+    quizzes = db.session.query(Quiz.id, Quiz.teacher_id, Quiz.subject_id)\
+        .filter(Quiz.title.like(f"{tag} test %")).all()
+
+    question_rows = []
+    for quiz_id, _, subject_id in quizzes:
+        for position in range(1, questions_per_quiz + 1):
+            # Har o'ninchi savol ochiq (AI baholaydigan) savol
+            if position % 10 == 0:
+                q = {'question': f"{position}-savolni izohlang", 'type': 'text',
+                     'correct_text': "Namuna javob", 'points': 10}
+            else:
+                a, b = rng.randint(1, 50), rng.randint(1, 50)
+                answer = rng.choice('ABCD')
+                options = {k: str(a + b + offset) for k, offset in zip('ABCD', (-2, -1, 1, 2))}
+                options[answer] = str(a + b)
+                q = {'question': f"{a} + {b} = ?", 'type': 'multi', 'options': options,
+                     'correct_answer': answer, 'points': 10}
+            question_rows.append(build_question_row(q, subject_id, quiz_id, position))
+    counts['questions'] = _bulk(Question, question_rows)
+
+    assignment_rows = []
+    quizzes_by_teacher = {}
+    for quiz_id, teacher_id, subject_id in quizzes:
+        quizzes_by_teacher.setdefault(teacher_id, []).append((quiz_id, subject_id))
+    for group_id, teacher_id in groups:
+        for quiz_id, subject_id in rng.sample(quizzes_by_teacher.get(teacher_id, []),
+                                              k=min(2, len(quizzes_by_teacher.get(teacher_id, [])))):
+            created_at = _random_date(rng, now, history_days)
+            assignment_rows.append({
+                'group_id': group_id, 'subject_id': subject_id, 'quiz_id': quiz_id,
+                'title': "Uy vazifasi", 'description': "Testni bajaring",
+                'due_date': created_at + timedelta(days=7), 'created_at': created_at,
+                'is_completed': created_at < now - timedelta(days=7),
+            })
+    counts['assignments'] = _bulk(Assignment, assignment_rows)
+
+    # 4. Progress va natijalar
+    progress_rows = []
+    result_rows = []
+    for student_id in student_ids:
+        best = {}
+        group_quizzes = [q for _, teacher_id in student_groups.get(student_id, [])
+                         for q in quizzes_by_teacher.get(teacher_id, [])]
+        for _ in range(results_per_student):
+            if group_quizzes and rng.random() < 0.5:
+                quiz_id, subject_id = rng.choice(group_quizzes)
+                total = questions_per_quiz
+            else:
+                quiz_id, subject_id = None, rng.choice(subject_ids)
+                total = 10
+            score = max(0, min(100, int(rng.gauss(68, 18))))
+            best[subject_id] = max(best.get(subject_id, 0), score)
+            result_rows.append({
+                'user_id': student_id, 'subject_id': subject_id, 'quiz_id': quiz_id,
+                'score': score, 'total_questions': total,
+                'correct_answers': round(total * score / 100),
+                'completed_at': _random_date(rng, now, history_days),
+            })
+        for subject_id in subject_ids:
+            progress_rows.append({'user_id': student_id, 'subject_id': subject_id,
+                                  'progress_percentage': best.get(subject_id, 0),
+                                  'last_activity': _random_date(rng, now, 30)})
+    counts['user_progress'] = _bulk(UserProgress, progress_rows)
+    counts['test_results'] = _bulk(TestResult, result_rows)
+    recalculate_total_scores(student_ids)
+
+    # 5. Xabarlar
+    everyone = teacher_ids + student_ids
+    message_rows = []
+    if len(everyone) > 1:
+        for _ in range(messages):
+            sender, recipient = rng.sample(everyone, 2)
+            message_rows.append({'sender_id': sender, 'recipient_id': recipient,
+                                 'content': "Salom! Uy vazifasi bo'yicha savolim bor.",
+                                 'is_read': rng.random() < 0.7,
+                                 'created_at': _random_date(rng, now, history_days)})
+    counts['messages'] = _bulk(Message, message_rows)
+
+    # 6. Kutubxona
+    book_rows = []
+    for i in range(books if everyone else 0):
+        is_paid = rng.random() < 0.3
+        book_rows.append({
+            'title': f"{rng.choice(BOOK_WORDS)} {rng.choice(BOOK_WORDS).lower()} ({tag}-{i})",
+            'description': "Generatsiya qilingan kitob",
+            'author': _full_name(rng),
+            'uploader_id': rng.choice(everyone),
+            'file_path': f"generated_{tag}_{i}.pdf",
+            'is_paid': is_paid,
+            'price': f"{rng.randint(5, 50) * 1000} so'm" if is_paid else None,
+            'hashtags': ' '.join(rng.sample(HASHTAGS, 2)),
+            'created_at': _random_date(rng, now, history_days),
+        })
+    counts['books'] = _bulk(Literature, book_rows)
+    book_ids = [bid for (bid,) in db.session.query(Literature.id)
+                .filter(Literature.file_path.like(f"generated_{tag}_%")).all()]
+    purchase_rows = [{'user_id': rng.choice(student_ids), 'book_id': rng.choice(book_ids),
+                      'date': _random_date(rng, now, history_days)}
+                     for _ in range(len(book_ids) // 2)] if student_ids and book_ids else []
+    counts['purchases'] = _bulk(Purchase, purchase_rows)
+
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teachers', type=int, default=20)
+    parser.add_argument('--groups-per-teacher', type=int, default=3)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--quizzes-per-teacher', type=int, default=5)
+    parser.add_argument('--questions-per-quiz', type=int, default=10)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--results-per-student', type=int, default=40)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--books', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app()
     with app.app_context():
-        # Get or create admin user
-        user = User.query.filter_by(username='admin').first()
-        if not user:
-            print("Admin user not found!")
-            return
-
-        # Clear existing results for clean test
-        TestResult.query.filter_by(user_id=user.id).delete()
-        
-        subjects = Subject.query.all()
-        
-        # Generate data for last 30 days
-        print("Generating test results...")
-        for i in range(20):
-            days_ago = random.randint(0, 28)
-            date = datetime.now() - timedelta(days=days_ago)
-            subject = random.choice(subjects)
-            score = random.randint(40, 100)
-            
-            total_questions = 10
-            correct_answers = int(total_questions * (score / 100.0))
-            
-            result = TestResult(
-                user_id=user.id,
-                subject_id=subject.id,
-                score=score,
-                total_questions=total_questions,
-                correct_answers=correct_answers,
-                completed_at=date
-            )
-            db.session.add(result)
-            
-            # Update user progress
-            # (In a real app this logic is in the route, but here we just add results)
-        
-        db.session.commit()
-        print(f"Added 20 test results for user {user.username}")
+        started = time.perf_counter()
+        counts = generate_dataset(**vars(args))
+        elapsed = time.perf_counter() - started
+    for name, amount in counts.items():
+        print(f"  {name:<15} {amount:>8}")
+    print(f"[+] {sum(counts.values())} ta qator {elapsed:.1f} s da yozildi "
+          f"(o'quvchilar paroli: {DEFAULT_PASSWORD})")
+
 
 if __name__ == "__main__":
-    create_test_data()
+    main()
@@ -0,0 +1,30 @@
+# gunicorn.conf.py
+# Ishga tushirish: gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# GUNICORN_WORKER_CLASS:
+#   gthread (standart) - har bir worker'da GUNICORN_THREADS ta oqim.
+#                        AI so'rovlari oqimlarning yarmidan ko'pini band qilmaydi.
+#   gevent             - greenletlar: LLM kutish paytida worker boshqa so'rovlarga xizmat qiladi.
+#                        `pip install gevent` talab qilinadi.
+#   sync               - eski rejim, har bir worker bir vaqtda bitta so'rov.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))
+
+# LLM modellari navbat bilan sinaladi, bitta so'rov uzoq davom etishi mumkin
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# AI hovuzi hajmi worker turiga mos (ai_pool.py import paytida o'qiydi)
+if worker_class == 'gevent':
+    os.environ.setdefault('AI_POOL_SIZE', str(max(1, worker_connections // 2)))
+elif worker_class == 'gthread':
+    os.environ.setdefault('AI_POOL_SIZE', str(max(1, threads // 2)))
+    # Slot kutayotgan so'rov ham oqimni band qiladi, shuning uchun navbat qisqa:
+    # qisqa tig'izlik o'tib ketadi, uzoq kutishlar esa sahifalarni to'smaydi
+    os.environ.setdefault('AI_POOL_WAIT', '2')
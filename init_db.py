@@ -1,11 +1,10 @@
-from app import app
+from app import app, init_db as init_app_db
 from models import db, User
 
 def init_db():
+    # Release bosqichi: jadvallar va boshlang'ich ma'lumotlar (worker'lar ishga tushishidan oldin)
+    init_app_db()
     with app.app_context():
-        # Jadvallarni yaratish
-        db.create_all()
-        
         # Admin tekshirish
         admin = User.query.filter_by(role='admin').first()
         if not admin:
@@ -0,0 +1,114 @@
+# llm_json.py
+import json
+import re
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"'})
+
+
+def _loads_lenient(raw):
+    """JSON obyektni o'qish; LLM ning odatiy xatolarini (ortiqcha vergul, “qo'shtirnoq”) tuzatib ko'rish"""
+    for candidate in (raw, _TRAILING_COMMA.sub(r'\1', raw.translate(_SMART_QUOTES))):
+        try:
+            obj = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(obj, dict):
+            return obj
+    return None
+
+
+class JSONObjectScanner:
+    """Shovqinli yoki chala LLM javobidan to'liq JSON obyektlarni ajratuvchi.
+
+    Matn bo'laklab ``feed`` ga beriladi (streaming), har bir yopilgan eng
+    tashqi ``{...}`` obyekt darhol qaytariladi. Obyektlardan tashqaridagi
+    matn, kod bloklari va ortiqcha qavslar e'tiborga olinmaydi. Buzilgan
+    obyekt uchraganda skanerlash uning ichidan qayta boshlanadi, shuning
+    uchun ichki to'liq obyektlar yo'qolmaydi.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.start = None
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        objects = list(self._scan())
+        self._compact()
+        return objects
+
+    def finish(self):
+        """Oqim tugadi: yopilmagan (kesilgan) obyekt ichidagi to'liq obyektlarni qaytarish"""
+        objects = []
+        while self.start is not None:
+            self._restart()
+            objects.extend(self._scan())
+        self.buffer = ''
+        self.pos = 0
+        return objects
+
+    def _restart(self):
+        self.pos = self.start + 1
+        self.start = None
+
+    def _scan(self):
+        buf = self.buffer
+        while self.pos < len(buf):
+            i = self.pos
+            ch = buf[i]
+            self.pos += 1
+
+            if self.start is None:
+                if ch == '{':
+                    self.start = i
+                    self.stack = ['{']
+                    self.in_string = False
+                    self.escape = False
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.stack.append(ch)
+            elif ch in '}]':
+                if self.stack[-1] != ('{' if ch == '}' else '['):
+                    self._restart()
+                    continue
+                self.stack.pop()
+                if not self.stack:
+                    obj = _loads_lenient(buf[self.start:i + 1])
+                    if obj is None:
+                        self._restart()
+                        continue
+                    self.start = None
+                    yield obj
+
+    def _compact(self):
+        """Qayta ishlangan matnni buferdan olib tashlash"""
+        cut = self.pos if self.start is None else self.start
+        if cut:
+            self.buffer = self.buffer[cut:]
+            self.pos -= cut
+            if self.start is not None:
+                self.start = 0
+
+
+def iter_json_objects(text):
+    """Matndagi barcha to'liq JSON obyektlar (eng tashqi darajada)"""
+    scanner = JSONObjectScanner()
+    yield from scanner.feed(text or '')
+    yield from scanner.finish()
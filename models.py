@@ -1,11 +1,34 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
 import json
+import os
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 
 db = SQLAlchemy()
 
+# Parol xeshlash siyosati (werkzeug formati: "scrypt:N:r:p" yoki "pbkdf2:sha256:iterations").
+# O'zgartirilsa, eski xeshlar foydalanuvchi keyingi safar kirganda qayta xeshlanadi.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+
+def _full_hash_method(method):
+    """Qisqa yozuvni werkzeug xeshga yozadigan to'liq ko'rinishga keltirish"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join([name] + args + defaults[len(args):])
+
 # Database Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -19,6 +42,10 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     is_active = db.Column(db.Boolean, default=True)
     rank = db.Column(db.String(50), default='Yangi a\'zo')
+    # Barcha test natijalari yig'indisi (daraja uchun): natija yozilganda oshiriladi
+    total_score = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Natijalar/progress o'zgarganda oshiriladi: AI konteksti keshi barcha workerlarda eskiradi
+    context_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     progress = db.relationship('UserProgress', backref='user', lazy=True)
@@ -28,17 +55,32 @@ class User(UserMixin, db.Model):
     group_memberships = db.relationship('GroupMember', backref='student', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Xesh joriy PASSWORD_HASH_METHOD siyosatidan boshqa parametrlar bilan yaratilganmi"""
+        stored = (self.password_hash or '').split('$', 1)[0]
+        return _full_hash_method(stored) != _full_hash_method(PASSWORD_HASH_METHOD)
+
+    @classmethod
+    def find_by_username(cls, username):
+        """Katta-kichik harfga qaramay qidirish (lower(username) indeksi ishlatiladi)"""
+        if not username:
+            return None
+        return cls.query.filter(db.func.lower(cls.username) == db.func.lower(username))\
+            .order_by((cls.username == username).desc()).first()
     
     def get_overall_progress(self):
-        progresses = UserProgress.query.filter_by(user_id=self.id).all()
-        if not progresses:
+        # Qatori yo'q fan 0% hisoblanadi: yig'indi barcha fanlar soniga bo'linadi
+        subjects_count = subject_cache.count()
+        if not subjects_count:
             return 0
-        total = sum([p.progress_percentage for p in progresses])
-        return round(total / len(progresses))
+        total = db.session.query(db.func.coalesce(db.func.sum(UserProgress.progress_percentage), 0))\
+            .filter(UserProgress.user_id == self.id).scalar()
+        return round(total / subjects_count)
     
     def get_tests_taken(self):
         return TestResult.query.filter_by(user_id=self.id).count()
@@ -51,7 +93,7 @@ class User(UserMixin, db.Model):
         results = TestResult.query.filter_by(user_id=self.id).order_by(TestResult.completed_at.desc()).limit(limit).all()
         activity = []
         for result in results:
-            subject = db.session.get(Subject, result.subject_id) if result.subject_id else None
+            subject = subject_cache.get(result.subject_id) if result.subject_id else None
             if subject:
                 activity.append({
                     'title': f'{subject.name} testi',
@@ -95,6 +137,9 @@ class Message(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
 
+# Login va ro'yxatdan o'tishdagi lower(username) qidiruvi uchun (katta-kichik harf unikal emas)
+db.Index('ix_user_username_lower', db.func.lower(User.username), unique=True)
+
 class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -109,6 +154,8 @@ class Quiz(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     is_unique = db.Column(db.Boolean, default=False)
     generation_params = db.Column(db.Text) # JSON string
+    # Savollari o'zgarganda oshiriladi (kompilyatsiya qilingan test keshi uchun)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     questions = db.relationship('Question', backref='quiz', lazy=True, cascade="all, delete-orphan")
     results = db.relationship('TestResult', backref='quiz', lazy=True)
@@ -127,6 +174,9 @@ class UserProgress(db.Model):
     progress_percentage = db.Column(db.Integer, default=0)
     last_activity = db.Column(db.DateTime, default=datetime.now)
 
+    # Bitta foydalanuvchi-fan juftligi uchun bitta qator (INSERT ... ON CONFLICT upsert uchun)
+    __table_args__ = (db.UniqueConstraint('user_id', 'subject_id', name='uq_user_progress_user_subject'),)
+
 class TestResult(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -137,9 +187,17 @@ class TestResult(db.Model):
     correct_answers = db.Column(db.Integer, nullable=False)
     completed_at = db.Column(db.DateTime, default=datetime.now)
     unique_questions_snapshot = db.Column(db.Text) # JSON string
+    # Standart test javoblari: {"<question_id>": {"answer": ..., "pct": 0-100[, "pending": true]}}
+    # (qayta baholash uchun; pending - AI baholay olmagan javob)
+    answers_json = db.Column(db.Text)
     
     subject = db.relationship('Subject', backref='test_results')
 
+    # O'quvchining natijalari (umumiy va test bo'yicha: urinishlar, eng yaxshi ball);
+    # test bo'yicha barcha urinishlar id tartibida (qayta baholash)
+    __table_args__ = (db.Index('ix_test_result_user_quiz', 'user_id', 'quiz_id'),
+                      db.Index('ix_test_result_quiz_id', 'quiz_id', 'id'))
+
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.Text, nullable=False)
@@ -151,8 +209,10 @@ class Question(db.Model):
     correct_option = db.Column(db.String(1), nullable=True)
     correct_text = db.Column(db.Text, nullable=True)
     code_language = db.Column(db.String(20), nullable=True)
+    # Kod savollari uchun lokal tekshiruv: JSON [{"input": "...", "output": "..."}]
+    test_cases = db.Column(db.Text, nullable=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=True, index=True)
     points = db.Column(db.Integer, default=10)
 
 class Group(db.Model):
@@ -169,7 +229,7 @@ class Group(db.Model):
 class GroupMember(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
-    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     joined_at = db.Column(db.DateTime, default=datetime.now)
 
 class StudentRequest(db.Model):
@@ -184,7 +244,7 @@ class StudentRequest(db.Model):
 
 class Assignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False, index=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=True)
     title = db.Column(db.String(200), nullable=False)
@@ -209,40 +269,187 @@ class Literature(db.Model):
     
     uploader = db.relationship('User', backref='uploaded_books')
 
+class AICallLog(db.Model):
+    """Har bir AI chaqiruvi: model, tokenlar, kechikish va qaysi route dan kelgani"""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    model = db.Column(db.String(100))
+    feature = db.Column(db.String(100), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+    latency_ms = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='ok') # ok, error, rate_limited, fallback
+    cache_hit = db.Column(db.Boolean, default=False)
+
+class CacheVersion(db.Model):
+    """Jarayonlararo kesh versiyasi: jadval o'zgarganda oshiriladi, workerlar solishtirib qayta yuklaydi"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class RegradeJob(db.Model):
+    """Test natijalarini qayta baholash ishi: holat va progress (har qanday workerdan ko'rinadi)"""
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    regrade_open = db.Column(db.Boolean, default=False)  # ochiq savollar ham qayta baholanadimi
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    changed = db.Column(db.Integer, default=0)
+    skipped = db.Column(db.Integer, default=0)  # javoblari saqlanmagan eski natijalar
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {'id': self.id, 'quiz_id': self.quiz_id, 'status': self.status, 'total': self.total,
+                'processed': self.processed, 'changed': self.changed, 'skipped': self.skipped,
+                'error': self.error}
+
+# Daraja chegaralari (umumiy ball bo'yicha, kamayish tartibida)
+RANK_THRESHOLDS = [(3000, "Ekspert"), (1500, "Mutaxassis"), (500, "Bilimdon"), (100, "Havaskor")]
+DEFAULT_RANK = "Yangi a'zo"
+
+
+def rank_for_score(total_score):
+    for threshold, rank in RANK_THRESHOLDS:
+        if total_score >= threshold:
+            return rank
+    return DEFAULT_RANK
+
+
+def rank_case(score_expr):
+    """rank_for_score ning SQL ko'rinishi (UPDATE ichida hisoblash uchun)"""
+    return db.case(*[(score_expr >= threshold, rank) for threshold, rank in RANK_THRESHOLDS], else_=DEFAULT_RANK)
+
+
 # Helper functions
 def calculate_user_rank(user_id):
+    """Umumiy ball va darajani natijalardan to'liq qayta hisoblash"""
     user = db.session.get(User, user_id)
     if not user: return
     total_score = db.session.query(db.func.sum(TestResult.score)).filter_by(user_id=user_id).scalar() or 0
-    new_rank = user.rank
-    if total_score >= 3000: new_rank = "Ekspert"
-    elif total_score >= 1500: new_rank = "Mutaxassis"
-    elif total_score >= 500: new_rank = "Bilimdon"
-    elif total_score >= 100: new_rank = "Havaskor"
-    else: new_rank = "Yangi a'zo"
-    if user.rank != new_rank:
+    new_rank = rank_for_score(total_score)
+    if user.rank != new_rank or user.total_score != total_score:
         user.rank = new_rank
+        user.total_score = total_score
         db.session.commit()
     return new_rank
 
-def create_user_progress(user_id):
-    subjects = Subject.query.all()
-    for subject in subjects:
-        progress = UserProgress(user_id=user_id, subject_id=subject.id, progress_percentage=0)
-        db.session.add(progress)
-    db.session.commit()
+
+def recalculate_total_scores(user_ids=None):
+    """Natijalar ommaviy o'chirilgandan keyin umumiy ball va darajani bitta UPDATE bilan tiklash.
+    Commit chaqiruvchida."""
+    users, results = User.__table__, TestResult.__table__
+    total = db.select(db.func.coalesce(db.func.sum(results.c.score), 0))\
+        .where(results.c.user_id == users.c.id).scalar_subquery()
+    stmt = users.update().values(total_score=total, rank=rank_case(total),
+                                 context_version=users.c.context_version + 1)
+    if user_ids is not None:
+        if not user_ids:
+            return
+        stmt = stmt.where(users.c.id.in_(list(user_ids)))
+    db.session.execute(stmt)
+
+def recalculate_progress(user_ids, subject_id):
+    """Fan bo'yicha progressni (eng yaxshi natija) bitta UPDATE bilan qayta hisoblash.
+    Commit chaqiruvchida."""
+    if not user_ids or not subject_id:
+        return
+    progress, results = UserProgress.__table__, TestResult.__table__
+    best = db.select(db.func.coalesce(db.func.max(results.c.score), 0))\
+        .where(results.c.user_id == progress.c.user_id, results.c.subject_id == progress.c.subject_id)\
+        .scalar_subquery()
+    db.session.execute(progress.update()
+                       .where(progress.c.subject_id == subject_id, progress.c.user_id.in_(list(user_ids)))
+                       .values(progress_percentage=best))
+
+def get_subject_progress(user_id):
+    """Barcha fanlar bo'yicha progress bitta LEFT JOIN bilan; qatori yo'q fan 0%.
+
+    Progress qatorlari dangasa yaratiladi (birinchi natijada), shuning uchun
+    o'qishlar UserProgress qatori borligiga tayanmaydi.
+    """
+    return db.session.query(
+            Subject.id.label('subject_id'),
+            Subject.name,
+            db.func.coalesce(UserProgress.progress_percentage, 0).label('progress_percentage'),
+            UserProgress.last_activity)\
+        .outerjoin(UserProgress, db.and_(UserProgress.subject_id == Subject.id,
+                                         UserProgress.user_id == user_id))\
+        .order_by(Subject.id).all()
+
+
+# O'quvchi testlar katalogi sahifasi hajmi
+STUDENT_QUIZZES_PER_PAGE = int(os.environ.get('STUDENT_QUIZZES_PER_PAGE', 12))
+
+
+def get_student_quiz_page(student_id, cursor=None, per_page=STUDENT_QUIZZES_PER_PAGE):
+    """O'quvchi guruhlariga biriktirilgan testlar: GroupMember -> Assignment -> Quiz.
+
+    Bitta so'rov: har bir test bilan savollar soni, urinishlar va eng yaxshi ball.
+    Keyset pagination (created_at, id) bo'yicha: ``cursor`` - oldingi sahifaning
+    oxirgi qatori ``(created_at, id)``. ``(rows, next_cursor)`` qaytaradi.
+    """
+    groups = db.select(GroupMember.group_id).where(GroupMember.student_id == student_id)
+    assigned = db.select(Assignment.quiz_id)\
+        .where(Assignment.group_id.in_(groups), Assignment.quiz_id.isnot(None))
+    question_count = db.select(db.func.count(Question.id))\
+        .where(Question.quiz_id == Quiz.id).correlate(Quiz).scalar_subquery()
+    attempts = db.select(db.func.count(TestResult.id))\
+        .where(TestResult.user_id == student_id, TestResult.quiz_id == Quiz.id).correlate(Quiz).scalar_subquery()
+    best_score = db.select(db.func.max(TestResult.score))\
+        .where(TestResult.user_id == student_id, TestResult.quiz_id == Quiz.id).correlate(Quiz).scalar_subquery()
+
+    query = db.session.query(Quiz, question_count.label('question_count'),
+                             attempts.label('attempts'), best_score.label('best_score'))\
+        .filter(Quiz.id.in_(assigned))
+    if cursor:
+        created_at, quiz_id = cursor
+        query = query.filter(db.or_(Quiz.created_at < created_at,
+                                    db.and_(Quiz.created_at == created_at, Quiz.id < quiz_id)))
+    rows = query.order_by(Quiz.created_at.desc(), Quiz.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1].Quiz
+        next_cursor = (last.created_at, last.id)
+    return rows, next_cursor
+
+
+def ensure_user_progress(user_ids=None, subject_ids=None):
+    """Yetishmayotgan progress qatorlarini bitta INSERT ... SELECT bilan yaratish.
+    Yaratilgan qatorlar sonini qaytaradi; commit chaqiruvchida."""
+    users, subjects, progress = User.__table__, Subject.__table__, UserProgress.__table__
+    existing = db.select(progress.c.id)\
+        .where(progress.c.user_id == users.c.id, progress.c.subject_id == subjects.c.id)
+    missing = db.select(users.c.id.label('user_id'), subjects.c.id.label('subject_id'),
+                        db.literal(0).label('progress_percentage'),
+                        db.literal(datetime.now()).label('last_activity'))\
+        .select_from(users.join(subjects, db.true()))\
+        .where(~existing.exists())
+    if user_ids is not None:
+        missing = missing.where(users.c.id.in_(list(user_ids)))
+    if subject_ids is not None:
+        missing = missing.where(subjects.c.id.in_(list(subject_ids)))
+    result = db.session.execute(progress.insert().from_select(
+        ['user_id', 'subject_id', 'progress_percentage', 'last_activity'], missing))
+    return result.rowcount
 
 def get_ai_recommendation(user_id):
-    min_progress = UserProgress.query.filter_by(user_id=user_id).order_by(UserProgress.progress_percentage).first()
+    # Hali boshlanmagan fan (qatori yo'q) 0% - eng zaif hisoblanadi
+    min_progress = min(get_subject_progress(user_id), key=lambda p: p.progress_percentage, default=None)
     if min_progress:
-        subject = db.session.get(Subject, min_progress.subject_id)
-        return f"{subject.name} bo'yicha 20 daqiqalik dars. Siz bu mavzuda {min_progress.progress_percentage}% bilimga egasiz."
+        return f"{min_progress.name} bo'yicha 20 daqiqalik dars. Siz bu mavzuda {min_progress.progress_percentage}% bilimga egasiz."
     return "Darslarni boshlash uchun biror fanni tanlang."
 
 def get_last_lesson(user_id):
     last_progress = UserProgress.query.filter_by(user_id=user_id).order_by(UserProgress.last_activity.desc()).first()
     if last_progress:
-        subject = db.session.get(Subject, last_progress.subject_id)
+        subject = subject_cache.get(last_progress.subject_id)
         return f"{subject.name} - So'nggi dars"
     return "Hali dars boshlanmagan"
 
@@ -251,7 +458,7 @@ def get_next_recommendation(user_id):
     if progresses:
         for progress in progresses:
             if 30 <= progress.progress_percentage < 70:
-                subject = Subject.query.get(progress.subject_id)
+                subject = subject_cache.get(progress.subject_id)
                 return {
                     'title': f'{subject.name} testi',
                     'description': f'Siz {subject.name}da {progress.progress_percentage}% bilimga egasiz. Keyingi bosqichga o\'tish uchun test topshiring.'
@@ -261,27 +468,242 @@ def get_next_recommendation(user_id):
         'description': 'Biror fanni tanlab darslarni boshlang.'
     }
 
+# get_user_context keshi: foydalanuvchi bo'yicha tayyor matn. Yozuv User.context_version
+# bilan birga saqlanadi; natija yozilganda versiya bazada oshadi, shuning uchun boshqa
+# workerlardagi nusxa keyingi so'rovdayoq eskiradi (current_user har so'rovda yuklanadi).
+USER_CONTEXT_TTL = int(os.environ.get('USER_CONTEXT_TTL', 300))
+# System promptga qo'shiladigan kontekst chegarasi (taxminan 4 belgi = 1 token)
+USER_CONTEXT_TOKEN_BUDGET = int(os.environ.get('USER_CONTEXT_TOKEN_BUDGET', 250))
+USER_CONTEXT_RECENT_TESTS = 3
+
+_user_context_cache = {}
+_user_context_lock = threading.Lock()
+
+
+def invalidate_user_context(user_id):
+    with _user_context_lock:
+        _user_context_cache.pop(user_id, None)
+
+
+def _progress_status(percentage):
+    return "A'lo" if percentage >= 80 else "Yaxshi" if percentage >= 60 else "O'rta" if percentage >= 40 else "Zaif"
+
+
+def _trim_to_budget(sections, budget_tokens):
+    """Bo'limlar muhimlik tartibida; sig'magan qatorlar tashlab yuboriladi"""
+    budget = budget_tokens * 4
+    lines = []
+    used = 0
+    for title, items in sections:
+        block = [title] + items if title else items
+        for i, line in enumerate(block):
+            if used + len(line) + 1 > budget:
+                # Sarlavhaning o'zi qolib ketmasin
+                if title and i == 1:
+                    lines.pop()
+                return "\n".join(lines)
+            lines.append(line)
+            used += len(line) + 1
+    return "\n".join(lines)
+
+
+def build_user_context(user_id, username, budget_tokens=USER_CONTEXT_TOKEN_BUDGET):
+    """Foydalanuvchi konteksti ikki so'rov bilan: progress + test agregatlari, so'nggi testlar"""
+    tests_count = db.session.query(db.func.count(TestResult.id))\
+        .filter(TestResult.user_id == user_id).scalar_subquery()
+    tests_avg = db.session.query(db.func.avg(TestResult.score))\
+        .filter(TestResult.user_id == user_id).scalar_subquery()
+    progress = db.func.coalesce(UserProgress.progress_percentage, 0)
+    rows = db.session.query(Subject.name, progress.label('progress_percentage'),
+                            tests_count.label('tests_count'), tests_avg.label('tests_avg'))\
+        .select_from(Subject)\
+        .outerjoin(UserProgress, db.and_(UserProgress.subject_id == Subject.id,
+                                         UserProgress.user_id == user_id))\
+        .order_by(progress, Subject.id).all()
+
+    recent = db.session.query(Subject.name, TestResult.score)\
+        .join(Subject, Subject.id == TestResult.subject_id)\
+        .filter(TestResult.user_id == user_id)\
+        .order_by(TestResult.completed_at.desc())\
+        .limit(USER_CONTEXT_RECENT_TESTS).all()
+
+    if rows:
+        test_count, avg_score = rows[0].tests_count, rows[0].tests_avg
+    else:
+        test_count = db.session.query(db.func.count(TestResult.id)).filter_by(user_id=user_id).scalar()
+        avg_score = db.session.query(db.func.avg(TestResult.score)).filter_by(user_id=user_id).scalar()
+    overall = round(sum(r.progress_percentage or 0 for r in rows) / len(rows)) if rows else 0
+
+    sections = [
+        (None, [
+            f"Foydalanuvchi: {username}",
+            f"Umumiy progress: {overall}%",
+            f"Testlar soni: {test_count or 0} ta",
+            f"O'rtacha ball: {round(avg_score) if avg_score else 0}%",
+        ]),
+        ("So'nggi test natijalari:", [f"- {name}: {score}%" for name, score in recent]),
+        # Eng zaif fanlar birinchi: budjet tugasa, kuchli fanlar tashlab yuboriladi
+        ("Fanlar progressi:", [f"- {r.name}: {r.progress_percentage}% ({_progress_status(r.progress_percentage or 0)})"
+                               for r in rows]),
+    ]
+    return _trim_to_budget([(title, items) for title, items in sections if items], budget_tokens)
+
+
 def get_user_context(user):
-    context_parts = []
+    """AI promptlari uchun foydalanuvchi konteksti (context_version o'zgarmaguncha,
+    ko'pi bilan USER_CONTEXT_TTL soniya keshlanadi)"""
+    now = time.monotonic()
+    version = user.context_version
+    with _user_context_lock:
+        cached = _user_context_cache.get(user.id)
+    if cached and cached[0] > now and cached[1] == version:
+        return cached[2]
     try:
-        context_parts.append(f"Foydalanuvchi: {user.username}")
-        context_parts.append(f"Umumiy progress: {user.get_overall_progress()}%")
-        context_parts.append(f"Testlar soni: {user.get_tests_taken()} ta")
-        context_parts.append(f"O'rtacha ball: {user.get_avg_test_score()}%")
-        user_progress = UserProgress.query.filter_by(user_id=user.id).all()
-        if user_progress:
-            context_parts.append("Fanlar progressi:")
-            for progress in user_progress:
-                subject = Subject.query.get(progress.subject_id)
-                if subject:
-                    status = "A'lo" if progress.progress_percentage >= 80 else "Yaxshi" if progress.progress_percentage >= 60 else "O'rta" if progress.progress_percentage >= 40 else "Zaif"
-                    context_parts.append(f"- {subject.name}: {progress.progress_percentage}% ({status})")
-        recent_tests = TestResult.query.filter_by(user_id=user.id).order_by(TestResult.completed_at.desc()).limit(3).all()
-        if recent_tests:
-            context_parts.append("So'nggi test natijalari:")
-            for test in recent_tests:
-                subject = Subject.query.get(test.subject_id)
-                if subject: context_parts.append(f"- {subject.name}: {test.score}%")
-    except Exception as e:
-        context_parts.append("Statistika mavjud emas")
-    return "\n".join(context_parts)
+        context = build_user_context(user.id, user.username)
+    except Exception:
+        current_app.logger.exception("User context error (user_id=%s)", user.id)
+        return "Statistika mavjud emas"
+    with _user_context_lock:
+        _user_context_cache[user.id] = (now + USER_CONTEXT_TTL, version, context)
+    return context
+
+
+@event.listens_for(TestResult, 'after_insert')
+@event.listens_for(TestResult, 'after_delete')
+@event.listens_for(UserProgress, 'after_insert')
+@event.listens_for(UserProgress, 'after_update')
+def _invalidate_context_on_change(mapper, connection, target):
+    invalidate_user_context(target.user_id)
+
+
+# Fanlar kabi deyarli o'zgarmas jadvallar keshi. Versiya qatori har
+# REFERENCE_CACHE_CHECK_INTERVAL soniyada bir marta tekshiriladi; shu jarayonda
+# qilingan o'zgarish commit bilan darhol ko'rinadi, boshqa workerlarda intervalgacha.
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.environ.get('REFERENCE_CACHE_CHECK_INTERVAL', 5))
+
+SubjectRef = namedtuple('SubjectRef', 'id name code description')
+
+
+class ReferenceCache:
+    """Jadvalning barcha qatorlari xotirada: id, code va name bo'yicha"""
+
+    def __init__(self, model, name, row_factory, check_interval=REFERENCE_CACHE_CHECK_INTERVAL):
+        self.model = model
+        self.name = name
+        self.row_factory = row_factory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._checked = 0.0
+        self.stats = {'loads': 0, 'checks': 0}
+
+    def _db_version(self):
+        row = db.session.get(CacheVersion, self.name)
+        return row.version if row else 0
+
+    def _load(self):
+        version = self._db_version()
+        rows = [self.row_factory(obj) for obj in self.model.query.order_by(self.model.id).all()]
+        self._data = {
+            'all': rows,
+            'id': {r.id: r for r in rows},
+            'code': {r.code: r for r in rows},
+            'name': {r.name: r for r in rows},
+        }
+        self._version = version
+        self.stats['loads'] += 1
+
+    def _current(self):
+        now = time.monotonic()
+        data = self._data
+        if data is not None and now - self._checked < self.check_interval:
+            return data
+        with self._lock:
+            if self._data is None or now - self._checked >= self.check_interval:
+                self.stats['checks'] += 1
+                if self._data is None or self._db_version() != self._version:
+                    self._load()
+                self._checked = now
+            return self._data
+
+    def all(self):
+        return list(self._current()['all'])
+
+    def get(self, id):
+        try:
+            return self._current()['id'].get(int(id))
+        except (TypeError, ValueError):
+            return None
+
+    def by_code(self, code):
+        return self._current()['code'].get(code)
+
+    def by_name(self, name):
+        return self._current()['name'].get(name)
+
+    def count(self):
+        return len(self._current()['all'])
+
+    def expire(self):
+        """Keyingi murojaatda versiya qatorini qayta tekshirish"""
+        self._checked = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._data = None
+            self._version = None
+            self._checked = 0.0
+
+
+subject_cache = ReferenceCache(
+    Subject, 'subject',
+    lambda s: SubjectRef(s.id, s.name, s.code, s.description))
+
+
+def _bump_cache_version(connection, name):
+    table = CacheVersion.__table__
+    result = connection.execute(table.update().where(table.c.name == name)
+                                .values(version=table.c.version + 1))
+    if not result.rowcount:
+        connection.execute(table.insert().values(name=name, version=1))
+
+
+@event.listens_for(Subject, 'after_insert')
+@event.listens_for(Subject, 'after_update')
+@event.listens_for(Subject, 'after_delete')
+def _bump_subject_version(mapper, connection, target):
+    # Versiya o'zgarishi bilan bir tranzaksiyada: rollback bo'lsa, u ham qaytadi
+    _bump_cache_version(connection, subject_cache.name)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('expired_caches', set()).add(subject_cache.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _expire_reference_caches(session):
+    names = session.info.pop('expired_caches', None)
+    if names and subject_cache.name in names:
+        subject_cache.expire()
+
+
+def bump_quiz_versions(quiz_ids, connection=None):
+    """Testlar versiyasini oshirish: kompilyatsiya qilingan nusxalar eskiradi.
+    Commit chaqiruvchida (``connection`` berilsa, o'sha tranzaksiyada)."""
+    quiz_ids = {quiz_id for quiz_id in quiz_ids if quiz_id is not None}
+    if not quiz_ids:
+        return
+    table = Quiz.__table__
+    stmt = table.update().where(table.c.id.in_(quiz_ids)).values(version=table.c.version + 1)
+    (connection or db.session).execute(stmt)
+
+
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+def _bump_quiz_version(mapper, connection, target):
+    quiz_ids = {target.quiz_id}
+    # Savol boshqa testga ko'chirilgan bo'lsa, eskisi ham
+    history = db.inspect(target).attrs.quiz_id.history
+    quiz_ids.update(history.deleted or ())
+    bump_quiz_versions(quiz_ids, connection)
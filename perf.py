@@ -0,0 +1,214 @@
+# perf.py
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Har bir endpoint uchun saqlanadigan oxirgi so'rovlar soni
+PERF_WINDOW = int(os.environ.get('PERF_WINDOW', 500))
+# Sampling profiler: PERF_PROFILE=1 bo'lsa yoqiladi
+PERF_PROFILE = os.environ.get('PERF_PROFILE', '0') == '1'
+PERF_PROFILE_THRESHOLD_MS = float(os.environ.get('PERF_PROFILE_THRESHOLD_MS', 500))
+PERF_PROFILE_INTERVAL = float(os.environ.get('PERF_PROFILE_INTERVAL', 0.005))
+PROFILE_DIR = os.environ.get(
+    'PERF_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'profiles')
+)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+class RouteStats:
+    """Endpointlar bo'yicha kechikish va SQL statistikasi (jarayon ichida)"""
+
+    def __init__(self, window=PERF_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, endpoint, elapsed_ms, sql_count, sql_ms):
+        with self._lock:
+            route = self._routes.get(endpoint)
+            if route is None:
+                route = self._routes[endpoint] = {
+                    'count': 0,
+                    'latency': deque(maxlen=self.window),
+                    'sql_count': deque(maxlen=self.window),
+                    'sql_ms': deque(maxlen=self.window),
+                }
+            route['count'] += 1
+            route['latency'].append(elapsed_ms)
+            route['sql_count'].append(sql_count)
+            route['sql_ms'].append(sql_ms)
+
+    def snapshot(self):
+        """Sekin endpointlar birinchi (p99 bo'yicha)"""
+        with self._lock:
+            routes = {name: {k: (list(v) if isinstance(v, deque) else v) for k, v in data.items()}
+                      for name, data in self._routes.items()}
+        rows = []
+        for name, data in routes.items():
+            latency, sql_count, sql_ms = data['latency'], data['sql_count'], data['sql_ms']
+            rows.append({
+                'endpoint': name,
+                'count': data['count'],
+                'p50': _percentile(latency, 50),
+                'p95': _percentile(latency, 95),
+                'p99': _percentile(latency, 99),
+                'sql_avg': sum(sql_count) / len(sql_count),
+                'sql_max': max(sql_count),
+                'sql_ms_avg': sum(sql_ms) / len(sql_ms),
+            })
+        return sorted(rows, key=lambda r: r['p99'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+class StackSampler:
+    """Faol so'rov oqimlarining steklarini vaqti-vaqti bilan yig'uvchi profiler.
+
+    Natija "folded stacks" formatida (``a;b;c 12``): flamegraph.pl yoki
+    speedscope bilan ochiladi. gevent rejimida barcha greenletlar bitta
+    oqimda bo'lgani uchun faqat ayni paytda ishlayotgan greenlet ko'rinadi.
+    """
+
+    def __init__(self, interval=PERF_PROFILE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='perf-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, None)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counter in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        counter[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+
+route_stats = RouteStats()
+stack_sampler = StackSampler()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perf_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['perf_query_start'].pop()
+    if has_request_context() and 'perf_start' in g:
+        g.perf_sql_count += 1
+        g.perf_sql_ms += (time.perf_counter() - started) * 1000
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # Xato bergan so'rovda after_cursor_execute chaqirilmaydi: boshlanish vaqtini
+    # olib tashlaymiz, aks holda ulanishdagi keyingi so'rovlar noto'g'ri juftlanadi
+    conn = exception_context.connection
+    if conn is None or exception_context.execution_context is None:
+        return
+    starts = conn.info.get('perf_query_start')
+    if starts:
+        starts.pop()
+
+
+def _dump_profile(counter, endpoint, elapsed_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint)
+    path = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{name}-{int(elapsed_ms)}ms.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, samples in counter.most_common():
+            f.write(f"{stack} {samples}\n")
+    return path
+
+
+def list_profiles(limit=20):
+    """Oxirgi saqlangan profillar (yangilari birinchi)"""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith('.folded')]
+    except OSError:
+        return []
+    return sorted(names, reverse=True)[:limit]
+
+
+def init_perf(app):
+    """So'rov hooklarini ulash. Debug rejimida natijalar X-SQL-* sarlavhalarida ham qaytadi."""
+
+    @app.before_request
+    def _perf_before_request():
+        g.perf_start = time.perf_counter()
+        g.perf_sql_count = 0
+        g.perf_sql_ms = 0.0
+        if PERF_PROFILE:
+            stack_sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _perf_after_request(response):
+        if 'perf_start' not in g:
+            return response
+        elapsed_ms = (time.perf_counter() - g.perf_start) * 1000
+        endpoint = request.endpoint or 'unknown'
+        if endpoint != 'static':
+            route_stats.record(endpoint, elapsed_ms, g.perf_sql_count, g.perf_sql_ms)
+
+        if PERF_PROFILE:
+            counter = stack_sampler.stop(threading.get_ident())
+            if counter and elapsed_ms >= PERF_PROFILE_THRESHOLD_MS:
+                _dump_profile(counter, endpoint, elapsed_ms)
+
+        if app.debug:
+            response.headers['X-SQL-Count'] = str(g.perf_sql_count)
+            response.headers['X-SQL-Time-ms'] = f"{g.perf_sql_ms:.1f}"
+            response.headers['X-Response-Time-ms'] = f"{elapsed_ms:.1f}"
+        return response
+
+    @app.teardown_request
+    def _perf_teardown_request(exc):
+        # Xato bilan tugagan so'rovda after_request ishlamaydi
+        if PERF_PROFILE:
+            stack_sampler.stop(threading.get_ident())
+
+    return app
@@ -0,0 +1,161 @@
+# question_bank.py
+import csv
+import io
+import json
+
+from code_grader import parse_test_cases
+from models import db, Question, bump_quiz_versions
+
+QUESTION_TYPES = {'multi', 'match', 'text', 'code', 'math'}
+OPTION_KEYS = ('A', 'B', 'C', 'D')
+OPTION_MAX_LENGTH = 200
+CSV_COLUMNS = ['question', 'type', 'A', 'B', 'C', 'D', 'correct_answer', 'correct_text', 'code_language', 'points',
+               'test_cases']
+
+
+class QuestionValidationError(ValueError):
+    """Savollar to'plamidagi xato (tartib raqami bilan)"""
+
+
+def build_question_row(q, subject_id=None, quiz_id=None, position=1):
+    """save_quiz formatidagi savolni tekshirib, Question jadvali qatoriga aylantirish"""
+    def fail(message):
+        raise QuestionValidationError(f"{position}-savol: {message}")
+
+    if not isinstance(q, dict):
+        fail("noto'g'ri format")
+
+    text = str(q.get('question') or '').strip()
+    if not text:
+        fail("savol matni bo'sh")
+
+    q_type = (q.get('type') or 'multi').strip().lower()
+    if q_type not in QUESTION_TYPES:
+        fail(f"noma'lum savol turi '{q_type}'")
+
+    try:
+        points = int(q.get('points') or 10)
+    except (TypeError, ValueError):
+        fail("ball butun son bo'lishi kerak")
+    if points < 0:
+        fail("ball manfiy bo'lishi mumkin emas")
+
+    row = {
+        'question_text': text,
+        'question_type': q_type,
+        'option_a': None,
+        'option_b': None,
+        'option_c': None,
+        'option_d': None,
+        'correct_option': None,
+        'correct_text': q.get('correct_text'),
+        'code_language': q.get('code_language') or None,
+        'test_cases': None,
+        'subject_id': subject_id,
+        'quiz_id': quiz_id,
+        'points': points
+    }
+
+    if q_type in ('multi', 'match'):
+        options = q.get('options') or {}
+        if not isinstance(options, dict) or any(not str(options.get(k) or '').strip() for k in OPTION_KEYS):
+            fail("A, B, C, D variantlari to'liq emas")
+        for key in OPTION_KEYS:
+            value = str(options[key]).strip()
+            if len(value) > OPTION_MAX_LENGTH:
+                fail(f"{key} variant {OPTION_MAX_LENGTH} belgidan uzun")
+            row[f'option_{key.lower()}'] = value
+
+    if q_type == 'multi':
+        answer = str(q.get('correct_answer') or '').strip().upper()
+        if answer not in OPTION_KEYS:
+            fail("to'g'ri javob A, B, C yoki D bo'lishi kerak")
+        row['correct_option'] = answer
+
+    elif q_type == 'match':
+        # Moslashtirish juftliklari correct_text da JSON ko'rinishida saqlanadi
+        pairs = row['correct_text']
+        if isinstance(pairs, str):
+            try:
+                pairs = json.loads(pairs)
+            except ValueError:
+                fail("moslashtirish juftliklari JSON emas")
+        if not isinstance(pairs, dict) or not pairs:
+            fail("moslashtirish juftliklari ko'rsatilmagan")
+        row['correct_text'] = json.dumps(pairs, ensure_ascii=False)
+
+    elif q_type == 'code' and q.get('test_cases'):
+        try:
+            cases = parse_test_cases(q['test_cases'])
+        except ValueError as e:
+            fail(f"test-case lar noto'g'ri: {e}")
+        row['test_cases'] = json.dumps(cases, ensure_ascii=False) if cases else None
+
+    if row['correct_text'] is not None and not isinstance(row['correct_text'], str):
+        row['correct_text'] = json.dumps(row['correct_text'], ensure_ascii=False)
+
+    return row
+
+
+def build_question_rows(questions_data, subject_id=None, quiz_id=None):
+    """Barcha savollarni bazaga yozishdan oldin tekshirish"""
+    if not isinstance(questions_data, list):
+        raise QuestionValidationError("Savollar ro'yxati kutilgan edi")
+    return [build_question_row(q, subject_id, quiz_id, i) for i, q in enumerate(questions_data, 1)]
+
+
+def bulk_insert_questions(rows, quiz_id=None):
+    """Tekshirilgan qatorlarni bitta INSERT (executemany) bilan yozish. Commit chaqiruvchida."""
+    if not rows:
+        return 0
+    if quiz_id is not None:
+        for row in rows:
+            row['quiz_id'] = quiz_id
+    db.session.execute(Question.__table__.insert(), rows)
+    # Core INSERT mapper hodisalarini chaqirmaydi
+    bump_quiz_versions(row.get('quiz_id') for row in rows)
+    return len(rows)
+
+
+def parse_question_bank(filename, data):
+    """CSV yoki JSON fayldan savollar ro'yxati (save_quiz formatida)"""
+    if isinstance(data, bytes):
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise QuestionValidationError(f"Fayl UTF-8 kodlashda emas ({e.start}-bayt). Faylni UTF-8 da saqlang")
+    else:
+        text = data
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+    if ext == 'json':
+        try:
+            payload = json.loads(text)
+        except ValueError as e:
+            raise QuestionValidationError(f"JSON xatosi: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get('questions', [])
+        return payload
+
+    if ext == 'csv':
+        questions = []
+        reader = csv.DictReader(io.StringIO(text))
+        for record in reader:
+            # Sarlavhadan ortiq ustunlar restkey (None) ostida ro'yxat bo'lib keladi
+            if None in record:
+                raise QuestionValidationError(
+                    f"{reader.line_num}-qator: sarlavhadagidan {len(record[None])} ta ortiqcha ustun bor")
+            record = {(k or '').strip(): (v or '').strip() for k, v in record.items()}
+            questions.append({
+                'question': record.get('question'),
+                'type': record.get('type') or 'multi',
+                'options': {k: record.get(k) for k in OPTION_KEYS},
+                'correct_answer': record.get('correct_answer'),
+                'correct_text': record.get('correct_text') or None,
+                'code_language': record.get('code_language') or None,
+                'test_cases': record.get('test_cases') or None,
+                'points': record.get('points') or 10
+            })
+        return questions
+
+    raise QuestionValidationError("Faqat .csv yoki .json fayllar qabul qilinadi")
@@ -0,0 +1,101 @@
+# quiz_cache.py
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from code_grader import parse_test_cases
+from models import Question
+
+# Jarayonda saqlanadigan kompilyatsiya qilingan testlar soni (LRU)
+QUIZ_CACHE_SIZE = int(os.environ.get('QUIZ_CACHE_SIZE', 256))
+
+CompiledQuestion = namedtuple('CompiledQuestion', [
+    'id', 'question_text', 'question_type', 'points',
+    'option_a', 'option_b', 'option_c', 'option_d', 'correct_option',
+    'correct_text', 'code_language',
+    'options',      # ((kalit, matn), ...) - A..D
+    'match_pairs',  # ((chap, to'g'ri javob), ...) - match savollari uchun
+    'test_cases',   # [{'input', 'output'}, ...] - code savollari uchun
+])
+
+CompiledQuiz = namedtuple('CompiledQuiz', 'quiz_id version questions total_points')
+
+
+def _match_pairs(question):
+    if question.question_type != 'match' or not question.correct_text:
+        return ()
+    try:
+        pairs = json.loads(question.correct_text)
+    except ValueError:
+        return ()
+    return tuple(pairs.items()) if isinstance(pairs, dict) else ()
+
+
+def _test_cases(question):
+    if question.question_type != 'code' or not question.test_cases:
+        return ()
+    try:
+        return tuple(parse_test_cases(question.test_cases))
+    except ValueError:
+        return ()
+
+
+def compile_quiz(quiz):
+    """Savollarni o'zgarmas ko'rinishga keltirish: variantlar va match kalitlari oldindan ajratilgan"""
+    questions = tuple(
+        CompiledQuestion(
+            id=q.id,
+            question_text=q.question_text,
+            question_type=q.question_type or 'multi',
+            points=q.points or 0,
+            option_a=q.option_a, option_b=q.option_b, option_c=q.option_c, option_d=q.option_d,
+            correct_option=q.correct_option,
+            correct_text=q.correct_text,
+            code_language=q.code_language,
+            options=(('A', q.option_a), ('B', q.option_b), ('C', q.option_c), ('D', q.option_d)),
+            match_pairs=_match_pairs(q),
+            test_cases=_test_cases(q),
+        )
+        for q in Question.query.filter_by(quiz_id=quiz.id).order_by(Question.id).all()
+    )
+    total_points = sum(q.points for q in questions) or len(questions) * 10
+    return CompiledQuiz(quiz.id, quiz.version, questions, total_points)
+
+
+class CompiledQuizCache:
+    """quiz.id bo'yicha kompilyatsiya qilingan testlar; ``quiz.version`` mos kelmasa qayta yig'iladi.
+
+    Versiya quiz qatorida turadi va u sahifada baribir yuklanadi, shuning uchun
+    boshqa workerda qilingan tahrir ham darhol ko'rinadi.
+    """
+
+    def __init__(self, max_size=QUIZ_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {'hits': 0, 'compiles': 0}
+
+    def get(self, quiz):
+        with self._lock:
+            compiled = self._entries.get(quiz.id)
+            if compiled is not None and compiled.version == quiz.version:
+                self._entries.move_to_end(quiz.id)
+                self.stats['hits'] += 1
+                return compiled
+
+        compiled = compile_quiz(quiz)
+        with self._lock:
+            self.stats['compiles'] += 1
+            self._entries[quiz.id] = compiled
+            self._entries.move_to_end(quiz.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+quiz_cache = CompiledQuizCache()
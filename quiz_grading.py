@@ -0,0 +1,157 @@
+# quiz_grading.py
+"""Standart test javoblarini baholash: submit_quiz va qayta baholash uchun umumiy.
+
+Bir nechta topshiriq birga baholanadi: kod test-case lari bitta hovuzda,
+AI ga qoladigan ochiq javoblar bitta ``grade_answers_batch`` chaqiruvida.
+Har bir savol uchun ``pct`` (0-100) saqlanadi; ochiq savolda ball
+``int(points * pct / 100)``, multi va match da javobning o'zidan hisoblanadi.
+AI baholay olmagan javob ``pending`` belgisi bilan saqlanadi va keyingi qayta
+baholashda (``--open`` siz ham) yana AI ga yuboriladi.
+"""
+import json
+
+from ai_model import ai_assistant
+from answer_grader import pre_grade
+from code_grader import code_grader, CODE_GRADER_AI_FALLBACK
+
+OPEN_TYPES = ('text', 'code', 'math')
+# Sintaksis xatosi bor kod uchun urinish bali
+SYNTAX_ERROR_PCT = 20
+
+
+def collect_answers(compiled, form):
+    """Formadan xom javoblar: {"<question_id>": javob}; match uchun ro'yxat"""
+    answers = {}
+    for question in compiled.questions:
+        q_id = str(question.id)
+        if question.question_type == 'match':
+            answers[q_id] = [form.get(f'question_{q_id}_{i}') for i in range(1, len(question.match_pairs) + 1)]
+        else:
+            answers[q_id] = form.get(f'question_{q_id}')
+    return answers
+
+
+def _match_correct(question, answer):
+    answer = answer if isinstance(answer, list) else []
+    return sum(1 for i, (_, expected) in enumerate(question.match_pairs)
+               if i < len(answer) and answer[i] == expected)
+
+
+def _earned(question, entry):
+    if question.question_type == 'match':
+        pairs_count = len(question.match_pairs)
+        return int(question.points * (_match_correct(question, entry['answer']) / pairs_count)) if pairs_count else 0
+    if question.question_type == 'multi':
+        return question.points if entry['answer'] == question.correct_option else 0
+    return int(question.points * (entry['pct'] / 100))
+
+
+def _closed_pct(question, answer):
+    """multi va match: javobdan to'g'ridan-to'g'ri"""
+    if question.question_type == 'match':
+        pairs_count = len(question.match_pairs)
+        return round(_match_correct(question, answer) * 100 / pairs_count, 2) if pairs_count else 0
+    return 100 if answer == question.correct_option else 0
+
+
+def _reuse(old, q_id, regrade_open):
+    """Avvalgi ochiq savol bahosi qayta ishlatiladimi"""
+    return not regrade_open and old and q_id in old and not old[q_id].get('pending')
+
+
+def _has_syntax_error(question, answer):
+    if question.question_type != 'code' or not answer:
+        return False
+    if (question.code_language or 'python').lower() != 'python':
+        return False
+    try:
+        compile(answer, '<string>', 'exec')
+    except SyntaxError:
+        return True
+    return False
+
+
+def grade_submissions(compiled, submissions, previous=None, regrade_open=True):
+    """Topshiriqlarni baholash.
+
+    ``submissions`` - collect_answers natijalari ro'yxati; ``previous`` - shu
+    topshiriqlarning avvalgi baholari (answers_json) yoki None. ``regrade_open=False``
+    bo'lsa ochiq savollar uchun avvalgi ``pct`` qayta ishlatiladi (pending lardan
+    tashqari). Har biri uchun ``(ball, {"<question_id>": {"answer", "pct"[, "pending"]}})``.
+    """
+    previous = previous or [None] * len(submissions)
+    graded = [{} for _ in submissions]
+
+    # Test-case li kod savollari barcha topshiriqlar bo'yicha bitta hovuzda
+    code_jobs = []
+    for n, (answers, old) in enumerate(zip(submissions, previous)):
+        for question in compiled.questions:
+            q_id = str(question.id)
+            if question.question_type != 'code' or not question.test_cases:
+                continue
+            if _reuse(old, q_id, regrade_open):
+                continue
+            answer = answers.get(q_id)
+            if not _has_syntax_error(question, answer):
+                code_jobs.append((n, question, answer))
+    local_grades = code_grader.grade_many([(answer, question.test_cases, question.code_language)
+                                           for _, question, answer in code_jobs])
+    local = {(n, question.id): result for (n, question, _), result in zip(code_jobs, local_grades)}
+
+    ai_items = []  # (topshiriq, savol, javob, kafolatlangan pct)
+    for n, (answers, old) in enumerate(zip(submissions, previous)):
+        for question in compiled.questions:
+            q_id = str(question.id)
+            answer = answers.get(q_id)
+            entry = graded[n][q_id] = {'answer': answer, 'pct': 0}
+
+            if question.question_type not in OPEN_TYPES:
+                entry['pct'] = _closed_pct(question, answer)
+                continue
+            if _reuse(old, q_id, regrade_open):
+                entry['pct'] = old[q_id].get('pct', 0)
+                continue
+
+            if question.question_type == 'code':
+                if _has_syntax_error(question, answer):
+                    entry['pct'] = SYNTAX_ERROR_PCT
+                    continue
+                result = local.get((n, question.id))
+                if result is not None:
+                    entry['pct'] = result['score']
+                    if result['passed'] < result['total'] and CODE_GRADER_AI_FALLBACK:
+                        # Qisman ball AI dan, lekin test natijasidan past emas
+                        ai_items.append((n, question, answer, result['score']))
+                    continue
+            else:
+                # Son, ifoda yoki aniq ibora bo'lsa AI siz baholanadi
+                result = pre_grade(question.question_type, answer, question.correct_text)
+                if result is not None:
+                    entry['pct'] = result['score']
+                    continue
+            ai_items.append((n, question, answer, 0))
+
+    # Shubhali javoblar bitta batch bilan (token byudjeti bo'yicha bo'laklanadi)
+    if ai_items:
+        grades = ai_assistant.grade_answers_batch([(question.question_text, answer, question.correct_text)
+                                                   for _, question, answer, _ in ai_items])
+        for (n, question, _, floor_pct), grade in zip(ai_items, grades):
+            entry = graded[n][str(question.id)]
+            entry['pct'] = max(floor_pct, grade.get('score', 0))
+            if grade.get('pending'):
+                entry['pending'] = True
+
+    results = []
+    for entries in graded:
+        points = sum(_earned(question, entries[str(question.id)]) for question in compiled.questions)
+        results.append((points, entries))
+    return results
+
+
+def score_percent(compiled, points):
+    total = compiled.total_points
+    return int((points / total) * 100) if total > 0 else 0
+
+
+def dump_answers(entries):
+    return json.dumps(entries, ensure_ascii=False)
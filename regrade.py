@@ -0,0 +1,204 @@
+"""Test natijalarini qayta baholash: savol tuzatilgandan yoki ball o'zgargandan keyin.
+
+Natijalar ``id`` bo'yicha keyset bilan ``REGRADE_BATCH_SIZE`` tadan o'qiladi
+(faqat kerakli ustunlar, ORM obyektlarsiz). Har bir bo'lak saqlangan xom
+javoblardan (``TestResult.answers_json``) qayta baholanadi va bitta
+executemany UPDATE + commit bilan yoziladi. Umumiy ball, daraja va fan
+progressi oxirida ta'sirlangan foydalanuvchilar uchun ommaviy UPDATE bilan
+tiklanadi. Qayta ishga tushirish xavfsiz: natija bir xil chiqadi.
+
+Ochiq savollar (text/math/code) uchun standart holatda avvalgi baho qayta
+ishlatiladi (AI baholay olmagan ``pending`` javoblardan tashqari); ``--open``
+bilan ular ham qayta baholanadi (lokal grader + AI).
+
+    python regrade.py 12
+    python regrade.py 12 --open --batch-size 1000
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from models import (db, Quiz, TestResult, RegradeJob, recalculate_total_scores, recalculate_progress,
+                    invalidate_user_context)
+from quiz_cache import compile_quiz
+from quiz_grading import grade_submissions, score_percent, dump_answers
+
+REGRADE_BATCH_SIZE = int(os.environ.get('REGRADE_BATCH_SIZE', 500))
+# Shuncha soniya progress yangilanmagan "running" ish to'xtagan hisoblanadi
+REGRADE_STALE_SECONDS = int(os.environ.get('REGRADE_STALE_SECONDS', 600))
+# Yakuniy ommaviy UPDATE lardagi IN ro'yxati hajmi
+USER_CHUNK_SIZE = 500
+
+
+class RegradeError(ValueError):
+    """Testni qayta baholab bo'lmaydi"""
+
+
+def _load_answers(raw):
+    try:
+        answers = json.loads(raw) if raw else None
+    except ValueError:
+        return None
+    return answers if isinstance(answers, dict) else None
+
+
+def regrade_quiz(quiz_id, regrade_open=False, batch_size=REGRADE_BATCH_SIZE, progress=None):
+    """Test bo'yicha barcha urinishlarni qayta baholash.
+
+    ``progress(stats)`` har bir bo'lakdan keyin chaqiriladi. Javoblari saqlanmagan
+    (ushbu o'zgarishdan oldingi) natijalar o'tkazib yuboriladi. Statistika qaytaradi.
+    """
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        raise RegradeError("Test topilmadi")
+    if quiz.is_unique:
+        raise RegradeError("Unikal test savollari har bir o'quvchida alohida, qayta baholanmaydi")
+
+    # Kesh emas, bazadagi joriy savollar
+    compiled = compile_quiz(quiz)
+    subject_id = quiz.subject_id
+    question_count = len(compiled.questions)
+    stats = {
+        'total': db.session.query(db.func.count(TestResult.id)).filter(TestResult.quiz_id == quiz_id).scalar(),
+        'processed': 0, 'changed': 0, 'skipped': 0, 'users': 0,
+    }
+    if progress:
+        progress(stats)
+
+    users = set()
+    last_id = 0
+    while True:
+        rows = db.session.query(TestResult.id, TestResult.user_id, TestResult.score,
+                                TestResult.correct_answers, TestResult.total_questions,
+                                TestResult.answers_json)\
+            .filter(TestResult.quiz_id == quiz_id, TestResult.id > last_id)\
+            .order_by(TestResult.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        regradable, previous = [], []
+        for row in rows:
+            answers = _load_answers(row.answers_json)
+            if answers is None:
+                stats['skipped'] += 1
+                continue
+            regradable.append(row)
+            previous.append(answers)
+
+        graded = grade_submissions(
+            compiled,
+            [{q_id: entry.get('answer') for q_id, entry in answers.items() if isinstance(entry, dict)}
+             for answers in previous],
+            previous, regrade_open)
+
+        updates = []
+        for row, (points, entries) in zip(regradable, graded):
+            score, answers_json = score_percent(compiled, points), dump_answers(entries)
+            if (score, int(points), question_count, answers_json) == \
+                    (row.score, row.correct_answers, row.total_questions, row.answers_json):
+                continue
+            updates.append({'id': row.id, 'score': score, 'correct_answers': int(points),
+                            'total_questions': question_count, 'answers_json': answers_json})
+            if score != row.score:
+                stats['changed'] += 1
+                users.add(row.user_id)
+        if updates:
+            # Birlamchi kalit bo'yicha ommaviy UPDATE (executemany)
+            db.session.execute(db.update(TestResult), updates)
+        db.session.commit()
+
+        stats['processed'] += len(rows)
+        if progress:
+            progress(stats)
+
+    # Agregatlar oxirida, faqat bali o'zgargan o'quvchilar uchun
+    users = sorted(users)
+    for i in range(0, len(users), USER_CHUNK_SIZE):
+        chunk = users[i:i + USER_CHUNK_SIZE]
+        recalculate_total_scores(chunk)
+        recalculate_progress(chunk, subject_id)
+    db.session.commit()
+    for user_id in users:
+        invalidate_user_context(user_id)
+    stats['users'] = len(users)
+    return stats
+
+
+def active_job(quiz_id):
+    """Shu test uchun ketayotgan (to'xtab qolmagan) ish yoki None"""
+    fresh = datetime.now() - timedelta(seconds=REGRADE_STALE_SECONDS)
+    return RegradeJob.query.filter(RegradeJob.quiz_id == quiz_id,
+                                   RegradeJob.status.in_(('queued', 'running')),
+                                   RegradeJob.updated_at >= fresh)\
+        .order_by(RegradeJob.id.desc()).first()
+
+
+def run_job(job_id):
+    """RegradeJob ni bajarish: holat va progress har bir bo'lakdan keyin bazaga yoziladi"""
+    jobs = RegradeJob.__table__
+
+    def save(**values):
+        values['updated_at'] = datetime.now()
+        db.session.execute(jobs.update().where(jobs.c.id == job_id).values(**values))
+        db.session.commit()
+
+    job = db.session.get(RegradeJob, job_id)
+    quiz_id, regrade_open = job.quiz_id, job.regrade_open
+    save(status='running')
+    try:
+        stats = regrade_quiz(quiz_id, regrade_open, progress=lambda s: save(
+            total=s['total'], processed=s['processed'], changed=s['changed'], skipped=s['skipped']))
+        save(status='done', finished_at=datetime.now(), processed=stats['processed'],
+             changed=stats['changed'], skipped=stats['skipped'])
+        print(f"[regrade] test {quiz_id}: {stats}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"[regrade] test {quiz_id} xatosi: {e}")
+        save(status='failed', finished_at=datetime.now(), error=str(e))
+
+
+def start_regrade_job(app, quiz_id, user_id=None, regrade_open=False):
+    """Fon oqimida qayta baholashni boshlash. ``(job, started)``: shu test uchun ish
+    ketayotgan bo'lsa, yangisi ochilmaydi va o'sha qaytadi."""
+    job = active_job(quiz_id)
+    if job:
+        return job, False
+    job = RegradeJob(quiz_id=quiz_id, created_by=user_id, regrade_open=regrade_open)
+    db.session.add(job)
+    db.session.commit()
+
+    def work(job_id):
+        with app.app_context():
+            run_job(job_id)
+
+    threading.Thread(target=work, args=(job.id,), name=f'regrade-{job.id}', daemon=True).start()
+    return job, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('quiz_id', type=int)
+    parser.add_argument('--open', action='store_true', help="ochiq savollarni ham qayta baholash (AI)")
+    parser.add_argument('--batch-size', type=int, default=REGRADE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        def show(stats):
+            print(f"\r[regrade] {stats['processed']}/{stats['total']} natija, "
+                  f"{stats['changed']} tasi o'zgardi, {stats['skipped']} tasi o'tkazildi", end='', flush=True)
+
+        try:
+            stats = regrade_quiz(args.quiz_id, args.open, args.batch_size, progress=show)
+        except RegradeError as e:
+            print(f"[!] {e}")
+            raise SystemExit(1)
+    print(f"\n[+] {stats['users']} ta o'quvchining umumiy bali, darajasi va progressi yangilandi")
+
+
+if __name__ == "__main__":
+    main()
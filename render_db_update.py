@@ -39,23 +39,40 @@ def update_db():
             'rank': 'VARCHAR(50)',
             'bio': 'TEXT',
             'avatar': 'TEXT',
-            'is_active': 'BOOLEAN DEFAULT TRUE'
+            'is_active': 'BOOLEAN DEFAULT TRUE',
+            'total_score': 'INTEGER NOT NULL DEFAULT 0',
+            'context_version': 'INTEGER NOT NULL DEFAULT 0'
         }
         
+        added_user_columns = set()
         for col, col_type in user_columns.items():
             if not column_exists('user', col):
                 logger.info(f"Adding column '{col}' to 'user' table...")
                 try:
                     conn.execute(text(f"ALTER TABLE \"user\" ADD COLUMN {col} {col_type}"))
                     conn.commit()
+                    added_user_columns.add(col)
                 except Exception as e:
                     logger.error(f"Error adding {col}: {e}")
 
+        if 'total_score' in added_user_columns:
+            # Mavjud natijalardan umumiy ballni to'ldirish (keyin natija yozilganda oshiriladi)
+            logger.info("Backfilling 'user.total_score'...")
+            try:
+                conn.execute(text(
+                    "UPDATE \"user\" SET total_score = COALESCE("
+                    "(SELECT SUM(score) FROM test_result WHERE test_result.user_id = \"user\".id), 0)"
+                ))
+                conn.commit()
+            except Exception as e:
+                logger.error(f"Error backfilling total_score: {e}")
+
         # 2. Check 'test_result' table
         test_result_columns = {
             'quiz_id': 'INTEGER',
             'unique_questions_snapshot': 'TEXT',
-            'correct_answers': 'INTEGER'
+            'correct_answers': 'INTEGER',
+            'answers_json': 'TEXT'
         }
         for col, col_type in test_result_columns.items():
             if not column_exists('test_result', col):
@@ -66,6 +83,15 @@ def update_db():
                 except Exception as e:
                     logger.error(f"Error: {e}")
 
+        # 'quiz' jadvali: kompilyatsiya qilingan test keshi versiyasi
+        if not column_exists('quiz', 'version'):
+            logger.info("Adding column 'version' to 'quiz' table...")
+            try:
+                conn.execute(text("ALTER TABLE quiz ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+                conn.commit()
+            except Exception as e:
+                logger.error(f"Error: {e}")
+
         # 3. Check 'assignment' table
         if not column_exists('assignment', 'quiz_id'):
             logger.info("Adding 'quiz_id' to 'assignment'...")
@@ -80,6 +106,7 @@ def update_db():
             'question_type': 'VARCHAR(20) DEFAULT \'multi\'',
             'correct_text': 'TEXT',
             'code_language': 'VARCHAR(20)',
+            'test_cases': 'TEXT',
             'quiz_id': 'INTEGER',
             'points': 'INTEGER DEFAULT 10'
         }
@@ -92,6 +119,69 @@ def update_db():
                 except Exception as e:
                     logger.error(f"Error: {e}")
         
+        # 5. 'user_progress': bitta foydalanuvchi-fan uchun bitta qator (upsert uchun unikal indeks)
+        logger.info("Ensuring unique (user_id, subject_id) on 'user_progress'...")
+        try:
+            duplicates = conn.execute(text(
+                "SELECT 1 FROM user_progress GROUP BY user_id, subject_id HAVING COUNT(*) > 1 LIMIT 1"
+            )).first()
+            if duplicates:
+                # Takrorlarni birlashtirish: eng yuqori progressli qator qoladi
+                logger.info("Merging duplicate 'user_progress' rows...")
+                conn.execute(text(
+                    "UPDATE user_progress SET progress_percentage = ("
+                    "SELECT MAX(p.progress_percentage) FROM user_progress p "
+                    "WHERE p.user_id = user_progress.user_id AND p.subject_id = user_progress.subject_id)"
+                ))
+                conn.execute(text(
+                    "DELETE FROM user_progress WHERE id NOT IN ("
+                    "SELECT MIN(id) FROM user_progress GROUP BY user_id, subject_id)"
+                ))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_progress_user_subject "
+                "ON user_progress (user_id, subject_id)"
+            ))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error: {e}")
+
+        # 6. lower(username) indeksi: login va ro'yxatdan o'tishdagi qidiruv uchun
+        logger.info("Ensuring index on lower(username)...")
+        try:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_username_lower ON \"user\" (lower(username))"
+            ))
+            conn.commit()
+        except Exception as e:
+            # Faqat harf registri bilan farq qiladigan eski username lar bo'lsa - unikal bo'lmagan indeks
+            conn.rollback()
+            logger.error(f"Unique lower(username) index failed ({e}), creating a non-unique one")
+            try:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_user_username_lower ON \"user\" (lower(username))"
+                ))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error: {e}")
+
+        # 7. Tashqi kalit indekslari (o'quvchi testlar katalogi va natijalar)
+        indexes = {
+            'ix_group_member_student_id': 'group_member (student_id)',
+            'ix_assignment_group_id': 'assignment (group_id)',
+            'ix_question_quiz_id': 'question (quiz_id)',
+            'ix_test_result_user_quiz': 'test_result (user_id, quiz_id)',
+            'ix_test_result_quiz_id': 'test_result (quiz_id, id)',
+        }
+        for name, target in indexes.items():
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error creating {name}: {e}")
+
         # 4. Check for 'literature' table (if it's new)
         # literature table check might be more complex if it doesn't exist at all
         # But db.create_all() in init_db handles entire new tables usually.
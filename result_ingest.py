@@ -0,0 +1,72 @@
+# result_ingest.py
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, User, UserProgress, TestResult, rank_case
+
+_UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _upsert_progress(user_id, subject_id, score, now):
+    """Progress = max(eski, yangi) bitta atomar so'rovda (o'qib-yozish poygasisiz)"""
+    table = UserProgress.__table__
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        # Boshqa bazalar uchun: qatorni qulflab o'qish va yozish
+        progress = UserProgress.query.filter_by(user_id=user_id, subject_id=subject_id)\
+            .with_for_update().first()
+        if progress:
+            progress.progress_percentage = max(progress.progress_percentage or 0, score)
+            progress.last_activity = now
+        else:
+            db.session.add(UserProgress(user_id=user_id, subject_id=subject_id,
+                                        progress_percentage=score, last_activity=now))
+        return
+
+    stmt = insert(table).values(user_id=user_id, subject_id=subject_id,
+                                progress_percentage=score, last_activity=now)
+    current = db.func.coalesce(table.c.progress_percentage, 0)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.subject_id],
+        set_={
+            'progress_percentage': db.case((current >= stmt.excluded.progress_percentage, current),
+                                           else_=stmt.excluded.progress_percentage),
+            'last_activity': stmt.excluded.last_activity,
+        })
+    db.session.execute(stmt)
+
+
+def record_result(user_id, score, total_questions, correct_answers, subject_id=None, quiz_id=None,
+                  snapshot=None, answers=None):
+    """Test natijasini bitta tranzaksiyada yozish: natija, progress upsert, umumiy ball va daraja.
+
+    Umumiy ball qayta yig'ilmaydi, ``total_score + score`` sifatida bazaning o'zida
+    oshiriladi, shuning uchun bir vaqtdagi topshiriqlar bir-birini yo'qotmaydi.
+    Shu UPDATE ``context_version`` ni ham oshiradi (AI konteksti keshi eskiradi).
+    Xatoda chaqiruvchi ``db.session.rollback()`` qiladi.
+    """
+    now = datetime.now()
+    result = TestResult(
+        user_id=user_id,
+        subject_id=subject_id,
+        quiz_id=quiz_id,
+        score=score,
+        total_questions=total_questions,
+        correct_answers=correct_answers,
+        unique_questions_snapshot=snapshot,
+        answers_json=answers,
+        completed_at=now,
+    )
+    db.session.add(result)
+
+    if subject_id:
+        _upsert_progress(user_id, subject_id, score, now)
+
+    users = User.__table__
+    new_total = db.func.coalesce(users.c.total_score, 0) + score
+    db.session.execute(users.update().where(users.c.id == user_id)
+                       .values(total_score=new_total, rank=rank_case(new_total),
+                               context_version=users.c.context_version + 1))
+    db.session.commit()
+    return result
@@ -0,0 +1,37 @@
+import json
+import threading
+
+from ai_model import GroqAIAssistant
+
+
+def test_concurrent_unique_generations_are_not_shared(monkeypatch):
+    assistant = GroqAIAssistant()
+    # Ikkala chaqiruv ham upstream ga yetib kelsagina to'siq ochiladi
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def fake_generate(user_message, user_context, deadline):
+        calls.append(user_message)
+        n = barrier.wait()
+        return json.dumps([{
+            "question": f"Savol {n}",
+            "options": {"A": "1", "B": "2", "C": "3", "D": "4"},
+            "correct_answer": "A"
+        }])
+
+    monkeypatch.setattr(assistant, '_generate_response', fake_generate)
+
+    results = [None, None]
+
+    def run(i):
+        results[i] = assistant.generate_unique_questions("Kasrlar", 5, 1)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 2
+    assert calls[0] == calls[1]
+    assert {r[0]['question'] for r in results} == {"Savol 0", "Savol 1"}
@@ -0,0 +1,35 @@
+import pytest
+
+from question_bank import QuestionValidationError, parse_question_bank
+
+HEADER = 'question,type,A,B,C,D,correct_answer,points\n'
+
+
+def test_csv_rows_are_parsed():
+    data = (HEADER + "2+2?,multi,3,4,5,6,B,5\n").encode('utf-8')
+    questions = parse_question_bank('bank.csv', data)
+    assert questions == [{
+        'question': '2+2?',
+        'type': 'multi',
+        'options': {'A': '3', 'B': '4', 'C': '5', 'D': '6'},
+        'correct_answer': 'B',
+        'correct_text': None,
+        'code_language': None,
+        'test_cases': None,
+        'points': '5'
+    }]
+
+
+def test_csv_extra_columns_are_rejected():
+    data = (HEADER + "2+2?,multi,3,4,5,6,B,5\n" + "3+3?,multi,5,6,7,8,B,5,ortiqcha,yana\n").encode('utf-8')
+    with pytest.raises(QuestionValidationError, match="3-qator: sarlavhadagidan 2 ta ortiqcha ustun"):
+        parse_question_bank('bank.csv', data)
+
+
+def test_non_utf8_upload_is_rejected():
+    data = (HEADER + "O'zbekiston poytaxti?,multi,Toshkent,Samarqand,Buxoro,Xiva,A,5\n").encode('utf-8')
+    data = data.replace(b'Xiva', 'Xiva – eski'.encode('cp1251'))
+    with pytest.raises(QuestionValidationError, match="UTF-8"):
+        parse_question_bank('bank.csv', data)
+    with pytest.raises(QuestionValidationError, match="UTF-8"):
+        parse_question_bank('bank.json', b'{"questions": ["\xff"]}')